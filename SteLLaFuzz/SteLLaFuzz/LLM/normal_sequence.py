@@ -1,10 +1,13 @@
 import os
 import json
 
-from typing import Optional, List
+from typing import Optional, List, Callable
 from pydantic import BaseModel
-from openai import OpenAI
-from utility.utility import MODEL, LLM_RETRY, LLM_RESULT_DIR
+from utility.utility import LLM_RETRY, LLM_RESULT_DIR, SEQUENCE_SHARD_SIZE, save_response
+from utility.routing import parse_completion
+from utility.budget import BudgetExhausted
+from utility.tracing import traced
+from utility.sharding import generate_sharded
 
 MESSAGE_SEQUENCE_OUTPUT_DIR = "message_sequence_results"
 
@@ -68,34 +71,34 @@ Please adhere to the following instructions:
 Please generate the final message call sequences strictly following the above instructions.
 """
 
-def using_llm(prompt: str) -> ProtocolSequences:
-    client = OpenAI()
+@traced("3_message_sequences", "llm", failed=lambda response: response is None)
+def using_llm(prompt: str, on_sequence: Optional[Callable] = None) -> ProtocolSequences:
     try:
-        completion = client.beta.chat.completions.parse(
-            model=MODEL,
+        completion = parse_completion(
+            "3_message_sequences",
             temperature=0.2,
             messages=[
                 {"role": "system", "content": "You are a network protocol expert with deep understanding of [PROTOCOL]."},
                 {"role": "user", "content": prompt}
             ],
             response_format=ProtocolSequences,
-            timeout=90
+            timeout=90,
+            array_key="sequences",
+            item_model=Sequence,
+            on_item=on_sequence
         )
         response = completion.choices[0].message.parsed
 
-        index = 0
-        os.makedirs(os.path.join(LLM_RESULT_DIR, "3_message_sequences"), exist_ok=True)
-        while os.path.exists(os.path.join(LLM_RESULT_DIR, "3_message_sequences", f"response_{index}.json")):
-            index += 1
-        protocol_file = os.path.join(LLM_RESULT_DIR, "3_message_sequences", f"response_{index}.json")
-        with open(protocol_file, "w", encoding="utf-8") as f:
-            json.dump(completion.model_dump(), f, indent=4, ensure_ascii=False)
+        save_response("3_message_sequences", completion.model_dump())
         return response
+    except BudgetExhausted:
+        raise
     except Exception as e:
         print(f"Error processing protocol: {e}")
         return None
 
-def get_message_sequences(protocol: str, message_types: dict, seq_length: int) -> dict:
+@traced("3_message_sequences", "item", label=lambda protocol, message_types, seq_length, *args, **kwargs: f"length {seq_length}, {len(message_types['client_to_server_messages'])} types")
+def request_message_sequences(protocol: str, message_types: dict, seq_length: int, on_sequence: Optional[Callable] = None) -> ProtocolSequences:
     types_list = [type["name"] for type in message_types["client_to_server_messages"]]
     types = ""
     for type in types_list:
@@ -106,17 +109,42 @@ def get_message_sequences(protocol: str, message_types: dict, seq_length: int) -
                            .replace("[TYPES]", types)\
                            .replace("[SEQ_LENGTH]", str(seq_length))
 
-    for _ in range(LLM_RETRY):
-        response = using_llm(prompt)
+    # Only the first attempt is streamed, through the same length filter as the final response; delivered keeps,
+    # per position, whether its sequence was handed over, so a retry only hands over the other positions
+    delivered = []
+    def stream(sequence: dict) -> None:
+        valid = len(sequence["type_sequence"]) == seq_length
+        delivered.append(valid)
+        if valid:
+            on_sequence(sequence)
+
+    response = None
+    for attempt in range(LLM_RETRY):
+        response = using_llm(prompt, stream if on_sequence and attempt == 0 else None)
         if response is not None:
             break
 
     if response is None:
         raise Exception(f"Failed to generate message sequence for {protocol}")
 
+    if on_sequence:
+        # Sequences of a retry that the stream did not hand over
+        for i, seq in enumerate(response.sequences):
+            if (i >= len(delivered) or not delivered[i]) and len(seq.type_sequence) == seq_length:
+                on_sequence(seq.model_dump())
 
     # Filter out sequences that has length not equal to [SEQ_LENGTH]
     response.sequences = [seq for seq in response.sequences if len(seq.type_sequence) == seq_length]
+    return response
+
+@traced("3_message_sequences", "stage", label=lambda protocol, message_types, seq_length, *args, **kwargs: f"length {seq_length}")
+def get_message_sequences(protocol: str, message_types: dict, seq_length: int, on_sequence: Optional[Callable] = None,
+                          shard_size: int = SEQUENCE_SHARD_SIZE) -> dict:
+    if shard_size and len(message_types["client_to_server_messages"]) > shard_size:
+        response = ProtocolSequences.model_validate(generate_sharded(protocol, message_types, shard_size,
+            lambda shard: request_message_sequences(protocol, shard, seq_length, on_sequence).model_dump()))
+    else:
+        response = request_message_sequences(protocol, message_types, seq_length, on_sequence)
 
     # Save the results to a JSON file
     os.makedirs(MESSAGE_SEQUENCE_OUTPUT_DIR, exist_ok=True)
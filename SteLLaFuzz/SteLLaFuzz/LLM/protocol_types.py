@@ -3,8 +3,10 @@ import json
 
 from typing import Optional, List
 from pydantic import BaseModel
-from openai import OpenAI
-from utility.utility import MODEL, LLM_RETRY, LLM_RESULT_DIR
+from utility.utility import LLM_RETRY, LLM_RESULT_DIR, save_response
+from utility.routing import parse_completion
+from utility.budget import BudgetExhausted
+from utility.tracing import traced
 
 PROTOCOL_TYPE_OUTPUT_DIR = "protocol_type_results"
 
@@ -86,11 +88,11 @@ Please adhere to the following instructions:
 Please extract all client-to-server message types for [PROTOCOL] following the above instructions.
 """
 
+@traced("1_types", "llm", failed=lambda response: response is None)
 def using_llm(prompt: str) -> ProtocolMessageTypes:
-    client = OpenAI()
     try:
-        completion = client.beta.chat.completions.parse(
-            model=MODEL,
+        completion = parse_completion(
+            "1_types",
             temperature=0.1,
             messages=[
                 {"role": "system", "content": "You are a network protocol expert with deep understanding of [PROTOCOL]."},
@@ -101,19 +103,15 @@ def using_llm(prompt: str) -> ProtocolMessageTypes:
         )
         response = completion.choices[0].message.parsed
 
-        index = 0
-        os.makedirs(os.path.join(LLM_RESULT_DIR, "1_types"), exist_ok=True)
-        while os.path.exists(os.path.join(LLM_RESULT_DIR, "1_types", f"response_{index}.json")):
-            index += 1
-        protocol_file = os.path.join(LLM_RESULT_DIR, "1_types", f"response_{index}.json")
-        with open(protocol_file, "w", encoding="utf-8") as f:
-            json.dump(completion.model_dump(), f, indent=4, ensure_ascii=False)
+        save_response("1_types", completion.model_dump())
         return response
+    except BudgetExhausted:
+        raise
     except Exception as e:
         print(f"Error processing protocol: {e}")
         return None
 
-def get_protocol_message_types(protocol: str) -> dict:
+def request_protocol_message_types(protocol: str) -> dict:
     prompt = PROTOCOL_TYPE_PROMPT.replace("[PROTOCOL]", protocol)
 
     for _ in range(LLM_RETRY):
@@ -123,16 +121,22 @@ def get_protocol_message_types(protocol: str) -> dict:
 
     if response is None:
         raise Exception(f"Failed to generate message types for {protocol}")
+    return response.model_dump()
 
+def save_protocol_message_types(protocol: str, message_types: dict) -> None:
     os.makedirs(PROTOCOL_TYPE_OUTPUT_DIR, exist_ok=True)    
     protocol_file = os.path.join(PROTOCOL_TYPE_OUTPUT_DIR, f"{protocol.lower()}_types.json")
     with open(protocol_file, "w", encoding="utf-8") as f:
-        json.dump(response.model_dump(), f, indent=4, ensure_ascii=False)
+        json.dump(message_types, f, indent=4, ensure_ascii=False)
     print(f"Saved results for {protocol} to {protocol_file}")
 
     os.makedirs(LLM_RESULT_DIR, exist_ok=True)    
     protocol_file = os.path.join(LLM_RESULT_DIR, f"1_{protocol.lower()}_types.json")
     with open(protocol_file, "w", encoding="utf-8") as f:
-        json.dump(response.model_dump(), f, indent=4, ensure_ascii=False)
+        json.dump(message_types, f, indent=4, ensure_ascii=False)
 
-    return response.model_dump()
+@traced("1_types", "stage", label=lambda protocol: protocol)
+def get_protocol_message_types(protocol: str) -> dict:
+    message_types = request_protocol_message_types(protocol)
+    save_protocol_message_types(protocol, message_types)
+    return message_types
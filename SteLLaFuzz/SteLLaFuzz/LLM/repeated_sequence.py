@@ -1,10 +1,13 @@
 import os
 import json
 
-from typing import Optional, List
+from typing import Optional, List, Callable
 from pydantic import BaseModel
-from openai import OpenAI
-from utility.utility import MODEL, LLM_RETRY, LLM_RESULT_DIR
+from utility.utility import LLM_RETRY, LLM_RESULT_DIR, SEQUENCE_SHARD_SIZE, save_response
+from utility.routing import parse_completion
+from utility.budget import BudgetExhausted
+from utility.tracing import traced
+from utility.sharding import generate_sharded
 
 MESSAGE_SEQUENCE_OUTPUT_DIR = "message_sequence_results"
 
@@ -75,34 +78,42 @@ Please adhere to the following instructions:
 Please generate the final message call sequences strictly following the above instructions.
 """
 
-def using_llm(prompt: str) -> ProtocolSequences:
-    client = OpenAI()
+@traced("4_repeated_message_sequences", "llm", failed=lambda response: response is None)
+def using_llm(prompt: str, on_sequence: Optional[Callable] = None) -> ProtocolSequences:
     try:
-        completion = client.beta.chat.completions.parse(
-            model=MODEL,
+        completion = parse_completion(
+            "4_repeated_message_sequences",
             temperature=0.7,
             messages=[
                 {"role": "system", "content": "You are a network protocol expert with deep understanding of [PROTOCOL]."},
                 {"role": "user", "content": prompt}
             ],
             response_format=ProtocolSequences,
-            timeout=90
+            timeout=90,
+            array_key="sequences",
+            item_model=Sequence,
+            on_item=on_sequence
         )
         response = completion.choices[0].message.parsed
 
-        index = 0
-        os.makedirs(os.path.join(LLM_RESULT_DIR, "4_repeated_message_sequences"), exist_ok=True)
-        while os.path.exists(os.path.join(LLM_RESULT_DIR, "4_repeated_message_sequences", f"response_{index}.json")):
-            index += 1
-        protocol_file = os.path.join(LLM_RESULT_DIR, "4_repeated_message_sequences", f"response_{index}.json")
-        with open(protocol_file, "w", encoding="utf-8") as f:
-            json.dump(completion.model_dump(), f, indent=4, ensure_ascii=False)
+        save_response("4_repeated_message_sequences", completion.model_dump())
         return response
+    except BudgetExhausted:
+        raise
     except Exception as e:
         print(f"Error processing protocol: {e}")
         return None
 
-def get_repeated_message_sequences(protocol: str, message_types: dict) -> dict:
+def has_repeated_type(type_sequence: List[str]) -> bool:
+    seen = set()
+    for msg_type in type_sequence:
+        if msg_type in seen:
+            return True
+        seen.add(msg_type)
+    return False
+
+@traced("4_repeated_message_sequences", "item", label=lambda protocol, message_types, *args, **kwargs: f"{len(message_types['client_to_server_messages'])} types")
+def request_repeated_message_sequences(protocol: str, message_types: dict, on_sequence: Optional[Callable] = None) -> ProtocolSequences:
     types_list = [type["name"] for type in message_types["client_to_server_messages"]]
     types = ""
     for type in types_list:
@@ -112,8 +123,18 @@ def get_repeated_message_sequences(protocol: str, message_types: dict) -> dict:
     prompt = MESSAGE_PROMPT.replace("[PROTOCOL]", protocol)\
                            .replace("[TYPES]", types)
 
-    for _ in range(LLM_RETRY):
-        response = using_llm(prompt)
+    # Only the first attempt is streamed, through the same repetition filter as the final response; delivered keeps,
+    # per position, whether its sequence was handed over, so a retry only hands over the other positions
+    delivered = []
+    def stream(sequence: dict) -> None:
+        valid = has_repeated_type(sequence["type_sequence"])
+        delivered.append(valid)
+        if valid:
+            on_sequence(sequence)
+
+    response = None
+    for attempt in range(LLM_RETRY):
+        response = using_llm(prompt, stream if on_sequence and attempt == 0 else None)
         if response is not None:
             break
 
@@ -121,27 +142,31 @@ def get_repeated_message_sequences(protocol: str, message_types: dict) -> dict:
         raise Exception(f"Failed to generate repeated message sequence for {protocol}")
 
     # Filter out sequences that don't have any repeated message types
-    filtered_sequences = []
-    for sequence in response.sequences:
-        # Check if the sequence has any repeated message types
-        message_counts = {}
-        has_repetition = False
-        
-        for msg_type in sequence.type_sequence:
-            message_counts[msg_type] = message_counts.get(msg_type, 0) + 1
-            if message_counts[msg_type] > 1:
-                has_repetition = True
-                break
-                
-        if has_repetition:
-            filtered_sequences.append(sequence)
-    
+    filtered_sequences = [sequence for sequence in response.sequences if has_repeated_type(sequence.type_sequence)]
+
+    if on_sequence:
+        # Sequences kept below that the stream did not hand over: those of a retry, or all of them when none repeats
+        for i, sequence in enumerate(response.sequences):
+            kept = has_repeated_type(sequence.type_sequence) or not filtered_sequences
+            if kept and (i >= len(delivered) or not delivered[i]):
+                on_sequence(sequence.model_dump())
+
     # Update the response with only sequences that have repetitions
     if filtered_sequences:
         response.sequences = filtered_sequences
     else:
         print(f"Warning: No sequences with repeated message types found for {protocol}")
-    
+    return response
+
+@traced("4_repeated_message_sequences", "stage", label=lambda protocol, *args, **kwargs: protocol)
+def get_repeated_message_sequences(protocol: str, message_types: dict, on_sequence: Optional[Callable] = None,
+                                   shard_size: int = SEQUENCE_SHARD_SIZE) -> dict:
+    if shard_size and len(message_types["client_to_server_messages"]) > shard_size:
+        response = ProtocolSequences.model_validate(generate_sharded(protocol, message_types, shard_size,
+            lambda shard: request_repeated_message_sequences(protocol, shard, on_sequence).model_dump()))
+    else:
+        response = request_repeated_message_sequences(protocol, message_types, on_sequence)
+
     # Save the results to a JSON file
     os.makedirs(MESSAGE_SEQUENCE_OUTPUT_DIR, exist_ok=True)
     file_path = os.path.join(MESSAGE_SEQUENCE_OUTPUT_DIR, f"{protocol.lower()}_repeated_message_sequences.json")
@@ -3,8 +3,10 @@ import json
 
 from typing import Optional, List
 from pydantic import BaseModel
-from openai import OpenAI
-from utility.utility import MODEL, LLM_RETRY, LLM_RESULT_DIR
+from utility.utility import LLM_RETRY, LLM_RESULT_DIR, save_response
+from utility.routing import parse_completion
+from utility.budget import BudgetExhausted
+from utility.tracing import traced
 
 PROTOCOL_SPECIALIZED_STRUCTURE_OUTPUT_DIR = "protocol_specialized_structure_results"
 
@@ -88,11 +90,11 @@ Please adhere to the following instructions:
 Please produce the final JSON output accordingly, strictly following the above instructions.
 """
 
+@traced("2_specialized_structures", "llm", failed=lambda response: response is None)
 def using_llm(prompt: str) -> StructuredOutput:
-    client = OpenAI()
     try:
-        completion = client.beta.chat.completions.parse(
-            model=MODEL,
+        completion = parse_completion(
+            "2_specialized_structures",
             temperature=0.1,
             messages=[
                 {"role": "system", "content": "You are a network protocol expert with deep understanding of [PROTOCOL]."},
@@ -103,18 +105,15 @@ def using_llm(prompt: str) -> StructuredOutput:
         )
         response = completion.choices[0].message.parsed
 
-        index = 0
-        os.makedirs(os.path.join(LLM_RESULT_DIR, "2_specialized_structures"), exist_ok=True)
-        while os.path.exists(os.path.join(LLM_RESULT_DIR, "2_specialized_structures", f"response_{index}.json")):
-            index += 1
-        protocol_file = os.path.join(LLM_RESULT_DIR, "2_specialized_structures", f"response_{index}.json")
-        with open(protocol_file, "w", encoding="utf-8") as f:
-            json.dump(completion.model_dump(), f, indent=4, ensure_ascii=False)
+        save_response("2_specialized_structures", completion.model_dump())
         return response
+    except BudgetExhausted:
+        raise
     except Exception as e:
         print(f"Error processing protocol: {e}")
         return None
 
+@traced("2_specialized_structures", "item", label=lambda protocol, message_type: message_type["name"])
 def get_specialized_structure(protocol: str, message_type: dict) -> None:
     prompt = PROTOCOL_SPECIALIZED_STRUCTURE_PROMPT.replace("[PROTOCOL]", protocol)\
                                                   .replace("[TYPE]", message_type["name"])\
@@ -131,15 +130,22 @@ def get_specialized_structure(protocol: str, message_type: dict) -> None:
 
     return response.model_dump()
 
+@traced("2_specialized_structures", "stage", label=lambda protocol, message_types: protocol)
 def get_specialized_structures(protocol: str, message_types: dict) -> None:
     structures = {}
 
     for message_type in message_types["client_to_server_messages"]:
         try:
             structures[message_type["name"]] = get_specialized_structure(protocol, message_type)
+        except BudgetExhausted:
+            raise
         except Exception as e:
             print(f"Error processing message type {message_type['name']} in {protocol}: {e}")
-    
+
+    save_specialized_structures(protocol, structures)
+    return structures
+
+def save_specialized_structures(protocol: str, structures: dict) -> None:
     os.makedirs(PROTOCOL_SPECIALIZED_STRUCTURE_OUTPUT_DIR, exist_ok=True)
     file_path = os.path.join(PROTOCOL_SPECIALIZED_STRUCTURE_OUTPUT_DIR, f"{protocol.lower()}_specialized_structures.json")
     with open(file_path, "w", encoding="utf-8") as f:
@@ -150,5 +156,3 @@ def get_specialized_structures(protocol: str, message_types: dict) -> None:
     protocol_file = os.path.join(LLM_RESULT_DIR, f"2_{protocol.lower()}_specialized_structures.json")
     with open(protocol_file, "w", encoding="utf-8") as f:
         json.dump(structures, f, indent=4, ensure_ascii=False)
-
-    return structures
@@ -3,8 +3,11 @@ import json
 
 from typing import Optional, List
 from pydantic import BaseModel
-from openai import OpenAI
-from utility.utility import MODEL, LLM_RETRY, LLM_RESULT_DIR, SEQUENCE_REPEAT
+from utility.utility import LLM_RETRY, LLM_RESULT_DIR, SEQUENCE_REPEAT, save_response
+from utility.routing import parse_completion
+from utility.budget import BudgetExhausted
+from utility.tracing import traced
+from utility.encoding import encode_prompt, protocol_encoding
 
 STRUCTURED_SEED_MESSAGE_OUTPUT_DIR = "structured_seed_message_results"
 
@@ -26,7 +29,7 @@ Please adhere to the following instructions:
 1. **Seed Message Parsing:**
    - The original message has been preprocessed such that:
      - All printable ASCII characters remain as-is.
-     - All non-ASCII bytes are represented in `0xHH` hex notation (e.g., 0x00, 0x1A, 0xFF).
+     - [SEED_FORMAT]
    - Split the input into individual protocol-level messages based on [PROTOCOL] rules, such as:
      - Header fields
      - Length indicators
@@ -61,11 +64,11 @@ Parse the following seed message according to the [PROTOCOL] specification, stri
 """
 
 
+@traced("5_structured_seed_message", "llm", failed=lambda response: response is None)
 def using_llm(prompt: str) -> ParsedMessages:
-    client = OpenAI()
     try:
-        completion = client.beta.chat.completions.parse(
-            model=MODEL,
+        completion = parse_completion(
+            "5_structured_seed_message",
             messages=[
                 {"role": "system", "content": "You are a network protocol expert with deep understanding of [PROTOCOL]."},
                 {"role": "user", "content": prompt}
@@ -75,20 +78,17 @@ def using_llm(prompt: str) -> ParsedMessages:
         )   
         response = completion.choices[0].message.parsed
 
-        index = 0
-        os.makedirs(os.path.join(LLM_RESULT_DIR, "5_structured_seed_message"), exist_ok=True)
-        while os.path.exists(os.path.join(LLM_RESULT_DIR, "5_structured_seed_message", f"response_{index}.json")):
-            index += 1
-        protocol_file = os.path.join(LLM_RESULT_DIR, "5_structured_seed_message", f"response_{index}.json")
-        with open(protocol_file, "w", encoding="utf-8") as f:
-            json.dump(completion.model_dump(), f, indent=4, ensure_ascii=False)
+        save_response("5_structured_seed_message", completion.model_dump())
         return response
+    except BudgetExhausted:
+        raise
     except Exception as e:
         print(f"Error processing protocol: {e}")
         return None
 
+@traced("5_structured_seed_message", "item", label=lambda protocol, seed_message: f"{len(seed_message)} chars")
 def get_structured_seed_message(protocol: str, seed_message: str) -> None:
-    prompt = MESSAGE_PROMPT.replace("[PROTOCOL]", protocol)\
+    prompt = encode_prompt(MESSAGE_PROMPT, protocol_encoding(protocol)).replace("[PROTOCOL]", protocol)\
                            .replace("[SEED_MESSAGE]", seed_message)
     
     for _ in range(LLM_RETRY):
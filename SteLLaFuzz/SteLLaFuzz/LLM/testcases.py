@@ -1,10 +1,14 @@
 import os
 import json
 
-from typing import Optional, List
+from typing import Optional, List, Callable
 from pydantic import BaseModel
-from openai import OpenAI
-from utility.utility import MODEL, LLM_RETRY, LLM_RESULT_DIR, SEQUENCE_REPEAT
+from utility.utility import LLM_RETRY, LLM_RESULT_DIR, SEQUENCE_REPEAT, canonical_message, save_response
+from utility.encoding import encode_prompt, protocol_encoding
+from utility.routing import parse_completion
+from utility.budget import BudgetExhausted
+from utility.tracing import traced
+from utility.framing import FramingStats, repair_test_case, INVALID, FRAMING_RETRY
 
 TESTCASE_OUTPUT_DIR = "testcase_results"
 
@@ -47,10 +51,10 @@ Please adhere to the following instructions:
    - Create [NUMBER] message sequences following the order specified in the type sequence.
    - To increase diversity and maximize coverage, vary the message type sequence (e.g., by rearranging the order, repeating specific message types, or introducing edge-case scenarios) while keeping the valid parameters from seed message intact.
    - If additional messages are needed, generate them according to the protocol specification using the preserved valid parameters.
-   - For binary-based protocols, represent each message as a sequence of bytes in hex format separated by spaces (e.g., "0x1a 0x0b 0x34 0x00").
+   - For binary-based protocols, [BINARY_FORMAT].
    - For text-based protocols, generate the message in plain ASCII text using spaces, newlines, or CRLF as needed according to the protocol specification.
    - For each message in a sequence, map the message type to its corresponding structure from the type structure and generate realistic, concrete values for each defined field using the valid parameters from seed message.
-   - For each message, if is_binary is true, all messages MUST be written in a hex format separated by spaces.
+   - For each message, if is_binary is true, all messages MUST be written in [BINARY_RULE].
 
    **Example:**  
    For SMTP, an acceptable output would be:
@@ -129,34 +133,42 @@ Please generate multiple valid messages for [PROTOCOL] based on the above instru
 """
 
 
-def using_llm(prompt: str) -> TestCase:
-    client = OpenAI()
+def prompt_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": "You are a network protocol expert with deep understanding of [PROTOCOL]."},
+        {"role": "user", "content": prompt}
+    ]
+
+@traced("6_testcases", "llm", failed=lambda response: response is None)
+def using_llm(prompt: str, on_sequence: Optional[Callable] = None) -> TestCase:
     try:
-        completion = client.beta.chat.completions.parse(
-            model=MODEL,
+        completion = parse_completion(
+            "6_testcases",
             temperature=0.2,
-            messages=[
-                {"role": "system", "content": "You are a network protocol expert with deep understanding of [PROTOCOL]."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=prompt_messages(prompt),
             response_format=TestCase,
-            timeout=30
+            timeout=30,
+            array_key="sequences",
+            item_model=Sequence,
+            on_item=on_sequence
         )
         response = completion.choices[0].message.parsed
 
-        index = 0
-        os.makedirs(os.path.join(LLM_RESULT_DIR, "6_testcases"), exist_ok=True)
-        while os.path.exists(os.path.join(LLM_RESULT_DIR, "6_testcases", f"response_{index}.json")):
-            index += 1
-        protocol_file = os.path.join(LLM_RESULT_DIR, "6_testcases", f"response_{index}.json")
-        with open(protocol_file, "w", encoding="utf-8") as f:
-            json.dump(completion.model_dump(), f, indent=4, ensure_ascii=False)
+        save_response("6_testcases", completion.model_dump())
         return response
+    except BudgetExhausted:
+        raise
     except Exception as e:
         print(f"Error processing protocol: {e}")
         return None
 
-def get_test_case(protocol: str, type_sequence: List[str], specialized_structure: dict, seed_message: str) -> None:
+@traced("canonical_sequence", "codec")
+def canonical_sequence(sequence: dict, encoding: str) -> dict:
+    for message in sequence["messages"]:
+        message["message"] = canonical_message(message["message"], encoding)
+    return sequence
+
+def test_case_prompt(protocol: str, type_sequence: List[str], specialized_structure: dict, seed_message: str) -> str:
     sequence = ""
     structure = ""
     for i, type in enumerate(type_sequence):
@@ -175,31 +187,91 @@ def get_test_case(protocol: str, type_sequence: List[str], specialized_structure
     else:
         seed_message = ""
     
-    prompt = MESSAGE_PROMPT.replace("[PROTOCOL]", protocol)\
+    prompt = encode_prompt(MESSAGE_PROMPT, protocol_encoding(protocol)).replace("[PROTOCOL]", protocol)\
                            .replace("[SEQUENCE]", sequence)\
                            .replace("[STRUCTURE]", structure)\
                            .replace("[NUMBER]", str(SEQUENCE_REPEAT))\
                            .replace("[SEED_MESSAGE]", seed_message)
+    return prompt
 
-    
-    for _ in range(LLM_RETRY):
-        response = using_llm(prompt)
+@traced("6_testcases", "item", label=lambda protocol, type_sequence, *args, **kwargs: " -> ".join(type_sequence))
+def get_test_case(protocol: str, type_sequence: List[str], specialized_structure: dict, seed_message: str, on_sequence: Optional[Callable] = None) -> None:
+    prompt = test_case_prompt(protocol, type_sequence, specialized_structure, seed_message)
+    encoding = protocol_encoding(protocol)
+
+    # Only the first attempt is streamed; the sequences of a retry are handed over once its response is complete,
+    # from the first position the failed attempt did not reach, so no position is handed over twice
+    streamed = []
+    def stream(item: dict) -> None:
+        # Compact binary tokens are expanded before anything else sees the messages
+        streamed.append(item)
+        on_sequence(canonical_sequence(item, encoding))
+
+    response = None
+    for attempt in range(LLM_RETRY):
+        response = using_llm(prompt, stream if on_sequence and attempt == 0 else None)
         if response is not None:
             break
 
     if response is None:
-        raise Exception(f"Failed to generate message for {specialized_structure['message_type']} in {protocol}")
+        raise Exception(f"Failed to generate message for {' -> '.join(type_sequence)} in {protocol}")
 
-    return response.model_dump()
+    test_case = response.model_dump()
+    for sequence in test_case["sequences"]:
+        canonical_sequence(sequence, encoding)
+    if on_sequence and attempt > 0:
+        for sequence in test_case["sequences"][len(streamed):]:
+            on_sequence(sequence)
+    return test_case
 
-def get_test_cases(protocol: str, message_sequences: dict, specialized_structures: dict, seed_message: str) -> None:
-    test_cases = {}
-    for sequence in message_sequences["sequences"]:
+def generate_test_case(protocol: str, sequence: dict, specialized_structures: dict, seed_message: str,
+                       on_sequence: Optional[Callable], framing_stats: FramingStats) -> dict:
+    print(f"Processing message sequence: {sequence['sequenceId']}")
+    types = sequence["type_sequence"]
+    # Streamed sequences are handed over as soon as they arrive and their framing is valid;
+    # delivered keeps, per position, whether its sequence was handed over
+    delivered = []
+    def stream_valid(item: dict) -> None:
+        valid = INVALID not in repair_test_case(protocol, {"sequences": [item]}, types, specialized_structures)
+        delivered.append(valid)
+        if valid:
+            on_sequence(item)
+
+    test_case = get_test_case(protocol, types, specialized_structures, seed_message, stream_valid if on_sequence else None)
+    # Repair length and framing fields locally; only sequences with unrepairable messages are requested again
+    first = statuses = repair_test_case(protocol, test_case, types, specialized_structures)
+    rerequests = 0
+    replaced = False
+    while INVALID in statuses and rerequests < FRAMING_RETRY:
+        rerequests += 1
         try:
-            print(f"Processing message sequence: {sequence['sequenceId']}")
-            test_cases[sequence["sequenceId"]] = get_test_case(protocol, sequence["type_sequence"], specialized_structures, seed_message)
+            # Re-requests are not streamed, their sequences are handed over below if one of them is kept
+            retried = get_test_case(protocol, types, specialized_structures, seed_message)
+        except BudgetExhausted:
+            raise
         except Exception as e:
-            print(f"Error processing message sequence {sequence['sequenceId']} in {protocol}: {e}")
+            print(f"Error re-requesting message sequence {sequence['sequenceId']} in {protocol}: {e}")
+            continue
+        retried_statuses = repair_test_case(protocol, retried, types, specialized_structures)
+        if retried_statuses.count(INVALID) <= statuses.count(INVALID):
+            test_case, statuses, replaced = retried, retried_statuses, True
+    if on_sequence and replaced:
+        # The kept re-request fills the positions whose streamed sequence was invalid
+        for i, item in enumerate(test_case["sequences"]):
+            if (i >= len(delivered) or not delivered[i]) and \
+                    INVALID not in repair_test_case(protocol, {"sequences": [item]}, types, specialized_structures):
+                on_sequence(item)
+    framing_stats.record(first, statuses, rerequests)
+    return test_case
+
+def save_test_case_results(protocol: str, test_cases: dict, framing_stats: FramingStats) -> None:
+    if framing_stats.counts["messages"]:
+        rates = framing_stats.rates()
+        print(f"Binary message validity for {protocol}: generated {rates['generated']:.1%}, "
+              f"after repair {rates['after_repair']:.1%}, after re-request {rates['after_rerequest']:.1%}")
+        os.makedirs(LLM_RESULT_DIR, exist_ok=True)
+        with open(os.path.join(LLM_RESULT_DIR, f"{protocol.lower()}_framing.json"), "a", encoding="utf-8") as f:
+            f.write(json.dumps({"counts": framing_stats.counts, "rates": rates}) + "\n")
     
     os.makedirs(TESTCASE_OUTPUT_DIR, exist_ok=True)
     idx = 1
@@ -221,4 +293,27 @@ def get_test_cases(protocol: str, message_sequences: dict, specialized_structure
         json.dump(test_cases, f, indent=4, ensure_ascii=False)
     print(f"Saved results for {protocol} to {file_path}")
 
+@traced("6_testcases", "stage", label=lambda protocol, message_sequences, *args, **kwargs: f"{len(message_sequences['sequences'])} sequences")
+def get_test_cases(protocol: str, message_sequences: dict, specialized_structures: dict, seed_message: str, on_sequence: Optional[Callable] = None) -> None:
+    test_cases = {}
+    framing_stats = FramingStats()
+    for sequence in message_sequences["sequences"]:
+        try:
+            test_cases[sequence["sequenceId"]] = generate_test_case(protocol, sequence, specialized_structures, seed_message,
+                                                                    on_sequence, framing_stats)
+        except BudgetExhausted as e:
+            print(f"{e}, stopping with the test cases generated so far")
+            break
+        except Exception as e:
+            print(f"Error processing message sequence {sequence['sequenceId']} in {protocol}: {e}")
+
+    save_test_case_results(protocol, test_cases, framing_stats)
+    return test_cases
+
+def load_test_cases(protocol: str) -> List[dict]:
+    test_cases = []
+    for file in sorted(os.listdir(TESTCASE_OUTPUT_DIR)) if os.path.isdir(TESTCASE_OUTPUT_DIR) else []:
+        if file.startswith(f"{protocol.lower()}_testcases_") and file.endswith(".json"):
+            with open(os.path.join(TESTCASE_OUTPUT_DIR, file), "r", encoding="utf-8") as f:
+                test_cases.append(json.load(f))
     return test_cases
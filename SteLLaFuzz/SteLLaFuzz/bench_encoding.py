@@ -0,0 +1,117 @@
+import os
+import csv
+import json
+import time
+import argparse
+import statistics
+
+from LLM.testcases import get_test_case, load_test_cases
+from utility.utility import LLM_RESULT_DIR, convert_message_to_binary, load_seed_message
+from utility.encoding import WIRE_ENCODINGS, encode_bytes, configure
+from utility.framing import is_hex_message
+from utility.routing import LATENCY_LOG
+from regenerate import load_knowledge
+
+ENCODING_REPORT = os.path.join(LLM_RESULT_DIR, "encoding_bench.csv")
+
+def token_counter():
+    # tiktoken is optional; without it tokens are estimated at 4 characters each
+    try:
+        import tiktoken
+        encoder = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoder.encode(text))
+    except ImportError:
+        return lambda text: (len(text) + 3) // 4
+
+def binary_messages(test_case: dict) -> list:
+    return [convert_message_to_binary(message["message"]) for sequence in test_case["sequences"]
+            for message in sequence["messages"] if is_hex_message(message["message"])]
+
+def offline_report(protocol: str, encodings: list) -> list:
+    """Re-encode the binary messages of the saved test cases and count their characters and tokens."""
+    count_tokens = token_counter()
+    messages = [data for test_cases in load_test_cases(protocol) for test_case in test_cases.values()
+                for data in binary_messages(test_case)]
+    if not messages:
+        print(f"No saved binary messages for {protocol}")
+        return []
+    size = sum(len(data) for data in messages)
+    rows = []
+    for encoding in encodings:
+        texts = [encode_bytes(data, encoding) for data in messages]
+        tokens = sum(count_tokens(json.dumps(text)) for text in texts)
+        rows.append({"encoding": encoding, "messages": len(messages), "bytes": size,
+                     "chars": sum(len(text) for text in texts), "tokens": tokens, "tokens_per_byte": tokens / size})
+    return rows
+
+def log_records(offset: int) -> list:
+    if not os.path.exists(LATENCY_LOG):
+        return []
+    with open(LATENCY_LOG, "r", encoding="utf-8") as f:
+        f.seek(offset)
+        return [json.loads(line) for line in f if line.strip()]
+
+def online_report(protocol: str, encodings: list, rounds: int, sequence_count: int, seed_file: str) -> list:
+    """Request the same test cases in every encoding and compare output tokens, latency and failures."""
+    _, specialized_structures, sequences = load_knowledge(protocol)
+    sequences = [s for s in sequences if all(t in specialized_structures for t in s["type_sequence"])][:sequence_count]
+    rows = []
+    for encoding in encodings:
+        configure(protocol, encoding)
+        seed_message = load_seed_message(seed_file, encoding) if seed_file else None
+        latencies, tokens, sizes, failures = [], [], [], 0
+        for _ in range(rounds):
+            for sequence in sequences:
+                offset = os.path.getsize(LATENCY_LOG) if os.path.exists(LATENCY_LOG) else 0
+                start = time.time()
+                try:
+                    test_case = get_test_case(protocol, sequence["type_sequence"], specialized_structures, seed_message)
+                except Exception as e:
+                    print(f"Error generating {sequence['sequenceId']} with {encoding}: {e}")
+                    failures += 1
+                    continue
+                latencies.append(time.time() - start)
+                tokens.append(sum(record.get("completion_tokens") or 0 for record in log_records(offset)))
+                sizes.append(sum(len(data) for data in binary_messages(test_case)))
+        requests = rounds * len(sequences)
+        rows.append({
+            "encoding": encoding, "requests": requests, "failures": failures,
+            "latency_p50": statistics.median(latencies) if latencies else None,
+            "latency_max": max(latencies) if latencies else None,
+            "completion_tokens": statistics.mean(tokens) if tokens else None,
+            "binary_bytes": statistics.mean(sizes) if sizes else None,
+            "tokens_per_byte": sum(tokens) / sum(sizes) if sum(sizes) else None,
+        })
+    return rows
+
+def write_report(rows: list, report_path: str) -> None:
+    if not rows:
+        return
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    for row in rows:
+        print("  ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}" for key, value in row.items()))
+    print(f"Saved encoding report to {report_path}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare binary wire encodings by output tokens and latency")
+    parser.add_argument("--protocol", "-p", type=str, required=True)
+    parser.add_argument("--encodings", "-e", type=str, nargs="*", required=False, default=WIRE_ENCODINGS, choices=WIRE_ENCODINGS)
+    parser.add_argument("--rounds", "-n", type=int, required=False, default=3, help="Requests per sequence and encoding")
+    parser.add_argument("--sequences", type=int, required=False, default=3, help="Number of saved type sequences to request")
+    parser.add_argument("--seed_file", "-s", type=str, required=False, default=None, help="Seed file encoded into every prompt")
+    parser.add_argument("--offline", action="store_true", help="Only re-encode saved test cases, without LLM requests")
+    parser.add_argument("--report", "-r", type=str, required=False, default=ENCODING_REPORT)
+    args = parser.parse_args()
+
+    if args.offline:
+        rows = offline_report(args.protocol, args.encodings)
+    else:
+        rows = online_report(args.protocol, args.encodings, args.rounds, args.sequences, args.seed_file)
+    write_report(rows, args.report)
+
+if __name__ == "__main__":
+    main()
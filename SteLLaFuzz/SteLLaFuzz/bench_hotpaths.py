@@ -0,0 +1,67 @@
+import os
+import random
+import shutil
+
+from utility.utility import convert_message_to_binary, load_seed_messages
+from utility.corpus import Corpus
+from LLM.repeated_sequence import has_repeated_type
+
+# Seed and corpus hot-path cases; they are timed and checked against the baseline by
+# benchmark/scripts/analysis/profuzzbench_bench.py --suite stellafuzz, the same harness as the analysis cases
+
+# realistic: a generation run's output; stress: MB-scale binary seeds and a 50k-sequence corpus
+SIZES = {
+    "realistic": {"seeds": 50, "seed_kb": 4, "sequences": 5000, "messages": 6, "binary_kb": 16},
+    "stress": {"seeds": 20, "seed_kb": 2048, "sequences": 50000, "messages": 8, "binary_kb": 1024},
+}
+
+MESSAGE_TYPES = ["USER", "PASS", "CWD", "PWD", "TYPE", "PASV", "PORT", "LIST", "RETR", "STOR", "DELE", "MKD", "RMD", "QUIT"]
+
+def make_message(rng: random.Random, binary: bool) -> str:
+    # Text commands as the LLM writes them, or packets in the "0xHH" notation
+    if binary:
+        return " ".join(f"0x{rng.randrange(256):02x}" for _ in range(rng.randrange(8, 64)))
+    return f"{rng.choice(MESSAGE_TYPES)} arg{rng.randrange(1000)}"
+
+def make_test_case(rng: random.Random, messages: int) -> tuple:
+    type_sequence = [rng.choice(MESSAGE_TYPES) for _ in range(messages)]
+    sequence = {"sequenceId": str(rng.randrange(10 ** 6)),
+                "messages": [{"type": msg_type, "message": make_message(rng, rng.random() < 0.3)} for msg_type in type_sequence]}
+    return {"sequences": [sequence]}, type_sequence
+
+def make_cases(size: str, work_dir: str) -> dict:
+    config = SIZES[size]
+    rng = random.Random(1)
+
+    seed_dir = os.path.join(work_dir, "seeds")
+    os.makedirs(seed_dir, exist_ok=True)
+    for i in range(config["seeds"]):
+        with open(os.path.join(seed_dir, f"seed_{i}.raw"), "wb") as f:
+            f.write(rng.randbytes(config["seed_kb"] * 1024))
+
+    binary_message = " ".join(f"0x{b:02x}" for b in rng.randbytes(config["binary_kb"] * 1024))
+    text_messages = [make_message(rng, False) for _ in range(config["sequences"])]
+    test_cases = [make_test_case(rng, config["messages"]) for _ in range(config["sequences"])]
+    type_sequences = [type_sequence for _, type_sequence in test_cases]
+
+    def build_corpus():
+        corpus = Corpus()
+        for test_case, type_sequence in test_cases:
+            corpus.add_test_case(test_case, type_sequence)
+        return corpus
+
+    def write_corpus():
+        output_dir = os.path.join(work_dir, "corpus")
+        shutil.rmtree(output_dir, ignore_errors=True)
+        corpus.write_seeds(output_dir)
+
+    corpus = build_corpus()
+    return {
+        "convert_text": lambda: [convert_message_to_binary(message) for message in text_messages],
+        "convert_binary": lambda: convert_message_to_binary(binary_message),
+        "load_seed_messages": lambda: load_seed_messages(seed_dir),
+        "corpus_add": build_corpus,
+        # save_test_cases no longer writes seeds, Corpus.write_seeds does; this case stands in for it
+        "write_seeds": write_corpus,
+        "repeated_filter": lambda: [sequence for sequence in type_sequences if has_repeated_type(sequence)],
+    }
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import base64
+import socket
+import argparse
+import threading
+import socketserver
+
+from LLM.testcases import generate_test_case
+from LLM.structured_seed_message import get_structured_seed_message
+from utility.utility import sequence_to_bytes, load_seed_message
+from utility.encoding import protocol_encoding
+from utility.framing import FramingStats
+from regenerate import load_knowledge
+
+DEFAULT_SOCKET = "/tmp/stellafuzz.sock"
+
+class KnowledgeCache:
+    """Message types, specialized structures and sequences per protocol, loaded once and kept warm."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.protocols = {}
+
+    def get(self, protocol: str) -> tuple:
+        with self.lock:
+            if protocol not in self.protocols:
+                print(f"Loading knowledge for {protocol}")
+                self.protocols[protocol] = load_knowledge(protocol)
+            return self.protocols[protocol]
+
+def write_seed(data: bytes, output_dir: str) -> str:
+    # Same new_N.raw naming as Corpus.write_seeds; O_EXCL keeps concurrent jobs from sharing a name
+    os.makedirs(output_dir, exist_ok=True)
+    idx = 1
+    while True:
+        file_path = os.path.join(output_dir, f"new_{idx}.raw")
+        try:
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            break
+        except FileExistsError:
+            idx += 1
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return file_path
+
+class JobHandler(socketserver.StreamRequestHandler):
+    # One JSON request per line; every event of the job is sent back as one JSON line, ending with "done" or "error"
+
+    def send(self, event: dict) -> None:
+        self.wfile.write((json.dumps(event) + "\n").encode())
+        self.wfile.flush()
+
+    def send_sequences(self, test_case: dict, output_dir: str, sequence_id: str) -> int:
+        sent = 0
+        for sequence in test_case["sequences"]:
+            data = sequence_to_bytes(sequence)
+            if not data:
+                continue
+            event = {"event": "seed", "sequenceId": sequence_id, "size": len(data)}
+            if output_dir:
+                event["path"] = write_seed(data, output_dir)
+            else:
+                event["data"] = base64.b64encode(data).decode()
+            self.send(event)
+            sent += 1
+        return sent
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+                handler = getattr(self, f"job_{job.get('op')}", None)
+                if handler is None:
+                    raise Exception(f"Unknown op {job.get('op')}")
+                self.send(dict(handler(job), event="done"))
+                self.server.jobs += 1
+            except Exception as e:
+                self.send({"event": "error", "message": str(e)})
+
+    def job_status(self, job: dict) -> dict:
+        return {"protocols": sorted(self.server.cache.protocols), "jobs": self.server.jobs}
+
+    def job_load(self, job: dict) -> dict:
+        message_types, specialized_structures, sequences = self.server.cache.get(job["protocol"])
+        return {"types": len(message_types["client_to_server_messages"]), "structures": len(specialized_structures),
+                "sequences": len(sequences)}
+
+    def job_testcases(self, job: dict) -> dict:
+        # {"op": "testcases", "protocol": "FTP", "sequence": "<sequenceId>" or "type_sequence": [...], "count": N}
+        protocol = job["protocol"]
+        _, specialized_structures, sequences = self.server.cache.get(protocol)
+        if "type_sequence" in job:
+            sequence_id, type_sequence = job.get("sequence", "custom"), job["type_sequence"]
+        else:
+            matches = [s for s in sequences if str(s["sequenceId"]) == str(job["sequence"])]
+            if not matches:
+                raise Exception(f"Unknown sequence {job['sequence']} for {protocol}")
+            sequence_id, type_sequence = matches[0]["sequenceId"], matches[0]["type_sequence"]
+
+        # Each sequence is sent as soon as it is streamed and its framing is valid, before the rest of the response arrives
+        sent = []
+        framing_stats = FramingStats()
+        stream = lambda sequence: sent.append(self.send_sequences({"sequences": [sequence]}, job.get("output_dir"), sequence_id))
+        for _ in range(job.get("count", 1)):
+            try:
+                generate_test_case(protocol, {"sequenceId": sequence_id, "type_sequence": type_sequence},
+                                   specialized_structures, job.get("seed_message"), stream, framing_stats)
+            except Exception as e:
+                self.send({"event": "warning", "message": str(e)})
+        return {"seeds": sum(sent), "framing": framing_stats.counts}
+
+    def job_expand(self, job: dict) -> dict:
+        # {"op": "expand", "protocol": "FTP", "seed_file": "<path>"}: every known sequence, conditioned on the seed
+        protocol = job["protocol"]
+        _, specialized_structures, sequences = self.server.cache.get(protocol)
+        structured_seed_message = get_structured_seed_message(protocol, load_seed_message(job["seed_file"], protocol_encoding(protocol)))
+        sent = []
+        framing_stats = FramingStats()
+        for sequence in sequences:
+            stream = lambda item, sequence_id=sequence["sequenceId"]: sent.append(
+                self.send_sequences({"sequences": [item]}, job.get("output_dir"), sequence_id))
+            try:
+                generate_test_case(protocol, sequence, specialized_structures, structured_seed_message, stream, framing_stats)
+            except Exception as e:
+                self.send({"event": "warning", "message": str(e)})
+        return {"seeds": sum(sent), "framing": framing_stats.counts}
+
+class GenerationServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, JobHandler)
+        self.cache = KnowledgeCache()
+        self.jobs = 0
+
+def submit(socket_path: str, request: str) -> int:
+    # Minimal client: send one job and print its events as they arrive
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(request.strip().encode() + b"\n")
+        for line in sock.makefile("r"):
+            print(line, end="", flush=True)
+            event = json.loads(line)
+            if event["event"] in ("done", "error"):
+                return 0 if event["event"] == "done" else 1
+    return 1
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve seed generation jobs over a Unix domain socket")
+    parser.add_argument("--socket", "-S", type=str, required=False, default=DEFAULT_SOCKET)
+    parser.add_argument("--preload", "-p", type=str, nargs="*", required=False, default=[], help="Protocols to load at startup")
+    parser.add_argument("--submit", type=str, required=False, default=None, help="Send one JSON job to a running daemon and stream its events")
+    args = parser.parse_args()
+
+    if args.submit:
+        sys.exit(submit(args.socket, args.submit))
+
+    server = GenerationServer(args.socket)
+    for protocol in args.preload:
+        try:
+            server.cache.get(protocol)
+        except Exception as e:
+            print(f"Error loading protocol {protocol}: {e}")
+    print(f"Listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from LLM.protocol_types import request_protocol_message_types
+from LLM.specialized_structures import get_specialized_structure
+from utility.utility import MODEL
+from utility.knowledge import KNOWLEDGE_PACK_DIR, merge_message_types, merge_structures, write_knowledge_pack
+
+def collect(futures: list, label: str) -> list:
+    # Failed samples are left out of the vote
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            print(f"Error sampling {label}: {e}")
+    return results
+
+def build_pack(protocol: str, samples: int, consensus: str, workers: int, pack_dir: str) -> str:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        type_samples = collect([executor.submit(request_protocol_message_types, protocol) for _ in range(samples)],
+                               f"message types of {protocol}")
+        if not type_samples:
+            raise Exception(f"No message type samples for {protocol}")
+        quorum = len(type_samples) // 2 + 1 if consensus == "vote" else 1
+        message_types, type_votes = merge_message_types(type_samples, quorum)
+        print(f"{protocol}: {len(message_types['client_to_server_messages'])} message types agreed by {quorum}/{len(type_samples)} samples")
+
+        futures = {message_type["name"]: [executor.submit(get_specialized_structure, protocol, message_type) for _ in range(samples)]
+                   for message_type in message_types["client_to_server_messages"]}
+        specialized_structures = {}
+        field_votes = {}
+        for name, type_futures in futures.items():
+            structure_samples = collect(type_futures, f"{name} structure of {protocol}")
+            if not structure_samples:
+                continue
+            quorum = len(structure_samples) // 2 + 1 if consensus == "vote" else 1
+            specialized_structures[name], field_votes[name] = merge_structures(structure_samples, quorum)
+
+    meta = {"model": MODEL, "samples": samples, "consensus": consensus,
+            "votes": {"message_types": type_votes, "fields": field_votes}}
+    return write_knowledge_pack(pack_dir, protocol, message_types, specialized_structures, meta)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build versioned knowledge packs (message types and structures) from several LLM samples")
+    parser.add_argument("--protocol", "-p", type=str, nargs="+", required=True)
+    parser.add_argument("--output_dir", "-o", type=str, required=False, default=KNOWLEDGE_PACK_DIR)
+    parser.add_argument("--samples", "-n", type=int, required=False, default=3, help="Samples per stage and message type")
+    parser.add_argument("--consensus", type=str, required=False, default="vote", choices=["vote", "union"],
+                        help="vote keeps types and fields in a majority of samples, union keeps everything")
+    parser.add_argument("--workers", type=int, required=False, default=4, help="Concurrent LLM requests")
+    args = parser.parse_args()
+
+    for protocol in args.protocol:
+        try:
+            build_pack(protocol, args.samples, args.consensus, args.workers, args.output_dir)
+        except Exception as e:
+            print(f"Error building knowledge pack for {protocol}: {e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import re
+import json
+import time
+import argparse
+
+from LLM.protocol_types import get_protocol_message_types, PROTOCOL_TYPE_OUTPUT_DIR
+from LLM.specialized_structures import get_specialized_structures, PROTOCOL_SPECIALIZED_STRUCTURE_OUTPUT_DIR
+from LLM.normal_sequence import MESSAGE_SEQUENCE_OUTPUT_DIR
+from LLM.testcases import get_test_cases
+from utility.utility import sequence_to_bytes
+from utility.campaign import PlotDataTail, detect_plateau, message_type_counts, rank_sequences
+
+def load_json(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_knowledge(protocol: str) -> tuple:
+    # Reuse what stellafuzz.py saved before the campaign started, regenerate only what is missing
+    message_types = load_json(os.path.join(PROTOCOL_TYPE_OUTPUT_DIR, f"{protocol.lower()}_types.json"))
+    if message_types is None:
+        message_types = get_protocol_message_types(protocol)
+    specialized_structures = load_json(os.path.join(PROTOCOL_SPECIALIZED_STRUCTURE_OUTPUT_DIR, f"{protocol.lower()}_specialized_structures.json"))
+    if specialized_structures is None:
+        specialized_structures = get_specialized_structures(protocol, message_types)
+
+    sequences = []
+    for name in [f"{protocol.lower()}_message_sequences_{length}.json" for length in (1, 3, 5)] + [f"{protocol.lower()}_repeated_message_sequences.json"]:
+        result = load_json(os.path.join(MESSAGE_SEQUENCE_OUTPUT_DIR, name))
+        if result and result.get("sequences"):
+            sequences.extend(result["sequences"])
+    return message_types, specialized_structures, sequences
+
+def select_sequences(queue_dir: str, message_types: dict, specialized_structures: dict, sequences: list, count: int) -> list:
+    type_names = [t["name"] for t in message_types["client_to_server_messages"] if t["name"] in specialized_structures]
+    counts, transitions = message_type_counts(queue_dir, type_names)
+
+    # Types that no known sequence contains get a single-message sequence of their own
+    candidates = [s for s in sequences if all(t in specialized_structures for t in s["type_sequence"])]
+    covered = {t for s in candidates for t in s["type_sequence"]}
+    for name in type_names:
+        if name not in covered:
+            candidates.append({"sequenceId": f"single_{name}", "type_sequence": [name]})
+
+    selected = [sequence for _, sequence in rank_sequences(candidates, counts, transitions)[:count]]
+    rare = sorted(counts.items(), key=lambda item: item[1])[:5]
+    print(f"Least represented types in the queue: {', '.join(f'{name} ({c})' for name, c in rare)}")
+    return selected
+
+def next_queue_id(queue_dir: str) -> int:
+    ids = [int(match.group(1)) for match in (re.match(r"id:(\d{6})", f) for f in os.listdir(queue_dir)) if match]
+    return max(ids) + 1 if ids else 0
+
+def write_sync_seeds(test_cases: dict, queue_dir: str, round_index: int) -> int:
+    # afl-fuzz -M/-S imports <sync_dir>/<other id>/queue/id:NNNNNN* files with an id above the last synced one
+    os.makedirs(queue_dir, exist_ok=True)
+    idx = next_queue_id(queue_dir)
+    written = 0
+    for sequence_id, test_case in test_cases.items():
+        for sequence in test_case["sequences"]:
+            data = sequence_to_bytes(sequence)
+            if not data:
+                continue
+            name = re.sub(r"[^A-Za-z0-9_.-]", "_", str(sequence_id))
+            tmp_path = os.path.join(queue_dir, f".tmp_{idx}")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.rename(tmp_path, os.path.join(queue_dir, f"id:{idx:06d},orig:regen_{round_index}_{name}"))
+            idx += 1
+            written += 1
+    return written
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regenerate seeds into an AFL sync directory when a campaign plateaus")
+    parser.add_argument("--protocol", "-p", type=str, required=True)
+    parser.add_argument("--fuzzer_dir", "-f", type=str, required=True, help="Output folder of the running afl-fuzz instance (contains plot_data)")
+    parser.add_argument("--sync_dir", type=str, required=False, default=None, help="AFL sync directory (default: parent of fuzzer_dir)")
+    parser.add_argument("--sync_id", type=str, required=False, default="stellafuzz-regen")
+    parser.add_argument("--window", type=float, required=False, default=60, help="Plateau window in minutes")
+    parser.add_argument("--interval", type=float, required=False, default=60, help="Polling interval in seconds")
+    parser.add_argument("--sequences", type=int, required=False, default=5, help="Sequences generated per round")
+    parser.add_argument("--rounds", type=int, required=False, default=10, help="Maximum number of generation rounds")
+    args = parser.parse_args()
+
+    protocol = args.protocol
+    sync_dir = args.sync_dir or os.path.dirname(os.path.abspath(args.fuzzer_dir))
+    queue_dir = os.path.join(sync_dir, args.sync_id, "queue")
+    tail = PlotDataTail(os.path.join(args.fuzzer_dir, "plot_data"))
+    message_types, specialized_structures, sequences = load_knowledge(protocol)
+
+    last_round = 0
+    rounds = 0
+    while rounds < args.rounds:
+        tail.poll()
+        if detect_plateau(tail.rows, args.window * 60, last_round):
+            rounds += 1
+            print(f"Plateau detected at paths_total={tail.rows[-1]['paths_total']:.0f}, n_edges={tail.rows[-1]['n_edges']:.0f}; starting round {rounds}")
+            try:
+                selected = select_sequences(os.path.join(args.fuzzer_dir, "replayable-queue"), message_types,
+                                            specialized_structures, sequences, args.sequences)
+                test_cases = get_test_cases(protocol, {"sequences": selected}, specialized_structures, None)
+                written = write_sync_seeds(test_cases, queue_dir, rounds)
+                print(f"Wrote {written} seeds to {queue_dir}")
+            except Exception as e:
+                print(f"Error regenerating seeds for {protocol}: {e}")
+            last_round = tail.rows[-1]["unix_time"]
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
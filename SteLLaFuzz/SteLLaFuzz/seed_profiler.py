@@ -0,0 +1,118 @@
+import os
+import csv
+import glob
+import shutil
+import signal
+import argparse
+import statistics
+
+from utility.utility import LLM_RESULT_DIR
+from utility.replay import replay_corpus, is_error_code
+from utility.corpus import load_seed_lineage, SEED_LINEAGE_FILE
+
+SEED_COST_REPORT = os.path.join(LLM_RESULT_DIR, "seed_costs.csv")
+
+def classify_seed(protocol: str, result: dict, slow_limit: float) -> str:
+    # error and unreachable say nothing about the seed itself: the server could not be started or reached
+    returncode = result.get("returncode")
+    if returncode is not None and returncode < 0 and returncode != -signal.SIGTERM:
+        return "crash"
+    if result.get("error"):
+        return "error"
+    if not result["connected"]:
+        return "unreachable"
+    if result["timeout"]:
+        return "hang"
+    codes = [code for message_codes in result["codes"] for code in message_codes]
+    if not codes or all(is_error_code(protocol, code) for code in codes):
+        return "rejected"
+    if result["response_time"] > slow_limit:
+        return "slow"
+    return "ok"
+
+def profile_seeds(protocol: str, seed_dir: str, netinfo: str, server_command: str, clean_command: str,
+                  workers: int, pattern: str, slow_factor: float, response_timeout: float,
+                  seed_timeout: float, lineage: dict = None) -> list:
+    files = sorted(glob.glob(os.path.join(seed_dir, pattern)))
+    if not files:
+        print(f"No seeds matching {pattern} in {seed_dir}")
+        return []
+
+    print(f"Profiling {len(files)} seeds with {workers} workers")
+    results = replay_corpus(files, protocol, netinfo, workers, server_command, clean_command,
+                            response_timeout, seed_timeout, lineage)
+    # Slow is judged on the server's response time, not on the wall time that grows with the message count
+    median = statistics.median(result["response_time"] for result in results)
+    slow_limit = max(median * slow_factor, response_timeout)
+    for result in results:
+        result["status"] = classify_seed(protocol, result, slow_limit)
+    return results
+
+def write_report(results: list, report_path: str) -> None:
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "status", "messages", "responses", "wall_time", "response_time", "timeout", "returncode", "codes"])
+        for result in results:
+            codes = ";".join(",".join(str(code) for code in message_codes) for message_codes in result["codes"])
+            writer.writerow([os.path.basename(result["file"]), result["status"], result["messages"],
+                             sum(1 for response in result["responses"] if response),
+                             f"{result['wall_time']:.3f}", f"{result['response_time']:.3f}", int(result["timeout"]),
+                             result["returncode"], codes])
+    print(f"Saved seed cost report to {report_path}")
+
+def quarantine_seeds(results: list, quarantine_dir: str, statuses: list) -> int:
+    moved = 0
+    for result in results:
+        if result["status"] in statuses:
+            os.makedirs(quarantine_dir, exist_ok=True)
+            shutil.move(result["file"], os.path.join(quarantine_dir, os.path.basename(result["file"])))
+            moved += 1
+    return moved
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay generated seeds against the subject and quarantine costly ones")
+    parser.add_argument("--protocol", "-p", type=str, required=True)
+    parser.add_argument("--seed_dir", "-i", type=str, required=True, help="Directory with generated seeds (the afl-fuzz -i directory)")
+    parser.add_argument("--netinfo", "-N", type=str, required=True, help="Server address as in afl-fuzz -N; workers use consecutive ports")
+    parser.add_argument("--server", "-c", type=str, required=False, default=None, help="Server command, {port} is replaced by the worker port")
+    parser.add_argument("--clean", type=str, required=False, default=None, help="Command run before each replay (e.g., ftpclean)")
+    parser.add_argument("--workers", "-w", type=int, required=False, default=4)
+    parser.add_argument("--pattern", type=str, required=False, default="new_*.raw")
+    parser.add_argument("--slow_factor", type=float, required=False, default=5.0, help="Seeds whose response time exceeds this multiple of the median are slow")
+    parser.add_argument("--response_timeout", type=float, required=False, default=0.3)
+    parser.add_argument("--seed_timeout", type=float, required=False, default=10.0)
+    parser.add_argument("--lineage", type=str, required=False, default=SEED_LINEAGE_FILE,
+                        help="seed_lineage.json with the message boundaries of the generated seeds")
+    parser.add_argument("--quarantine_dir", "-q", type=str, required=False, default=None)
+    parser.add_argument("--quarantine", type=str, nargs="*", required=False, default=["crash", "hang", "rejected", "slow"],
+                        help="Statuses to move out of the seed directory")
+    parser.add_argument("--report", "-r", type=str, required=False, default=SEED_COST_REPORT)
+    args = parser.parse_args()
+
+    seed_dir = os.path.abspath(args.seed_dir)
+    quarantine_dir = args.quarantine_dir or os.path.join(os.path.dirname(seed_dir), "quarantine")
+
+    results = profile_seeds(args.protocol, seed_dir, args.netinfo, args.server, args.clean, args.workers,
+                            args.pattern, args.slow_factor, args.response_timeout, args.seed_timeout,
+                            load_seed_lineage(args.lineage))
+    if not results:
+        return
+    write_report(results, args.report)
+
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(", ".join(f"{status}: {count}" for status, count in sorted(counts.items())))
+    if counts.get("unreachable") or counts.get("error"):
+        print(f"Warning: {counts.get('unreachable', 0) + counts.get('error', 0)} seeds could not be replayed, check --netinfo and --server")
+
+    # Keep at least one seed so afl-fuzz can still start
+    if all(result["status"] in args.quarantine for result in results):
+        print("Warning: every seed would be quarantined, keeping the seed directory unchanged")
+        return
+    moved = quarantine_seeds(results, quarantine_dir, args.quarantine)
+    print(f"Moved {moved} seeds to {quarantine_dir}")
+
+if __name__ == "__main__":
+    main()
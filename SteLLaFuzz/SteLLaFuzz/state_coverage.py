@@ -0,0 +1,84 @@
+import os
+import json
+import glob
+import shutil
+import argparse
+
+from utility.utility import LLM_RESULT_DIR
+from utility.replay import replay_corpus
+from utility.corpus import load_seed_lineage, SEED_LINEAGE_FILE
+from utility.state_graph import state_sequence, induced_graph, greedy_cover, write_dot
+
+STATE_COVERAGE_REPORT = os.path.join(LLM_RESULT_DIR, "state_coverage.json")
+
+def estimate_state_coverage(protocol: str, seed_dir: str, netinfo: str, server_command: str, clean_command: str,
+                            workers: int, pattern: str, response_timeout: float, seed_timeout: float,
+                            lineage: dict = None) -> dict:
+    files = sorted(glob.glob(os.path.join(seed_dir, pattern)))
+    if not files:
+        print(f"No seeds matching {pattern} in {seed_dir}")
+        return {}
+
+    print(f"Replaying {len(files)} seeds with {workers} workers")
+    results = replay_corpus(files, protocol, netinfo, workers, server_command, clean_command,
+                            response_timeout, seed_timeout, lineage)
+    sequences = [state_sequence(protocol, result) for result in results]
+    nodes, edges = induced_graph(sequences)
+    # Shorter seeds are preferred when they cover the same states
+    selected = greedy_cover(sequences, [max(result["messages"], 1) for result in results])
+    selected_nodes, selected_edges = induced_graph([sequences[i] for i in selected])
+    return {
+        "protocol": protocol,
+        "seeds": len(files),
+        "connected": sum(1 for result in results if result["connected"]),
+        "n_nodes": len(nodes),
+        "n_edges": len(edges),
+        "selected": [os.path.basename(files[i]) for i in selected],
+        "selected_n_nodes": len(selected_nodes),
+        "selected_n_edges": len(selected_edges),
+        "nodes": sorted(nodes),
+        "edges": sorted(edges),
+        "state_sequences": {os.path.basename(file_path): states for file_path, states in zip(files, sequences)},
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Estimate the protocol states the seeds reach before fuzzing and select a minimal covering subset")
+    parser.add_argument("--protocol", "-p", type=str, required=True)
+    parser.add_argument("--seed_dir", "-i", type=str, required=True, help="Directory with generated seeds")
+    parser.add_argument("--netinfo", "-N", type=str, required=True, help="Server address as in afl-fuzz -N; workers use consecutive ports")
+    parser.add_argument("--server", "-c", type=str, required=False, default=None, help="Server command, {port} is replaced by the worker port")
+    parser.add_argument("--clean", type=str, required=False, default=None, help="Command run before each replay (e.g., ftpclean)")
+    parser.add_argument("--workers", "-w", type=int, required=False, default=4)
+    parser.add_argument("--pattern", type=str, required=False, default="*.raw")
+    parser.add_argument("--response_timeout", type=float, required=False, default=0.3)
+    parser.add_argument("--seed_timeout", type=float, required=False, default=10.0)
+    parser.add_argument("--lineage", type=str, required=False, default=SEED_LINEAGE_FILE,
+                        help="seed_lineage.json with the message boundaries of the generated seeds")
+    parser.add_argument("--output_dir", "-o", type=str, required=False, default=None, help="Copy the selected seeds to this directory")
+    parser.add_argument("--dot", type=str, required=False, default=None, help="Write the induced state graph in DOT format")
+    parser.add_argument("--report", "-r", type=str, required=False, default=STATE_COVERAGE_REPORT)
+    args = parser.parse_args()
+
+    report = estimate_state_coverage(args.protocol, args.seed_dir, args.netinfo, args.server, args.clean, args.workers,
+                                     args.pattern, args.response_timeout, args.seed_timeout,
+                                     load_seed_lineage(args.lineage))
+    if not report:
+        return
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Saved state coverage report to {args.report}")
+    print(f"{report['connected']}/{report['seeds']} seeds connected: n_nodes {report['n_nodes']}, n_edges {report['n_edges']}")
+    print(f"{len(report['selected'])} seeds cover n_nodes {report['selected_n_nodes']}, n_edges {report['selected_n_edges']}")
+
+    if args.dot:
+        write_dot(set(report["nodes"]), {tuple(edge) for edge in report["edges"]}, args.dot)
+        print(f"Saved state graph to {args.dot}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name in report["selected"]:
+            shutil.copy(os.path.join(args.seed_dir, name), os.path.join(args.output_dir, name))
+        print(f"Copied {len(report['selected'])} seeds to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -2,68 +2,196 @@ import os
 import json
 import argparse
 
-from LLM.protocol_types import get_protocol_message_types
-from LLM.specialized_structures import get_specialized_structures
+from LLM.protocol_types import get_protocol_message_types, save_protocol_message_types
+from LLM.specialized_structures import get_specialized_structures, save_specialized_structures
 from LLM.normal_sequence import get_message_sequences
 from LLM.repeated_sequence import get_repeated_message_sequences
-from LLM.testcases import get_test_cases
+from LLM.testcases import generate_test_case, save_test_case_results, test_case_prompt, prompt_messages
 from LLM.structured_seed_message import get_structured_seed_message
-from utility.utility import save_test_cases, load_seed_messages
+from utility.utility import load_seed_messages, SEQUENCE_SHARD_SIZE, SEED_CLUSTER_BUDGET, LLM_RESULT_DIR
+from utility.dictionary import build_dictionary, write_dictionary
+from utility.seed_clusters import select_seed_files
+from utility.knowledge import load_knowledge_pack
+from utility.similarity import deduplicate_test_cases, MinHashIndex, sequence_shingles
+from utility.corpus import Corpus, save_seed_lineage
+from utility.routing import configure, print_latency_report, expected_latency, RUN_ID, LATENCY_LOG
+from utility.tracing import enable as enable_tracing, span, print_summary, export_trace
+from utility.framing import FramingStats
+from utility.budget import BUDGET, BudgetExhausted, prioritize_work, configure as configure_budget
+from utility.encoding import WIRE_ENCODINGS, protocol_encoding, configure as configure_encoding
+
+# Stage of each sequence source, in the order of sources below
+SOURCE_STAGES = ["length_1", "length_3", "length_5", "repeated"]
 
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--protocol", "-p", type=str, required=True)
     parser.add_argument("--output_dir", "-o", type=str, required=False, default="results")
     parser.add_argument("--seed_messages", "-s", type=str, required=False, default=None, help="Path to initial seed messages")
+    parser.add_argument("--knowledge-pack", "-k", dest="knowledge_pack", type=str, required=False, default=None,
+                        help="Knowledge pack file or directory; its message types and structures replace steps 1-2")
+    parser.add_argument("--seed_budget", type=int, required=False, default=SEED_CLUSTER_BUDGET, help="Maximum number of representative seed files expanded by the LLM (0: one per message-type signature)")
+    parser.add_argument("--similarity", type=float, required=False, default=0.7, help="Near-duplicate threshold (estimated Jaccard) for generated sequences, 1 disables")
+    parser.add_argument("--dictionary", "-x", type=str, required=False, default=None, help="AFL dictionary path (default: <protocol>.dict next to output_dir)")
+    parser.add_argument("--shard_size", type=int, required=False, default=SEQUENCE_SHARD_SIZE, help="Split type lists longer than this into concurrent shards (0 disables)")
+    parser.add_argument("--stream", action="store_true", help="Write each test case sequence as soon as it is streamed")
+    parser.add_argument("--encoding", type=str, required=False, default=None, choices=WIRE_ENCODINGS, help="Wire format of binary bytes in prompts and responses (default: per protocol, hex_bytes)")
+    parser.add_argument("--token_budget", type=int, required=False, default=0, help="Stop issuing LLM calls once this many tokens are used (0: unlimited)")
+    parser.add_argument("--time_budget", type=float, required=False, default=0, help="Stop issuing LLM calls after this many seconds (0: unlimited)")
+    parser.add_argument("--routes", type=str, required=False, default=None, help="JSON file with per-stage model/endpoint routes")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate request when a call exceeds its stage's p90 latency")
+    parser.add_argument("--profile", type=str, nargs="?", required=False, default=None, const=f"{LLM_RESULT_DIR}/trace_{RUN_ID}.json",
+                        help="Record per-stage spans and write a Chrome trace (chrome://tracing, ui.perfetto.dev) to this path")
     args = parser.parse_args()
+    if args.profile:
+        enable_tracing()
+    configure(args.routes, args.hedge)
+    configure_encoding(args.protocol, args.encoding)
+    configure_budget(args.token_budget, args.time_budget, LATENCY_LOG)
 
     protocol = args.protocol
     output_dir = args.output_dir
     seed_messages_dir = args.seed_messages
-    
+    # Everything the dictionary step reads, so that it still runs (or is skipped) when an earlier step fails
+    message_types = None
+    specialized_structures = {}
+    message_sequences = {}
+    repeated_message_sequences = None
+    # Test cases of this run only; the dictionary is built from them even when a later step fails
+    test_cases = {}
+
     try:
-        result = load_seed_messages(seed_messages_dir) if seed_messages_dir else (None, None)
+        result = load_seed_messages(seed_messages_dir, protocol_encoding(protocol)) if seed_messages_dir else (None, None)
         file_names, seed_messages = result
-        # 1. Extract message types
-        message_types: dict = get_protocol_message_types(protocol)
+        pack = load_knowledge_pack(args.knowledge_pack, protocol) if args.knowledge_pack else None
+        if pack:
+            # 1-2. Message types and structures from the knowledge pack, saved where the later tools expect them
+            print(f"Using knowledge pack v{pack['version']} for {protocol} ({pack['sha256'][:12]})")
+            message_types: dict = pack["message_types"]
+            specialized_structures: dict = pack["specialized_structures"]
+            save_protocol_message_types(protocol, message_types)
+            save_specialized_structures(protocol, specialized_structures)
+        else:
+            # 1. Extract message types
+            message_types: dict = get_protocol_message_types(protocol)
 
-        # 2. Extract specialized structure
-        specialized_structures: dict = get_specialized_structures(protocol, message_types)
+            # 2. Extract specialized structure
+            specialized_structures: dict = get_specialized_structures(protocol, message_types)
         
         # 3. Generate message sequences
-        message_sequences = {}
-        message_sequences[1] = get_message_sequences(protocol, message_types, 1)
-        message_sequences[3] = get_message_sequences(protocol, message_types, 3)
-        message_sequences[5] = get_message_sequences(protocol, message_types, 5)
-        repeated_message_sequences: dict = get_repeated_message_sequences(protocol, message_types)
+        message_sequences[1] = get_message_sequences(protocol, message_types, 1, shard_size=args.shard_size)
+        message_sequences[3] = get_message_sequences(protocol, message_types, 3, shard_size=args.shard_size)
+        message_sequences[5] = get_message_sequences(protocol, message_types, 5, shard_size=args.shard_size)
+        repeated_message_sequences: dict = get_repeated_message_sequences(protocol, message_types, shard_size=args.shard_size)
 
         # 4. Generate test cases
-        seed_index = 0
+        writer = None
+        if args.stream:
+            # Near-duplicates are filtered online against the sequences written so far
+            stream_index = MinHashIndex(args.similarity)
+            stream_corpus = Corpus()
+            # Origin of the work item being generated, for the seed lineage
+            stream_origin = {}
+            def writer(sequence: dict) -> None:
+                if args.similarity < 1 and stream_index.add(sequence_shingles([m["message"] for m in sequence["messages"]])):
+                    return
+                stream_corpus.add_test_case({"sequences": [sequence]}, stream_origin.get("type_sequence"), stream_origin.get("origin"))
+                stream_corpus.write_seeds(output_dir, len(stream_corpus) - 1)
+
+        # Work items are (seed, sequence source, sequence), ordered so that message types and transitions not yet
+        # covered come first and variants last; with a budget the run stops cleanly after the last affordable item
+        seeds = [(None, None)]
         if seed_messages:
-            test_cases = {}
-            for file_name, seed_message in zip(file_names, seed_messages):
-                structured_seed_message = get_structured_seed_message(protocol, seed_message)
-                test_cases[seed_index] = get_test_cases(protocol, message_sequences[1], specialized_structures, structured_seed_message)
-                seed_index += 1
-                test_cases[seed_index] = get_test_cases(protocol, message_sequences[3], specialized_structures, structured_seed_message)
-                seed_index += 1
-                test_cases[seed_index] = get_test_cases(protocol, message_sequences[5], specialized_structures, structured_seed_message)
-                seed_index += 1
-                if repeated_message_sequences:
-                    test_cases[seed_index] = get_test_cases(protocol, repeated_message_sequences, specialized_structures, structured_seed_message)
-                    seed_index += 1
-                for seed_index, test_case in test_cases.items():
-                    save_test_cases(test_case, output_dir, file_name)
-        else:
-            test_cases = {}
-            test_cases[0] = get_test_cases(protocol, message_sequences, specialized_structures, None)
-            if repeated_message_sequences:
-                test_cases[1] = get_test_cases(protocol, repeated_message_sequences, specialized_structures, None)
-            for seed_index, test_case in test_cases.items():
-                save_test_cases(test_case, output_dir, "default")
+            # Seeds of the same session shape are expanded once, through one representative per cluster
+            selected = select_seed_files(protocol, seed_messages_dir, file_names, message_types, args.seed_budget)
+            seeds = [(file_names[i], seed_messages[i]) for i in selected]
+        sources = [message_sequences[1], message_sequences[3], message_sequences[5]]
+        if repeated_message_sequences:
+            sources.append(repeated_message_sequences)
+        work = [((seed_pos, source_pos, sequence), sequence["type_sequence"])
+                for seed_pos in range(len(seeds)) for source_pos, source in enumerate(sources) for sequence in source["sequences"]]
+
+        groups = {(seed_pos, source_pos): ({}, FramingStats()) for seed_pos in range(len(seeds)) for source_pos in range(len(sources))}
+        structured_seed_messages = {}
+        with span("6_testcases", "stage", item=f"{len(work)} sequences"):
+            for (seed_pos, source_pos, sequence), _ in prioritize_work(work):
+                file_name, seed_message = seeds[seed_pos]
+                if seed_message and seed_pos not in structured_seed_messages:
+                    try:
+                        structured_seed_messages[seed_pos] = get_structured_seed_message(protocol, seed_message)
+                    except BudgetExhausted as e:
+                        print(f"{e}, stopping with the test cases generated so far")
+                        break
+                    except Exception as e:
+                        print(f"Error parsing seed {file_name}: {e}")
+                        structured_seed_messages[seed_pos] = None
+                if seed_message and structured_seed_messages[seed_pos] is None:
+                    continue
+                group, framing_stats = groups[(seed_pos, source_pos)]
+                if writer:
+                    stream_origin["type_sequence"] = sequence["type_sequence"]
+                    stream_origin["origin"] = {"stage": SOURCE_STAGES[source_pos], "seed": file_name}
+                try:
+                    # Checked with the prompt and latency the call itself reserves, so the run stops here rather than inside it
+                    messages = prompt_messages(test_case_prompt(protocol, sequence["type_sequence"], specialized_structures,
+                                                                structured_seed_messages.get(seed_pos)))
+                    if BUDGET.exhausted(BUDGET.estimate("6_testcases", messages), expected_latency("6_testcases")):
+                        print(f"Budget exhausted ({BUDGET.report()}), stopping with the test cases generated so far")
+                        break
+                    group[sequence["sequenceId"]] = generate_test_case(protocol, sequence, specialized_structures,
+                                                                       structured_seed_messages.get(seed_pos), writer, framing_stats)
+                except BudgetExhausted as e:
+                    print(f"{e}, stopping with the test cases generated so far")
+                    break
+                except Exception as e:
+                    print(f"Error processing message sequence {sequence['sequenceId']} in {protocol}: {e}")
+
+        if writer:
+            save_seed_lineage(stream_corpus.lineage())
+
+        type_sequences = {}
+        origins = {}
+        for seed_index, ((seed_pos, source_pos), (group, framing_stats)) in enumerate(groups.items()):
+            if not group:
+                continue
+            save_test_case_results(protocol, group, framing_stats)
+            test_cases[seed_index] = group
+            type_sequences[seed_index] = {s["sequenceId"]: s["type_sequence"] for s in sources[source_pos]["sequences"]}
+            origins[seed_index] = {"stage": SOURCE_STAGES[source_pos], "seed": seeds[seed_pos][0]}
+
+        # 5. Drop near-duplicate sequences across lengths and seeds, then write what is left from one compact corpus
+        if not args.stream:
+            removed = deduplicate_test_cases(list(test_cases.values()), args.similarity)
+            print(f"Removed {removed} near-duplicate sequences (threshold {args.similarity})")
+            corpus = Corpus()
+            for index, test_case in test_cases.items():
+                for sequence_id, testcase in test_case.items():
+                    corpus.add_test_case(testcase, type_sequences[index].get(sequence_id), origins[index])
+            written = corpus.write_seeds(output_dir)
+            print(f"Wrote {written} seeds ({len(corpus.payload_offsets) - 1} distinct messages, {corpus.nbytes()} bytes) to {output_dir}")
+            save_seed_lineage(corpus.lineage())
 
     except Exception as e:
         print(f"Error processing protocol {protocol}: {e}")
 
+    # 6. Write an AFL dictionary from everything generated so far (outside output_dir, which afl-fuzz reads as seeds)
+    if not message_types:
+        print(f"No message types for {protocol}, skipping the dictionary")
+    else:
+        try:
+            dictionary_path = args.dictionary or os.path.join(os.path.dirname(os.path.abspath(output_dir)), f"{protocol.lower()}.dict")
+            sequences = [s for r in list(message_sequences.values()) + [repeated_message_sequences] if r for s in r.get("sequences") or []]
+            tokens = build_dictionary(message_types, specialized_structures, list(test_cases.values()), sequences)
+            write_dictionary(tokens, dictionary_path)
+            print(f"Saved {len(tokens)} dictionary tokens for {protocol} to {dictionary_path}")
+        except Exception as e:
+            print(f"Error writing dictionary for {protocol}: {e}")
+
+    print_latency_report(RUN_ID)
+    print(f"Used {BUDGET.report()}")
+    if args.profile:
+        print_summary()
+        export_trace(args.profile)
+
 if __name__ == "__main__":
     main()
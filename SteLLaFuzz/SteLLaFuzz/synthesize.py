@@ -0,0 +1,48 @@
+import os
+import glob
+import json
+import time
+import argparse
+
+from LLM.specialized_structures import PROTOCOL_SPECIALIZED_STRUCTURE_OUTPUT_DIR
+from LLM.normal_sequence import MESSAGE_SEQUENCE_OUTPUT_DIR
+from LLM.testcases import TESTCASE_OUTPUT_DIR, load_test_cases
+from utility.synthesizer import Synthesizer
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthesize structurally valid seed variants from saved LLM test cases")
+    parser.add_argument("--protocol", "-p", type=str, required=True)
+    parser.add_argument("--output_dir", "-o", type=str, required=False, default="results")
+    parser.add_argument("--count", "-n", type=int, required=False, default=1000, help="Number of distinct seeds to write")
+    parser.add_argument("--boundary_rate", type=float, required=False, default=0.1, help="Probability of a boundary value per field")
+    parser.add_argument("--seed", type=int, required=False, default=None, help="Random seed for reproducible corpora")
+    args = parser.parse_args()
+
+    protocol = args.protocol.lower()
+    with open(os.path.join(PROTOCOL_SPECIALIZED_STRUCTURE_OUTPUT_DIR, f"{protocol}_specialized_structures.json"), "r", encoding="utf-8") as f:
+        specialized_structures = json.load(f)
+
+    sequences = []
+    for file_path in glob.glob(os.path.join(MESSAGE_SEQUENCE_OUTPUT_DIR, f"{protocol}_*sequences*.json")):
+        with open(file_path, "r", encoding="utf-8") as f:
+            sequences.extend((json.load(f) or {}).get("sequences") or [])
+
+    synthesizer = Synthesizer(specialized_structures, args.seed, args.protocol)
+    for test_cases in load_test_cases(protocol):
+        synthesizer.add_test_cases(test_cases, sequences)
+    if not synthesizer.templates:
+        print(f"No saved test cases for {args.protocol} in {TESTCASE_OUTPUT_DIR}")
+        return
+    print(f"Compiled {len(synthesizer.grammars)} message grammars from {len(synthesizer.templates)} test case sequences")
+
+    start = time.time()
+    written = synthesizer.write_corpus(args.output_dir, args.count, args.boundary_rate)
+    elapsed = time.time() - start
+    print(f"Wrote {written} seeds to {args.output_dir} in {elapsed:.2f}s ({written / max(elapsed, 1e-6):.0f} seeds/s)")
+    framing = synthesizer.framing
+    if framing["valid"] + framing["repaired"] + framing["invalid"]:
+        print(f"Binary messages: {framing['valid']} valid, {framing['repaired']} repaired, {framing['invalid']} invalid "
+              f"({framing['dropped']} variants dropped)")
+
+if __name__ == "__main__":
+    main()
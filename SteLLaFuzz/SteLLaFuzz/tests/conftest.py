@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules are imported relative to the SteLLaFuzz folder (utility.*, LLM.*), as when running stellafuzz.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+import pytest
+
+from utility.budget import Budget, BudgetExhausted, prioritize_work, DEFAULT_COMPLETION_TOKENS
+
+def test_prioritize_work_new_types_then_transitions_then_variants():
+    items = [
+        ("a", ["USER", "PASS"]),
+        ("b", ["USER", "PASS"]),
+        ("c", ["PASS", "USER"]),
+        ("d", ["USER", "PASS", "LIST", "QUIT"]),
+        ("e", ["QUIT"]),
+    ]
+    # d brings the most new types; c still adds the PASS -> USER transition; a, b and e add nothing new
+    assert [key for key, _ in prioritize_work(items)] == ["d", "c", "a", "b", "e"]
+
+def test_prioritize_work_ties_keep_order():
+    items = [("a", ["X"]), ("b", ["Y"]), ("c", ["Z"])]
+    assert prioritize_work(items) == items
+    assert prioritize_work([]) == []
+
+def test_reserve_and_charge():
+    budget = Budget()
+    budget.configure(max_tokens=10000)
+    messages = [{"role": "user", "content": "x" * 400}]
+    estimate = budget.reserve("stage", messages)
+    assert estimate == 100 + DEFAULT_COMPLETION_TOKENS
+    assert budget.remaining_tokens() == 10000 - estimate
+    budget.charge("stage", estimate, 120, 300)
+    assert budget.used == 420 and budget.reserved == 0
+    # The next estimate follows the recorded completions
+    assert budget.estimate("stage", messages) == 100 + 300
+
+def test_reserve_raises_when_exhausted():
+    budget = Budget()
+    budget.configure(max_tokens=1000)
+    with pytest.raises(BudgetExhausted):
+        budget.reserve("stage", [{"role": "user", "content": "x"}])
+    # An unlimited budget never runs out
+    budget.configure()
+    assert budget.reserve("stage", [{"role": "user", "content": "x"}]) > 0
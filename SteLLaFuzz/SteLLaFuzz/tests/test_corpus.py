@@ -0,0 +1,59 @@
+import os
+
+from utility.corpus import Corpus, MESSAGE_TERMINATOR, write_vectored, load_seed_lineage, save_seed_lineage
+from utility.replay import split_messages
+
+def test_payloads_are_stored_once():
+    corpus = Corpus()
+    corpus.add_sequence([b"USER a", b"PASS b"], ["USER", "PASS"], "s1")
+    corpus.add_sequence([b"USER a", b"QUIT"], ["USER"], "s2")
+    assert len(corpus) == 2
+    assert bytes(corpus.buffer) == b"USER aPASS bQUIT"
+    # Messages beyond the type sequence get the empty type
+    assert corpus.type_sequence(1) == ["USER", ""]
+    assert corpus.sequence_bytes(0) == b"USER a\r\nPASS b\r\n"
+    assert corpus.message_sizes(1) == [6, 4]
+
+def test_add_test_case_converts_messages():
+    corpus = Corpus()
+    test_case = {"sequences": [{"sequenceId": "s1", "messages": [{"message": "USER anonymous"}, {"message": "0x00 0x0d 0x0a"}]}]}
+    assert corpus.add_test_case(test_case, ["USER", "BIN"], {"stage": "3_message_sequences", "seed": "seed_1.raw"}) == 1
+    assert corpus.sequence_bytes(0) == b"USER anonymous\r\n\x00\r\n\r\n"
+
+def test_write_seeds_and_lineage(tmp_path):
+    corpus = Corpus()
+    corpus.add_sequence([b"\x00\r\n\x01", b"PING"], ["BIN", "PING"], "s1", {"stage": "5_test_cases", "seed": "seed_1.raw"})
+    corpus.add_sequence([], [], "empty")
+    corpus.add_sequence([b"QUIT"], ["QUIT"], "s3")
+    # An existing seed is never overwritten
+    (tmp_path / "new_1.raw").write_bytes(b"old")
+    assert corpus.write_seeds(str(tmp_path)) == 2
+    assert (tmp_path / "new_1.raw").read_bytes() == b"old"
+    assert sorted(os.listdir(tmp_path)) == ["new_1.raw", "new_2.raw", "new_3.raw"]
+
+    lineage = corpus.lineage()
+    assert set(lineage) == {"new_2.raw", "new_3.raw"}
+    origin = lineage["new_2.raw"]
+    assert origin["stage"] == "5_test_cases" and origin["seed"] == "seed_1.raw" and origin["sequence"] == "s1"
+    assert origin["type_sequence"] == ["BIN", "PING"]
+    # The sizes give the real message boundaries of a binary seed containing CRLF
+    data = (tmp_path / "new_2.raw").read_bytes()
+    assert split_messages(data, "SSH", origin["sizes"]) == [b"\x00\r\n\x01" + MESSAGE_TERMINATOR, b"PING" + MESSAGE_TERMINATOR]
+    assert split_messages(data, "SSH", origin["sizes"], terminated=False) == [b"\x00\r\n\x01", b"PING"]
+    assert split_messages(data, "SSH") == [data]
+
+def test_save_seed_lineage_merges(tmp_path):
+    file_path = str(tmp_path / "llm_outputs" / "seed_lineage.json")
+    save_seed_lineage({"new_1.raw": {"stage": "a"}}, file_path)
+    save_seed_lineage({"new_2.raw": {"stage": "b"}}, file_path)
+    assert load_seed_lineage(file_path) == {"new_1.raw": {"stage": "a"}, "new_2.raw": {"stage": "b"}}
+    assert load_seed_lineage(str(tmp_path / "missing.json")) == {}
+
+def test_write_vectored(tmp_path):
+    buffers = [b"ab", memoryview(b"cde"), b"", b"f"] * 1000
+    fd = os.open(tmp_path / "out", os.O_WRONLY | os.O_CREAT)
+    try:
+        assert write_vectored(fd, list(buffers)) == 6000
+    finally:
+        os.close(fd)
+    assert (tmp_path / "out").read_bytes() == b"abcdef" * 1000
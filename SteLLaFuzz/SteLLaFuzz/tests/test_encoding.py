@@ -0,0 +1,56 @@
+import pytest
+
+from utility.encoding import HEX_BYTES, HEX, BASE64, decode_token, encode_bytes, encode_seed, has_compact_tokens
+from utility.utility import convert_message_to_binary, canonical_message
+
+BINARY = bytes(range(256))
+
+def test_decode_token():
+    assert decode_token("hex:00ff1a", HEX) == b"\x00\xff\x1a"
+    assert decode_token("b64:ABr/", BASE64) == b"\x00\x1a\xff"
+    # Only tokens of the given encoding, with a body, that decode
+    assert decode_token("hex:00ff", HEX_BYTES) is None
+    assert decode_token("hex:00ff", BASE64) is None
+    assert decode_token("b64:ABr/", HEX) is None
+    assert decode_token("hex:", HEX) is None
+    assert decode_token("b64:", BASE64) is None
+    assert decode_token("hex:xyz", HEX) is None
+    assert decode_token("b64:A", BASE64) is None
+    assert decode_token("USER", HEX) is None
+
+@pytest.mark.parametrize("encoding", [HEX_BYTES, HEX, BASE64])
+def test_binary_round_trip(encoding):
+    assert convert_message_to_binary(encode_bytes(BINARY, encoding), encoding) == BINARY
+
+@pytest.mark.parametrize("encoding", [HEX_BYTES, HEX, BASE64])
+@pytest.mark.parametrize("message", [
+    "USER anonymous",
+    "RETR 0xfile",
+    "STOR hex:",
+    "SITE hex:zz b64:",
+    "MAIL FROM:<a@b.c>",
+])
+def test_text_round_trip(encoding, message):
+    # Text stays text in every encoding, including prefixes without a valid body
+    assert not has_compact_tokens(message, encoding)
+    assert convert_message_to_binary(message, encoding) == message.encode()
+    assert canonical_message(message, encoding) == message
+
+def test_text_tokens_of_other_encodings():
+    assert convert_message_to_binary("USER hex:abcd", HEX_BYTES) == b"USER hex:abcd"
+    assert convert_message_to_binary("USER hex:abcd", BASE64) == b"USER hex:abcd"
+    assert convert_message_to_binary("USER hex:abcd", HEX) == b"USER\xab\xcd"
+    assert convert_message_to_binary("PASS b64:ABr/", HEX) == b"PASS b64:ABr/"
+    assert convert_message_to_binary("PASS b64:ABr/", BASE64) == b"PASS\x00\x1a\xff"
+
+def test_mixed_message():
+    message = "SSH-2.0-client 0x0d 0x0a"
+    assert convert_message_to_binary(message) == b"SSH-2.0-client\r\n"
+    assert canonical_message("KEX hex:0d0a", HEX) == "0x4b 0x45 0x58 0x0d 0x0a"
+
+@pytest.mark.parametrize("encoding", [HEX, BASE64])
+def test_encode_seed_round_trip(encoding):
+    data = b"\x00\x00\x00\x1c\x14" + b"SSH-2.0-OpenSSH" + b"\xff\x01"
+    text = encode_seed(data, encoding)
+    assert "SSH-2.0-OpenSSH" in text
+    assert convert_message_to_binary(" ".join(text.split()), encoding) == data
@@ -0,0 +1,73 @@
+from utility.framing import (VALID, REPAIRED, INVALID, check_message, frame_message, to_hex_message)
+
+def ssh_packet(payload: bytes) -> bytes:
+    padding_length = 8 - (len(payload) + 5) % 8
+    if padding_length < 4:
+        padding_length += 8
+    return (len(payload) + padding_length + 1).to_bytes(4, "big") + bytes([padding_length]) + payload + b"\x00" * padding_length
+
+def test_ssh():
+    packet = ssh_packet(b"\x14" + b"A" * 16)
+    assert frame_message("SSH", packet, None) == (VALID, packet)
+    assert frame_message("ssh", b"SSH-2.0-OpenSSH_8.0\r\n", None)[0] == VALID
+    # Wrong packet_length: the payload is kept and the framing recomputed
+    broken = b"\x00\x00\x00\xff" + packet[4:]
+    assert frame_message("SSH", broken, None) == (REPAIRED, packet)
+    assert frame_message("SSH", b"\x00\x01", None)[0] == INVALID
+
+def test_tls():
+    handshake = b"\x01" + (4).to_bytes(3, "big") + b"\x03\x03\xaa\xbb"
+    record = b"\x16\x03\x01" + len(handshake).to_bytes(2, "big") + handshake
+    assert frame_message("TLS", record, None) == (VALID, record)
+    # Record length and inner handshake length both wrong
+    broken = bytearray(record)
+    broken[3:5] = (200).to_bytes(2, "big")
+    broken[6:9] = (100).to_bytes(3, "big")
+    assert frame_message("TLS", bytes(broken), None) == (REPAIRED, record)
+    # Two records stay two records
+    alert = b"\x15\x03\x03\x00\x02\x01\x00"
+    assert frame_message("TLS", record + alert, None) == (VALID, record + alert)
+    assert frame_message("TLS", b"\x99\x03\x01\x00\x00", None)[0] == INVALID
+
+def test_dtls():
+    body = b"\xfe\xfd" + b"\x00" * 4
+    handshake = b"\x01" + len(body).to_bytes(3, "big") + b"\x00\x00" + b"\x00\x00\x00" + len(body).to_bytes(3, "big") + body
+    record = b"\x16\xfe\xfd" + b"\x00" * 8 + len(handshake).to_bytes(2, "big") + handshake
+    assert frame_message("DTLS", record, None) == (VALID, record)
+    # fragment_length of an unfragmented message follows the body
+    broken = bytearray(record)
+    broken[13 + 9:13 + 12] = (1).to_bytes(3, "big")
+    assert frame_message("DTLS", bytes(broken), None) == (REPAIRED, record)
+
+def test_dicom():
+    pdu = b"\x01\x00" + (4).to_bytes(4, "big") + b"abcd"
+    assert frame_message("DICOM", pdu, None) == (VALID, pdu)
+    assert frame_message("DICOM", b"\x01\x00\x00\x00\x00\x09abcd", None) == (REPAIRED, pdu)
+    assert frame_message("DICOM", b"\x09\x00\x00\x00\x00\x00", None)[0] == INVALID
+
+def test_dns():
+    question = b"\x07example\x03com\x00" + b"\x00\x01\x00\x01"
+    query = b"\x12\x34\x01\x00" + b"\x00\x01" + b"\x00" * 6 + question
+    assert frame_message("DNS", query, None) == (VALID, query)
+    assert frame_message("DNS", query[:4] + b"\x00\x03" + query[6:], None) == (REPAIRED, query)
+    assert frame_message("DNS", query[:-3], None)[0] == INVALID
+
+def test_structure_length_field():
+    structure = {"fields": [
+        {"name": "Message Length", "fixed_byte_length": 2, "description": "Number of bytes following this field"},
+        {"name": "Body", "fixed_byte_length": None},
+    ]}
+    assert frame_message("MQTT", b"\x00\x03abc", structure) == (VALID, b"\x00\x03abc")
+    assert frame_message("MQTT", b"\x00\x09abc", structure) == (REPAIRED, b"\x00\x03abc")
+    fixed = {"fields": [{"name": "Code", "fixed_byte_length": 2}]}
+    assert frame_message("MQTT", b"\x00\x01", fixed)[0] == VALID
+    assert frame_message("MQTT", b"\x00\x01\x02", fixed)[0] == INVALID
+    assert frame_message("MQTT", b"anything", None)[0] == VALID
+
+def test_check_message():
+    # Text messages are never framed
+    assert check_message("SSH", "USER anonymous", None) == (VALID, "USER anonymous")
+    pdu = b"\x01\x00" + (4).to_bytes(4, "big") + b"abcd"
+    broken = to_hex_message(b"\x01\x00\x00\x00\x00\x09abcd")
+    assert check_message("DICOM", broken, None) == (REPAIRED, to_hex_message(pdu))
+    assert check_message("DICOM", to_hex_message(pdu), None) == (VALID, to_hex_message(pdu))
@@ -0,0 +1,41 @@
+from utility.similarity import (MinHashIndex, choose_bands, cluster_sequences, deduplicate_test_cases,
+                                sequence_shingles)
+
+def test_sequence_shingles_keep_message_boundaries():
+    # The same tokens split differently across messages are different sequences
+    assert sequence_shingles(["USER a", "PASS b"]) != sequence_shingles(["USER", "a PASS b"])
+    assert sequence_shingles([]) == {""}
+
+def test_choose_bands_midpoint_near_threshold():
+    bands, rows = choose_bands(64, 0.7)
+    assert bands * rows == 64
+    assert abs((1 / bands) ** (1 / rows) - 0.7) < 0.1
+
+def test_minhash_estimates_jaccard():
+    index = MinHashIndex(threshold=0.9, num_perm=128)
+    a = {f"s{i}" for i in range(100)}
+    b = {f"s{i}" for i in range(20, 120)}
+    assert index.add(a) == []
+    # True Jaccard similarity is 80/120, below the threshold
+    assert index.add(b) == []
+    assert abs(index.similarity(0, 1) - 80 / 120) < 0.15
+    assert index.add(set(a)) == [0]
+
+def test_cluster_sequences():
+    login = ["USER anonymous", "PASS guest", "LIST /", "RETR file.txt", "QUIT"]
+    sequences = [login, list(login), ["HELO example.com", "MAIL FROM:<a@b>", "DATA", "QUIT now please"]]
+    clusters = sorted(cluster_sequences(sequences, threshold=0.7))
+    assert sorted(map(sorted, clusters)) == [[0, 1], [2]]
+
+def test_deduplicate_test_cases():
+    def sequence(messages):
+        return {"messages": [{"message": message} for message in messages]}
+    login = ["USER anonymous", "PASS guest", "LIST /", "QUIT"]
+    test_cases = [
+        {"seed_1": {"sequences": [sequence(login), sequence(["EPSV", "NLST", "HELP SITE"])]}},
+        {"seed_2": {"sequences": [sequence(login)]}},
+    ]
+    assert deduplicate_test_cases(test_cases, threshold=0.7) == 1
+    assert sum(len(testcase["sequences"]) for test_case in test_cases for testcase in test_case.values()) == 2
+    # A threshold of 1 disables deduplication
+    assert deduplicate_test_cases(test_cases, threshold=1) == 0
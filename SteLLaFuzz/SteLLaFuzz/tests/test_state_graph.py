@@ -0,0 +1,24 @@
+from utility.state_graph import state_sequence, induced_graph, greedy_cover, cover_elements
+
+def test_state_sequence():
+    result = {"connected": True, "banner": b"220 ready\r\n", "responses": [b"331 pw\r\n", b"", b"230 ok\r\n"]}
+    assert state_sequence("FTP", result) == [0, 220, 331, 230]
+    assert state_sequence("FTP", {"connected": False, "responses": []}) == []
+
+def test_induced_graph():
+    nodes, edges = induced_graph([[0, 220, 331, 331], [0, 220, 530]])
+    assert nodes == {0, 220, 331, 530}
+    assert edges == {(0, 220), (220, 331), (331, 331), (220, 530)}
+
+def test_greedy_cover_covers_everything():
+    sequences = [[0, 1], [0, 1, 2], [0, 3], [0, 1, 2, 3], [], [0, 3, 4]]
+    costs = [1.0] * len(sequences)
+    selected = greedy_cover(sequences, costs)
+    covered = set().union(*(cover_elements(sequences[i]) for i in selected))
+    assert covered == set().union(*(cover_elements(states) for states in sequences))
+    assert selected == [3, 5]
+
+def test_greedy_cover_prefers_cheaper_on_ties():
+    sequences = [[0, 1, 2], [0, 1, 2], [0, 1]]
+    assert greedy_cover(sequences, [2.0, 1.0, 0.1]) == [1]
+    assert greedy_cover([], []) == []
@@ -0,0 +1,83 @@
+import json
+
+from utility.streaming import JsonArrayStream
+from LLM import normal_sequence, repeated_sequence
+
+RESPONSE = {
+    "protocol": "FTP",
+    "sequences": [
+        {"sequenceId": "s1", "type_sequence": ["USER", "PASS"]},
+        {"sequenceId": "s{2}", "type_sequence": ["LIST \"a]\" \\", "QUIT"], "details": {"nested": [1, {"x": "}"}]}},
+    ],
+    "explanation": "[\"sequences\"]",
+}
+
+def test_json_array_stream_any_chunking():
+    text = json.dumps(RESPONSE)
+    for size in (1, 3, 7, len(text)):
+        stream = JsonArrayStream("sequences")
+        items = []
+        for i in range(0, len(text), size):
+            items.extend(stream.feed(text[i:i + size]))
+        assert items == RESPONSE["sequences"]
+
+def test_json_array_stream_other_keys():
+    # Arrays under other keys, nested ones included, are not streamed
+    stream = JsonArrayStream("sequences")
+    text = json.dumps({"other": [{"a": 1}], "meta": {"sequences": [{"b": 2}]}, "sequences": [{"c": 3}]})
+    assert stream.feed(text) == [{"c": 3}]
+
+def test_json_array_stream_element_completes_early():
+    stream = JsonArrayStream("sequences")
+    assert stream.feed('{"protocol": "FTP", "sequences": [{"sequenceId": "s1"') == []
+    assert stream.feed('}, {"sequ') == [{"sequenceId": "s1"}]
+
+def fake_llm(module, responses):
+    # using_llm that streams every sequence of the response to on_sequence, like parse_completion does
+    calls = iter(responses)
+    def using_llm(prompt, on_sequence=None):
+        response = next(calls)
+        if response is not None and on_sequence:
+            for sequence in response["sequences"]:
+                on_sequence(sequence)
+        return module.ProtocolSequences.model_validate(response) if response is not None else None
+    return using_llm
+
+def sequences(*type_sequences):
+    return {"protocol": "FTP", "explanation": "", "sequences": [
+        {"sequenceId": str(i), "type_sequence": types} for i, types in enumerate(type_sequences)]}
+
+MESSAGE_TYPES = {"client_to_server_messages": [{"name": "USER"}, {"name": "PASS"}]}
+
+def test_normal_sequence_hands_over_kept_sequences_once(monkeypatch):
+    response = sequences(["USER", "PASS"], ["USER"], ["PASS", "USER"])
+    monkeypatch.setattr(normal_sequence, "using_llm", fake_llm(normal_sequence, [response]))
+    handed = []
+    result = normal_sequence.request_message_sequences("FTP", MESSAGE_TYPES, 2, handed.append)
+    assert [s["sequenceId"] for s in handed] == ["0", "2"]
+    assert [s.sequenceId for s in result.sequences] == ["0", "2"]
+
+def test_normal_sequence_retry_is_not_streamed(monkeypatch):
+    # The first attempt fails after streaming nothing; the retry is handed over once, at the end
+    response = sequences(["USER", "PASS"], ["PASS", "USER"])
+    monkeypatch.setattr(normal_sequence, "using_llm", fake_llm(normal_sequence, [None, response]))
+    handed = []
+    normal_sequence.request_message_sequences("FTP", MESSAGE_TYPES, 2, handed.append)
+    assert [s["sequenceId"] for s in handed] == ["0", "1"]
+
+def test_repeated_sequence_fallback_hands_over_everything(monkeypatch):
+    # Without any repeated type the response is kept unfiltered, so every sequence is handed over
+    response = sequences(["USER", "PASS"], ["PASS"])
+    monkeypatch.setattr(repeated_sequence, "using_llm", fake_llm(repeated_sequence, [response]))
+    handed = []
+    result = repeated_sequence.request_repeated_message_sequences("FTP", MESSAGE_TYPES, handed.append)
+    assert sorted(s["sequenceId"] for s in handed) == ["0", "1"]
+    assert len(result.sequences) == 2
+
+def test_repeated_sequence_filter(monkeypatch):
+    response = sequences(["USER", "USER", "PASS"], ["PASS"], ["PASS", "PASS"])
+    monkeypatch.setattr(repeated_sequence, "using_llm", fake_llm(repeated_sequence, [response]))
+    handed = []
+    result = repeated_sequence.request_repeated_message_sequences("FTP", MESSAGE_TYPES, handed.append)
+    assert [s["sequenceId"] for s in handed] == ["0", "2"]
+    assert [s.sequenceId for s in result.sequences] == ["0", "2"]
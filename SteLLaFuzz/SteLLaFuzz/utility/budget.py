@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import threading
+from typing import List, Optional
+
+# Completion tokens assumed for a stage before any usage has been recorded for it
+DEFAULT_COMPLETION_TOKENS = 1500
+# Prompt tokens are estimated from characters until the API reports them
+CHARS_PER_TOKEN = 4
+
+class BudgetExhausted(Exception):
+    pass
+
+class Budget:
+    """Global token and wall-clock budget; every LLM call reserves its estimated cost before it is sent."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.configure()
+
+    def configure(self, max_tokens: int = 0, max_seconds: float = 0, history_file: Optional[str] = None) -> None:
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.start = time.time()
+        self.used = 0
+        self.reserved = 0
+        self.completion_tokens = {}
+        self.prompt_tokens = {}
+        if history_file and os.path.exists(history_file):
+            with open(history_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record.get("completion_tokens"):
+                        self.completion_tokens.setdefault(record["stage"], []).append(record["completion_tokens"])
+
+    def estimate(self, stage: str, messages: Optional[list] = None) -> int:
+        # Prompt size (the stage's mean prompt when the messages are not known yet) plus its mean completion so far
+        if messages is not None:
+            prompt = sum(len(message["content"]) for message in messages) // CHARS_PER_TOKEN
+        else:
+            prompts = self.prompt_tokens.get(stage)
+            prompt = sum(prompts[-50:]) // len(prompts[-50:]) if prompts else 0
+        history = self.completion_tokens.get(stage)
+        return prompt + (sum(history[-50:]) // len(history[-50:]) if history else DEFAULT_COMPLETION_TOKENS)
+
+    def remaining_tokens(self) -> Optional[int]:
+        return self.max_tokens - self.used - self.reserved if self.max_tokens else None
+
+    def exhausted(self, needed: int = 0, latency: float = 0) -> bool:
+        if self.max_seconds and time.time() - self.start + latency > self.max_seconds:
+            return True
+        return bool(self.max_tokens) and self.remaining_tokens() < needed
+
+    def reserve(self, stage: str, messages: list, latency: float = 0) -> int:
+        estimate = self.estimate(stage, messages)
+        with self.lock:
+            if self.exhausted(estimate, latency):
+                raise BudgetExhausted(f"Budget exhausted before {stage} (used {self.used} tokens in {time.time() - self.start:.0f}s)")
+            self.reserved += estimate
+        return estimate
+
+    def charge(self, stage: str, estimate: int, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        with self.lock:
+            self.reserved -= estimate
+            if prompt_tokens is None or completion_tokens is None:
+                self.used += estimate
+                return
+            self.used += prompt_tokens + completion_tokens
+            self.prompt_tokens.setdefault(stage, []).append(prompt_tokens)
+            self.completion_tokens.setdefault(stage, []).append(completion_tokens)
+
+    def report(self) -> str:
+        tokens = f"{self.used}/{self.max_tokens}" if self.max_tokens else f"{self.used}"
+        seconds = f"{time.time() - self.start:.0f}/{self.max_seconds:.0f}s" if self.max_seconds else f"{time.time() - self.start:.0f}s"
+        return f"{tokens} tokens, {seconds}"
+
+BUDGET = Budget()
+
+def configure(max_tokens: int = 0, max_seconds: float = 0, history_file: Optional[str] = None) -> None:
+    BUDGET.configure(max_tokens, max_seconds, history_file)
+
+def prioritize_work(items: List[tuple]) -> List[tuple]:
+    """Order (key, type_sequence) work items: new message types first, then new transitions, then variants.
+
+    Items are picked greedily; ties keep the original order, so earlier seeds and shorter sequences go first.
+    """
+    covered_types = set()
+    covered_transitions = set()
+    remaining = list(range(len(items)))
+    ordered = []
+    while remaining:
+        def gain(i):
+            types = items[i][1]
+            new_types = len(set(types) - covered_types)
+            new_transitions = len(set(zip(types, types[1:])) - covered_transitions)
+            return (new_types, new_transitions, -i)
+        best = max(remaining, key=gain)
+        new_types, new_transitions, _ = gain(best)
+        if not new_types and not new_transitions:
+            # Nothing new left: the rest are variants in their original order
+            ordered.extend(items[i] for i in sorted(remaining))
+            break
+        covered_types.update(items[best][1])
+        covered_transitions.update(zip(items[best][1], items[best][1][1:]))
+        ordered.append(items[best])
+        remaining.remove(best)
+    return ordered
@@ -0,0 +1,105 @@
+import os
+import re
+import struct
+from typing import List, Optional, Tuple
+
+# plot_data columns (AFLNet appends n_nodes and n_edges)
+PLOT_DATA_COLUMNS = ["unix_time", "cycles_done", "cur_path", "paths_total", "pending_total",
+                     "pending_favs", "map_size", "unique_crashes", "unique_hangs", "max_depth",
+                     "execs_per_sec", "n_nodes", "n_edges"]
+
+class PlotDataTail:
+    """Reads the rows appended to a running campaign's plot_data since the last call."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+        self.partial = b""
+        self.rows = []
+
+    def poll(self) -> List[dict]:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return []
+        self.offset += len(data)
+        data = self.partial + data
+        end = data.rfind(b"\n") + 1
+        self.partial = data[end:]
+
+        new_rows = []
+        for line in data[:end].decode(errors="replace").splitlines():
+            if not line or line.startswith("#"):
+                continue
+            try:
+                values = [float(value.strip().rstrip("%")) for value in line.split(",")]
+            except ValueError:
+                continue
+            values += [0.0] * (len(PLOT_DATA_COLUMNS) - len(values))
+            new_rows.append(dict(zip(PLOT_DATA_COLUMNS, values)))
+        self.rows.extend(new_rows)
+        return new_rows
+
+def detect_plateau(rows: List[dict], window: float, since: float = 0) -> bool:
+    # A plateau is a window (in seconds) in which neither paths_total nor n_edges grew
+    if not rows:
+        return False
+    start = rows[-1]["unix_time"] - window
+    if start < since or rows[0]["unix_time"] > start:
+        return False
+    before = [row for row in rows if row["unix_time"] <= start][-1]
+    return (rows[-1]["paths_total"] <= before["paths_total"]
+            and rows[-1]["n_edges"] <= before["n_edges"])
+
+def load_replayable_messages(path: str) -> List[bytes]:
+    # replayable-* files store every message as a native u32 size followed by its bytes
+    with open(path, "rb") as f:
+        data = f.read()
+    messages = []
+    offset = 0
+    while offset + 4 <= len(data):
+        size = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        messages.append(data[offset:offset + size])
+        offset += size
+    return messages
+
+def classify_message(message: bytes, type_names: List[str]) -> Optional[str]:
+    # Text protocols: the message type is the leading keyword (e.g., USER, MAIL FROM, OPTIONS)
+    text = message.lstrip().decode("latin-1").upper()
+    best = None
+    for name in type_names:
+        keyword = re.split(r"[\s_:]", name.upper())[0]
+        if keyword and re.match(re.escape(keyword) + r"(\s|:|$)", text) and (best is None or len(name) > len(best)):
+            best = name
+    return best
+
+def message_type_counts(queue_dir: str, type_names: List[str]) -> Tuple[dict, dict]:
+    """Count message types and type transitions over every input in a replayable-queue."""
+    counts = {name: 0 for name in type_names}
+    transitions = {}
+    if not os.path.isdir(queue_dir):
+        return counts, transitions
+    for file in os.listdir(queue_dir):
+        if not file.startswith("id"):
+            continue
+        types = [classify_message(message, type_names) for message in load_replayable_messages(os.path.join(queue_dir, file))]
+        types = [t for t in types if t]
+        for current, following in zip(types, types[1:]):
+            transitions[(current, following)] = transitions.get((current, following), 0) + 1
+        for t in types:
+            counts[t] += 1
+    return counts, transitions
+
+def rank_sequences(sequences: List[dict], counts: dict, transitions: dict) -> List[Tuple[float, dict]]:
+    """Score type sequences by how under-represented their message types and transitions are in the queue."""
+    ranked = []
+    for sequence in sequences:
+        types = sequence["type_sequence"]
+        score = sum(1.0 / (1 + counts.get(t, 0)) for t in types)
+        score += sum(1.0 / (1 + transitions.get(pair, 0)) for pair in zip(types, types[1:]))
+        ranked.append((score / max(len(types), 1), sequence))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return ranked
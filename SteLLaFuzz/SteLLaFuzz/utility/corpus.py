@@ -0,0 +1,179 @@
+import os
+import json
+import array
+from typing import List, Optional
+
+from utility.utility import LLM_RESULT_DIR, convert_message_to_binary
+from utility.tracing import traced, annotate
+
+# Seed file name -> the stage, seed file and sequence it was generated from (copied into the benchmark archives
+# with llm_outputs, where profuzzbench_lineage.py follows AFL's orig:/src: names back to it)
+SEED_LINEAGE_FILE = os.path.join(LLM_RESULT_DIR, "seed_lineage.json")
+
+# Every message of a seed is terminated with CRLF, as the fuzzers' replay format expects
+MESSAGE_TERMINATOR = b"\r\n"
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+def write_vectored(fd: int, buffers: list) -> int:
+    # os.writev in chunks of IOV_MAX buffers; a partial write continues from the first unwritten byte
+    total = 0
+    i = 0
+    while i < len(buffers):
+        written = os.writev(fd, buffers[i:i + IOV_MAX])
+        total += written
+        while i < len(buffers) and written >= len(buffers[i]):
+            written -= len(buffers[i])
+            i += 1
+        if written:
+            buffers[i] = buffers[i][written:]
+    return total
+
+class Corpus:
+    """Test case sequences in flat arrays instead of nested dicts.
+
+    Message types are interned, every distinct message payload is stored once in a shared buffer and a sequence
+    is a run of (payload, type) ids. Seeds are written from memoryviews of the buffer, without joining messages.
+    """
+
+    __slots__ = ("types", "type_ids", "buffer", "payload_offsets", "payload_ids",
+                 "message_payloads", "message_types", "sequence_offsets", "sequence_ids", "origins", "seed_names", "next_seed")
+
+    def __init__(self):
+        self.types = []
+        self.type_ids = {}
+        self.buffer = bytearray()
+        self.payload_offsets = array.array("Q", [0])
+        # hash of a payload -> its id; on a collision the payload is simply stored again
+        self.payload_ids = {}
+        self.message_payloads = array.array("I")
+        self.message_types = array.array("I")
+        self.sequence_offsets = array.array("Q", [0])
+        self.sequence_ids = []
+        self.origins = []
+        # sequence index -> name of the seed file it was written to
+        self.seed_names = {}
+        self.next_seed = 1
+
+    def __len__(self) -> int:
+        return len(self.sequence_offsets) - 1
+
+    def intern_type(self, name: str) -> int:
+        type_id = self.type_ids.get(name)
+        if type_id is None:
+            type_id = self.type_ids[name] = len(self.types)
+            self.types.append(name)
+        return type_id
+
+    def add_payload(self, data: bytes) -> int:
+        key = hash(data)
+        payload_id = self.payload_ids.get(key)
+        if payload_id is not None:
+            with memoryview(self.buffer) as view:
+                if view[self.payload_offsets[payload_id]:self.payload_offsets[payload_id + 1]] == data:
+                    return payload_id
+        payload_id = len(self.payload_offsets) - 1
+        self.buffer += data
+        self.payload_offsets.append(len(self.buffer))
+        self.payload_ids.setdefault(key, payload_id)
+        return payload_id
+
+    def add_sequence(self, messages: List[bytes], type_sequence: List[str], sequence_id: str = "",
+                     origin: Optional[dict] = None) -> int:
+        # Messages beyond the type sequence get the empty type
+        for i, data in enumerate(messages):
+            self.message_payloads.append(self.add_payload(data))
+            self.message_types.append(self.intern_type(type_sequence[i] if i < len(type_sequence) else ""))
+        self.sequence_offsets.append(len(self.message_payloads))
+        self.sequence_ids.append(sequence_id)
+        self.origins.append(origin)
+        return len(self) - 1
+
+    def add_test_case(self, test_case: dict, type_sequence: Optional[List[str]] = None, origin: Optional[dict] = None) -> int:
+        # Every message is converted to binary once, here; returns the number of sequences added
+        for sequence in test_case["sequences"]:
+            self.add_sequence([convert_message_to_binary(message["message"]) for message in sequence["messages"]],
+                              type_sequence or [], sequence.get("sequenceId", ""), origin)
+        return len(test_case["sequences"])
+
+    def type_sequence(self, index: int) -> List[str]:
+        start, end = self.sequence_offsets[index], self.sequence_offsets[index + 1]
+        return [self.types[type_id] for type_id in self.message_types[start:end]]
+
+    def sequence_views(self, view: memoryview, index: int) -> list:
+        buffers = []
+        for payload_id in self.message_payloads[self.sequence_offsets[index]:self.sequence_offsets[index + 1]]:
+            buffers.append(view[self.payload_offsets[payload_id]:self.payload_offsets[payload_id + 1]])
+            buffers.append(MESSAGE_TERMINATOR)
+        return buffers
+
+    def sequence_bytes(self, index: int) -> bytes:
+        with memoryview(self.buffer) as view:
+            buffers = self.sequence_views(view, index)
+            data = b"".join(buffers)
+            del buffers
+        return data
+
+    def nbytes(self) -> int:
+        arrays = [self.payload_offsets, self.message_payloads, self.message_types, self.sequence_offsets]
+        return len(self.buffer) + sum(a.itemsize * len(a) for a in arrays)
+
+    def create_seed(self, output_dir: str) -> tuple:
+        # Seeds are named new_N.raw; O_EXCL keeps other writers (the daemon, a second run) from sharing a name
+        while True:
+            file_name = f"new_{self.next_seed}.raw"
+            self.next_seed += 1
+            try:
+                return os.open(os.path.join(output_dir, file_name), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644), file_name
+            except FileExistsError:
+                continue
+
+    @traced("write_seeds", "io", label=lambda self, output_dir, *args: output_dir)
+    def write_seeds(self, output_dir: str, start: int = 0, end: Optional[int] = None) -> int:
+        """Write sequences [start, end) as seed files, one vectored write each; returns the number of files."""
+        os.makedirs(output_dir, exist_ok=True)
+        written = 0
+        size = 0
+        with memoryview(self.buffer) as view:
+            for index in range(start, len(self) if end is None else end):
+                buffers = self.sequence_views(view, index)
+                if not buffers:
+                    continue
+                fd, self.seed_names[index] = self.create_seed(output_dir)
+                try:
+                    size += write_vectored(fd, buffers)
+                finally:
+                    os.close(fd)
+                # The views must be gone before the buffer can grow again
+                del buffers
+                written += 1
+        annotate(bytes=size)
+        return written
+
+    def message_sizes(self, index: int) -> List[int]:
+        start, end = self.sequence_offsets[index], self.sequence_offsets[index + 1]
+        return [self.payload_offsets[payload_id + 1] - self.payload_offsets[payload_id]
+                for payload_id in self.message_payloads[start:end]]
+
+    def lineage(self) -> dict:
+        # Written seed file -> origin of its sequence; AFL names the seed's queue entry id:N,orig:<file>.
+        # The message sizes are the seed's real message boundaries, which CRLF is not for binary payloads
+        return {name: {**(self.origins[index] or {}), "sequence": self.sequence_ids[index],
+                       "type_sequence": self.type_sequence(index), "sizes": self.message_sizes(index)}
+                for index, name in self.seed_names.items()}
+
+def load_seed_lineage(file_path: str = SEED_LINEAGE_FILE) -> dict:
+    if not file_path or not os.path.exists(file_path):
+        return {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_seed_lineage(lineage: dict, file_path: str = SEED_LINEAGE_FILE) -> None:
+    # Merged into the existing file: later runs add seeds to the same output directory
+    existing = load_seed_lineage(file_path)
+    existing.update(lineage)
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(existing, f, indent=4, ensure_ascii=False)
@@ -0,0 +1,115 @@
+import re
+from typing import List, Optional
+
+from utility.synthesizer import Synthesizer, DELIMITER_FIELD
+from utility.tracing import traced, annotate
+
+# afl-fuzz rejects dictionary tokens longer than MAX_DICT_FILE and uses at most
+# MAX_DET_EXTRAS of them in the deterministic stages (config.h)
+MAX_DICT_FILE = 128
+MAX_DET_EXTRAS = 200
+
+# Weight of a token by the role it was found in
+ROLE_WEIGHTS = {"keyword": 8, "code": 6, "literal": 4, "field": 1}
+
+QUOTED_LITERAL = re.compile(r"""['"`]([^'"`\n]{1,128})['"`]""")
+HEX_LITERAL = re.compile(r"\b0x([0-9a-fA-F]{2,16})\b")
+TEXT_TOKEN = re.compile(rb"[^\s:=;,<>()\[\]{}\"']+[:=]?")
+
+class TokenCounter:
+    def __init__(self):
+        self.scores = {}
+        self.roles = {}
+
+    def add(self, token: bytes, role: str) -> None:
+        if not token or len(token) > MAX_DICT_FILE or not token.strip():
+            return
+        self.scores[token] = self.scores.get(token, 0) + ROLE_WEIGHTS[role]
+        if ROLE_WEIGHTS[role] > ROLE_WEIGHTS.get(self.roles.get(token), 0):
+            self.roles[token] = role
+
+    def ranked(self, max_tokens: int) -> List[tuple]:
+        # Higher score first, shorter token first on ties (cheaper to splice in)
+        items = sorted(self.scores.items(), key=lambda item: (-item[1], len(item[0]), item[0]))
+        return [(token, self.roles[token], score) for token, score in items[:max_tokens]]
+
+def decode_literal(literal: str) -> bytes:
+    # Structures spell control characters as escapes (e.g. "\\r\\n")
+    try:
+        return literal.encode("latin-1").decode("unicode_escape").encode("latin-1")
+    except (UnicodeError, ValueError):
+        return literal.encode()
+
+def encode_code(code: str, binary: bool) -> Optional[bytes]:
+    code = code.strip()
+    if not code:
+        return None
+    if binary:
+        try:
+            value = int(code, 16) if code.lower().startswith("0x") else int(code)
+        except ValueError:
+            return None
+        return value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big") if value >= 0 else None
+    return code.encode()
+
+def build_dictionary(message_types: dict, specialized_structures: dict, test_cases: List[dict],
+                     sequences: Optional[List[dict]] = None, max_tokens: int = MAX_DET_EXTRAS) -> List[tuple]:
+    """Rank protocol tokens from message types, structure literals and generated messages."""
+    synthesizer = Synthesizer(specialized_structures)
+    for test_case in test_cases:
+        synthesizer.add_test_cases(test_case, sequences)
+    binary_types = {name for name, grammar in synthesizer.grammars.items() if grammar.binary}
+    binary_protocol = len(binary_types) * 2 > len(synthesizer.grammars)
+
+    counter = TokenCounter()
+    for message_type in message_types["client_to_server_messages"]:
+        grammar = synthesizer.grammars.get(message_type["name"])
+        binary = grammar.binary if grammar else binary_protocol
+        if not binary:
+            counter.add(message_type["name"].encode(), "keyword")
+        if message_type.get("code"):
+            code = encode_code(message_type["code"], binary)
+            if code:
+                counter.add(code, "code")
+
+    for name, structure in specialized_structures.items():
+        for field in structure.get("fields") or []:
+            text = " ".join(str(field.get(key) or "") for key in ("description", "details"))
+            for literal in QUOTED_LITERAL.findall(text):
+                if not DELIMITER_FIELD.fullmatch(literal.strip()):
+                    counter.add(decode_literal(literal), "literal")
+            for value in HEX_LITERAL.findall(text):
+                counter.add(bytes.fromhex(value if len(value) % 2 == 0 else "0" + value), "literal")
+
+    # Every generated message counts, so frequent concrete values rank higher
+    for name, grammar in synthesizer.grammars.items():
+        for values in grammar.samples:
+            for i, value in enumerate(values):
+                if grammar.binary:
+                    # Only fixed-length fields are literals; variable bodies are payload
+                    if len(values) == len(grammar.slots) and grammar.slots[i]:
+                        counter.add(value, "field")
+                elif i == 0:
+                    counter.add(value, "keyword")
+                else:
+                    for token in TEXT_TOKEN.findall(value):
+                        counter.add(token, "field")
+    return counter.ranked(max_tokens)
+
+def escape_token(token: bytes) -> str:
+    escaped = ""
+    for byte in token:
+        if byte in (0x22, 0x5c):
+            escaped += "\\" + chr(byte)
+        elif 32 <= byte < 127:
+            escaped += chr(byte)
+        else:
+            escaped += f"\\x{byte:02x}"
+    return escaped
+
+@traced("write_dictionary", "io")
+def write_dictionary(tokens: List[tuple], file_path: str) -> None:
+    with open(file_path, "w", encoding="ascii") as f:
+        for i, (token, role, score) in enumerate(tokens):
+            f.write(f'{role}_{i}="{escape_token(token)}"\n')
+        annotate(bytes=f.tell())
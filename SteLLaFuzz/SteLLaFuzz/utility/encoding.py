@@ -0,0 +1,114 @@
+import re
+import base64
+import binascii
+from typing import Optional
+
+# Wire formats for binary bytes in prompts and responses:
+#   hex_bytes: one "0xHH" token per byte (the original format)
+#   hex:       contiguous hex per field or message, e.g. "hex:0000001c14"
+#   base64:    base64 per field or message, e.g. "b64:AAAAHBQ="
+HEX_BYTES, HEX, BASE64 = "hex_bytes", "hex", "base64"
+WIRE_ENCODINGS = [HEX_BYTES, HEX, BASE64]
+DEFAULT_ENCODING = HEX_BYTES
+TOKEN_PREFIXES = {HEX: "hex:", BASE64: "b64:"}
+
+# Printable runs shorter than this are kept inside the surrounding binary token
+MIN_TEXT_RUN = 4
+
+# Instruction, rule and seed description per encoding for the test case and seed parsing prompts
+BINARY_FORMATS = {
+    HEX_BYTES: (
+        'represent each message as a sequence of bytes in hex format separated by spaces (e.g., "0x1a 0x0b 0x34 0x00")',
+        "a hex format separated by spaces",
+        "All non-ASCII bytes are represented in `0xHH` hex notation (e.g., 0x00, 0x1A, 0xFF).",
+    ),
+    HEX: (
+        'represent the bytes as contiguous lowercase hex prefixed with "hex:", either one token for the whole message '
+        'or one token per field separated by spaces (e.g., "hex:1a0b3400" or "hex:0000001c hex:14 hex:0a0b")',
+        'contiguous hex tokens prefixed with "hex:"',
+        "Runs of non-ASCII bytes are represented as one `hex:` token of contiguous hex digits (e.g., hex:001aff). "
+        "A token may be split at a message boundary; keep the `hex:` prefix on both parts.",
+    ),
+    BASE64: (
+        'represent the bytes as base64 prefixed with "b64:", either one token for the whole message '
+        'or one token per field separated by spaces (e.g., "b64:Ggs0AA==" or "b64:AAAAHA== b64:FA==")',
+        'base64 tokens prefixed with "b64:"',
+        "Runs of non-ASCII bytes are represented as one `b64:` base64 token (e.g., b64:ABr/). "
+        "A token may be split at a message boundary only after re-encoding both parts; keep the `b64:` prefix on both.",
+    ),
+}
+
+HEX_BYTE_RUN = re.compile(r"0x[0-9a-fA-F]{2}(?: 0x[0-9a-fA-F]{2})*")
+
+# Encoding per protocol (upper case); protocols without an entry use DEFAULT_ENCODING
+ENCODINGS = {}
+
+def configure(protocol: str, encoding: Optional[str]) -> None:
+    if encoding:
+        if encoding not in WIRE_ENCODINGS:
+            raise Exception(f"Unknown encoding {encoding}, expected one of {', '.join(WIRE_ENCODINGS)}")
+        ENCODINGS[protocol.upper()] = encoding
+
+def protocol_encoding(protocol: str) -> str:
+    return ENCODINGS.get(protocol.upper(), DEFAULT_ENCODING)
+
+def encode_bytes(data: bytes, encoding: str) -> str:
+    if encoding == HEX:
+        return "hex:" + data.hex()
+    if encoding == BASE64:
+        return "b64:" + base64.b64encode(data).decode()
+    return " ".join(f"0x{byte:02x}" for byte in data)
+
+def decode_token(part: str, encoding: str) -> Optional[bytes]:
+    # One compact token of the encoding, or None when the part is not one. Other encodings never read tokens,
+    # so text such as "USER hex:abcd" stays text, and a prefix without a body is not a token
+    prefix = TOKEN_PREFIXES.get(encoding)
+    if not prefix or not part.startswith(prefix) or len(part) == len(prefix):
+        return None
+    try:
+        if encoding == HEX:
+            return bytes.fromhex(part[len(prefix):])
+        return base64.b64decode(part[len(prefix):], validate=True)
+    except (ValueError, binascii.Error):
+        return None
+
+def has_compact_tokens(message: str, encoding: str) -> bool:
+    return any(decode_token(part, encoding) is not None for part in message.split())
+
+def encode_seed(data: bytes, encoding: str) -> str:
+    """Readable seed text for the prompts: printable runs stay as-is, the other bytes use the wire encoding."""
+    if encoding == HEX_BYTES:
+        readable_content = ""
+        for byte in data:
+            if byte in (9, 10, 13) or (32 <= byte <= 126):
+                readable_content += chr(byte)
+            else:
+                readable_content += f" 0x{byte:02x} "
+        return readable_content
+
+    parts = []
+    binary = bytearray()
+    for run in re.split(rb"([\t\n\r\x20-\x7e]+)", data):
+        if not run:
+            continue
+        if re.fullmatch(rb"[\t\n\r\x20-\x7e]+", run) and (len(run) >= MIN_TEXT_RUN or run == data):
+            if binary:
+                parts.append(f" {encode_bytes(bytes(binary), encoding)} ")
+                binary = bytearray()
+            parts.append(run.decode())
+        else:
+            binary += run
+    if binary:
+        parts.append(f" {encode_bytes(bytes(binary), encoding)} ")
+    return "".join(parts)
+
+def encode_prompt(prompt: str, encoding: str) -> str:
+    # Fill the binary format placeholders and rewrite the "0xHH" examples in the chosen encoding
+    instruction, rule, seed_format = BINARY_FORMATS[encoding]
+    prompt = prompt.replace("[BINARY_FORMAT]", instruction)\
+                   .replace("[BINARY_RULE]", rule)\
+                   .replace("[SEED_FORMAT]", seed_format)
+    if encoding == HEX_BYTES:
+        return prompt
+    return HEX_BYTE_RUN.sub(lambda match: encode_bytes(bytes(int(part, 16) for part in match.group(0).split()), encoding)
+                            if " " in match.group(0) else match.group(0), prompt)
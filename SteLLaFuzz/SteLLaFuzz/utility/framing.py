@@ -0,0 +1,203 @@
+import re
+from typing import List, Optional, Tuple
+
+from utility.utility import convert_message_to_binary
+from utility.tracing import traced
+
+# Fixed-size field that counts the bytes following it
+LENGTH_FIELD = re.compile(r"(?i)^(packet|message|msg|pdu|record|total|payload|body|data)?[ _]?(length|len|size)$")
+REMAINDER_HINT = re.compile(r"(?i)\b(remaining|following|rest of|after this field|subsequent)\b")
+
+VALID, REPAIRED, INVALID = "valid", "repaired", "invalid"
+# Extra LLM requests for a sequence whose messages cannot be repaired locally
+FRAMING_RETRY = 2
+
+def is_hex_message(message: str) -> bool:
+    parts = message.split()
+    return bool(parts) and all(re.fullmatch(r"0x[0-9a-fA-F]{1,2}", part) for part in parts)
+
+def to_hex_message(data: bytes) -> str:
+    return " ".join(f"0x{byte:02x}" for byte in data)
+
+def frame_ssh(data: bytes) -> Tuple[str, bytes]:
+    # Binary packet protocol (RFC 4253 6): uint32 packet_length, byte padding_length, payload, padding;
+    # before key exchange the block size is 8 and padding is at least 4 bytes
+    if data.startswith(b"SSH-"):
+        return VALID, data
+    if len(data) < 6:
+        return INVALID, data
+    packet_length = int.from_bytes(data[:4], "big")
+    padding_length = data[4]
+    if (packet_length == len(data) - 4 and 4 <= padding_length <= packet_length - 2
+            and (packet_length + 4) % 8 == 0):
+        return VALID, data
+    end = len(data) - padding_length if padding_length <= len(data) - 6 else len(data)
+    payload = data[5:end]
+    padding_length = 8 - (len(payload) + 5) % 8
+    if padding_length < 4:
+        padding_length += 8
+    packet_length = len(payload) + padding_length + 1
+    return REPAIRED, packet_length.to_bytes(4, "big") + bytes([padding_length]) + payload + b"\x00" * padding_length
+
+def frame_records(data: bytes, header: int, length_at: int, content_types: range,
+                  inner: Optional[tuple] = None) -> Tuple[str, bytes]:
+    # TLS/DTLS records: walk the declared lengths; a record whose length does not land on the end or on
+    # another record header gets the remainder. Handshake records also carry an inner 24-bit length
+    if len(data) < header or data[0] not in content_types:
+        return INVALID, data
+    records = []
+    offset = 0
+    repaired = False
+    while offset < len(data):
+        if len(data) - offset < header or data[offset] not in content_types:
+            return INVALID, data
+        length = int.from_bytes(data[offset + length_at:offset + length_at + 2], "big")
+        end = offset + header + length
+        if end != len(data) and (end > len(data) or len(data) - end < header or data[end] not in content_types):
+            end = len(data)
+            repaired = True
+        records.append(bytearray(data[offset:end]))
+        offset = end
+
+    for record in records:
+        record[length_at:length_at + 2] = (len(record) - header).to_bytes(2, "big")
+        if inner and record[0] == 22 and len(record) >= header + inner[0]:
+            inner_header, fragment_at = inner
+            body = len(record) - header - inner_header
+            declared = int.from_bytes(record[header + 1:header + 4], "big")
+            # A shorter declared length followed by room for another handshake header may be a coalesced message
+            if declared != body and (declared > body or body - declared < inner_header):
+                record[header + 1:header + 4] = body.to_bytes(3, "big")
+                repaired = True
+            # DTLS: an unfragmented handshake message has fragment_length == length
+            if fragment_at and int.from_bytes(record[header + 6:header + 9], "big") == 0:
+                if int.from_bytes(record[header + fragment_at:header + fragment_at + 3], "big") != body:
+                    record[header + fragment_at:header + fragment_at + 3] = body.to_bytes(3, "big")
+                    repaired = True
+    result = b"".join(bytes(record) for record in records)
+    return (REPAIRED if repaired or result != data else VALID), result
+
+def frame_tls(data: bytes) -> Tuple[str, bytes]:
+    return frame_records(data, 5, 3, range(20, 25), (4, None))
+
+def frame_dtls(data: bytes) -> Tuple[str, bytes]:
+    return frame_records(data, 13, 11, range(20, 26), (12, 9))
+
+def frame_dicom(data: bytes) -> Tuple[str, bytes]:
+    # PDU: type, reserved, uint32 length of the rest
+    if len(data) < 6 or not 1 <= data[0] <= 7:
+        return INVALID, data
+    if int.from_bytes(data[2:6], "big") == len(data) - 6:
+        return VALID, data
+    return REPAIRED, data[:2] + (len(data) - 6).to_bytes(4, "big") + data[6:]
+
+def parse_dns_questions(data: bytes, offset: int) -> Optional[int]:
+    count = 0
+    while offset < len(data):
+        while True:
+            if offset >= len(data):
+                return None
+            label = data[offset]
+            if label == 0:
+                offset += 1
+                break
+            if label & 0xc0 == 0xc0:
+                offset += 2
+                break
+            offset += 1 + label
+        offset += 4
+        if offset > len(data):
+            return None
+        count += 1
+    return count
+
+def frame_dns(data: bytes) -> Tuple[str, bytes]:
+    # Header is 12 bytes; when the message holds only questions, QDCOUNT must match them
+    if len(data) < 12:
+        return INVALID, data
+    if any(data[6:12]):
+        return VALID, data
+    count = parse_dns_questions(data, 12)
+    if count is None:
+        return INVALID, data
+    if int.from_bytes(data[4:6], "big") == count:
+        return VALID, data
+    return REPAIRED, data[:4] + count.to_bytes(2, "big") + data[6:]
+
+def frame_structure(data: bytes, structure: dict) -> Tuple[str, bytes]:
+    # Generic check against the fixed_byte_length layout of a message type
+    fields = (structure or {}).get("fields") or []
+    lengths = [field.get("fixed_byte_length") or None for field in fields]
+    if not fields:
+        return VALID, data
+    fixed = sum(length for length in lengths if length)
+    if None not in lengths:
+        return (VALID if fixed == len(data) else INVALID), data
+    if fixed > len(data):
+        return INVALID, data
+
+    # Leading fixed fields are at known offsets; repair the first one that counts the remaining bytes
+    offset = 0
+    for field, length in zip(fields, lengths):
+        if length is None:
+            break
+        text = f"{field.get('description') or ''} {field.get('details') or ''}"
+        if LENGTH_FIELD.match(field["name"].strip()) and length <= 8 and REMAINDER_HINT.search(text):
+            remaining = len(data) - offset - length
+            if int.from_bytes(data[offset:offset + length], "big") == remaining:
+                return VALID, data
+            if remaining >= 1 << (8 * length):
+                return INVALID, data
+            return REPAIRED, data[:offset] + remaining.to_bytes(length, "big") + data[offset + length:]
+        offset += length
+    return VALID, data
+
+PROTOCOL_FRAMERS = {"SSH": frame_ssh, "TLS": frame_tls, "DTLS": frame_dtls, "DICOM": frame_dicom, "DNS": frame_dns}
+
+def frame_message(protocol: str, data: bytes, structure: Optional[dict]) -> Tuple[str, bytes]:
+    framer = PROTOCOL_FRAMERS.get(protocol.upper())
+    return framer(data) if framer else frame_structure(data, structure)
+
+def check_message(protocol: str, message: str, structure: Optional[dict]) -> Tuple[str, str]:
+    """Validate one generated message and return (status, message), repairing computable fields."""
+    if not is_hex_message(message):
+        return VALID, message
+    status, repaired = frame_message(protocol, convert_message_to_binary(message), structure)
+    return status, (to_hex_message(repaired) if status == REPAIRED else message)
+
+class FramingStats:
+    """Per-stage validity of binary messages: as generated, after local repair and after re-requests."""
+
+    def __init__(self):
+        self.counts = {"messages": 0, "valid": 0, "repaired": 0, "invalid": 0, "rerequests": 0,
+                       "final_messages": 0, "final_invalid": 0}
+
+    def record(self, first: List[str], final: List[str], rerequests: int) -> None:
+        self.counts["messages"] += len(first)
+        for status in first:
+            self.counts[status] += 1
+        self.counts["rerequests"] += rerequests
+        self.counts["final_messages"] += len(final)
+        self.counts["final_invalid"] += final.count(INVALID)
+
+    def rates(self) -> dict:
+        messages = max(self.counts["messages"], 1)
+        return {
+            "generated": self.counts["valid"] / messages,
+            "after_repair": (self.counts["valid"] + self.counts["repaired"]) / messages,
+            "after_rerequest": 1 - self.counts["final_invalid"] / max(self.counts["final_messages"], 1),
+        }
+
+@traced("repair_test_case", "codec")
+def repair_test_case(protocol: str, test_case: dict, type_sequence: List[str], specialized_structures: dict) -> List[str]:
+    # Repairs binary messages in place and returns their statuses
+    statuses = []
+    for sequence in test_case["sequences"]:
+        messages = sequence["messages"]
+        types = type_sequence if len(type_sequence) == len(messages) else [None] * len(messages)
+        for message, message_type in zip(messages, types):
+            if not is_hex_message(message["message"]):
+                continue
+            status, message["message"] = check_message(protocol, message["message"], specialized_structures.get(message_type))
+            statuses.append(status)
+    return statuses
@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import time
+import hashlib
+from collections import Counter
+from typing import List, Optional
+
+KNOWLEDGE_PACK_DIR = "knowledge_packs"
+PACK_FORMAT = 1
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"[\s\-]+", "_", (name or "").strip()).upper()
+
+def majority(values: list):
+    # Most common value; ties go to the value seen first
+    values = [value for value in values if value not in (None, "")]
+    return Counter(values).most_common(1)[0][0] if values else None
+
+def vote(samples: List[List[dict]], key: str, quorum: int) -> tuple:
+    """Group entries of every sample by normalized name; returns (kept, dropped) groups in consensus order.
+
+    A group is kept when at least quorum samples contain it and ordered by its mean relative position.
+    """
+    groups = {}
+    for sample in samples:
+        for position, entry in enumerate(sample):
+            group = groups.setdefault(normalize_name(entry[key]), {"entries": [], "samples": set(), "positions": []})
+            if id(sample) in group["samples"]:
+                continue
+            group["entries"].append(entry)
+            group["samples"].add(id(sample))
+            group["positions"].append(position / max(len(sample), 1))
+    ordered = sorted(groups.values(), key=lambda group: sum(group["positions"]) / len(group["positions"]))
+    return ([group["entries"] for group in ordered if len(group["samples"]) >= quorum],
+            [group["entries"] for group in ordered if len(group["samples"]) < quorum])
+
+def merge_message_types(samples: List[dict], quorum: int) -> tuple:
+    """Consensus ProtocolMessageTypes of several samples and the votes of every type name."""
+    kept, dropped = vote([sample["client_to_server_messages"] for sample in samples], "name", quorum)
+
+    def merge(entries: List[dict]) -> dict:
+        return {
+            "name": majority([entry["name"] for entry in entries]),
+            "code": majority([entry.get("code") for entry in entries]),
+            "description": majority([entry["description"] for entry in entries]),
+        }
+
+    candidates = [merge(entries) for entries in dropped]
+    known = {normalize_name(t["name"]) for t in candidates} | {normalize_name(entries[0]["name"]) for entries in kept}
+    for sample in samples:
+        for candidate in sample.get("potential_candidates") or []:
+            if normalize_name(candidate["name"]) not in known:
+                known.add(normalize_name(candidate["name"]))
+                candidates.append(candidate)
+    message_types = {
+        "protocol": samples[0]["protocol"],
+        "client_to_server_messages": [merge(entries) for entries in kept],
+        "potential_candidates": candidates,
+        "references": list(dict.fromkeys(reference for sample in samples for reference in sample.get("references") or [])),
+        "notes": majority([sample.get("notes") for sample in samples]),
+    }
+    votes = {merge(entries)["name"]: len(entries) for entries in kept + dropped}
+    return message_types, votes
+
+def merge_structures(samples: List[dict], quorum: int) -> tuple:
+    """Consensus StructuredOutput of several samples for one message type and the votes of every field."""
+    kept, dropped = vote([sample["fields"] for sample in samples], "name", quorum)
+    fields = []
+    for entries in kept:
+        fields.append({
+            "name": majority([entry["name"] for entry in entries]),
+            # null (variable length) is a vote like any other length
+            "fixed_byte_length": Counter(entry.get("fixed_byte_length") for entry in entries).most_common(1)[0][0],
+            "data_type": majority([entry["data_type"] for entry in entries]),
+            "description": majority([entry["description"] for entry in entries]),
+            "details": majority([entry.get("details") for entry in entries]),
+        })
+    structure = {
+        "protocol": samples[0]["protocol"],
+        "message_type": samples[0]["message_type"],
+        "code": majority([sample.get("code") for sample in samples]),
+        "type_description": majority([sample["type_description"] for sample in samples]),
+        "fields": fields,
+        "reasoning": f"Consensus of {len(samples)} samples. {samples[0]['reasoning']}",
+    }
+    votes = {majority([entry["name"] for entry in entries]): len(entries) for entries in kept + dropped}
+    return structure, votes
+
+def knowledge_hash(message_types: dict, specialized_structures: dict) -> str:
+    content = json.dumps({"message_types": message_types, "specialized_structures": specialized_structures},
+                         sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def pack_versions(pack_dir: str, protocol: str) -> List[int]:
+    pattern = re.compile(rf"{re.escape(protocol.lower())}_v(\d+)\.json$")
+    files = os.listdir(pack_dir) if os.path.isdir(pack_dir) else []
+    return sorted(int(match.group(1)) for match in map(pattern.match, files) if match)
+
+def write_knowledge_pack(pack_dir: str, protocol: str, message_types: dict, specialized_structures: dict, meta: dict) -> str:
+    """Write the next version of a protocol's pack, unless the latest one has the same content."""
+    digest = knowledge_hash(message_types, specialized_structures)
+    versions = pack_versions(pack_dir, protocol)
+    if versions:
+        latest = os.path.join(pack_dir, f"{protocol.lower()}_v{versions[-1]}.json")
+        with open(latest, "r", encoding="utf-8") as f:
+            if json.load(f).get("sha256") == digest:
+                print(f"Knowledge for {protocol} is unchanged, keeping {latest}")
+                return latest
+    version = versions[-1] + 1 if versions else 1
+    os.makedirs(pack_dir, exist_ok=True)
+    file_path = os.path.join(pack_dir, f"{protocol.lower()}_v{version}.json")
+    pack = {"format": PACK_FORMAT, "protocol": protocol, "version": version, "created": int(time.time()), "sha256": digest,
+            **meta, "message_types": message_types, "specialized_structures": specialized_structures}
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(pack, f, indent=4, ensure_ascii=False)
+    print(f"Saved knowledge pack v{version} for {protocol} to {file_path}")
+    return file_path
+
+def load_knowledge_pack(path: str, protocol: str) -> Optional[dict]:
+    """Read only the requested protocol's pack: path is a pack file or a directory (latest version is used)."""
+    if os.path.isdir(path):
+        versions = pack_versions(path, protocol)
+        if not versions:
+            return None
+        path = os.path.join(path, f"{protocol.lower()}_v{versions[-1]}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        pack = json.load(f)
+    if pack.get("format") != PACK_FORMAT:
+        raise Exception(f"Unsupported knowledge pack format {pack.get('format')} in {path}")
+    if pack["protocol"].lower() != protocol.lower():
+        return None
+    if knowledge_hash(pack["message_types"], pack["specialized_structures"]) != pack["sha256"]:
+        raise Exception(f"Knowledge pack {path} does not match its hash")
+    return pack
@@ -0,0 +1,224 @@
+import os
+import re
+import time
+import shlex
+import socket
+import subprocess
+from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.corpus import MESSAGE_TERMINATOR
+
+CONNECT_TIMEOUT = 5.0
+RESPONSE_TIMEOUT = 0.3
+SEED_TIMEOUT = 10.0
+
+# Response code extraction, in the spirit of AFLNet's extract_response_codes_*()
+TEXT_CODE_PROTOCOLS = ("FTP", "SMTP")
+STATUS_LINE_PROTOCOLS = ("RTSP", "SIP", "HTTP", "DAAP")
+STATUS_LINE = re.compile(rb"^(?:RTSP|SIP|HTTP)/\d\.\d (\d{3})", re.MULTILINE)
+REPLY_LINE = re.compile(rb"^(\d{3})[ -]", re.MULTILINE)
+# Line-based protocols, whose messages cannot contain CRLF themselves
+TEXT_PROTOCOLS = TEXT_CODE_PROTOCOLS + STATUS_LINE_PROTOCOLS
+
+def parse_netinfo(netinfo: str) -> Tuple[str, str, int]:
+    # Same format as afl-fuzz -N (e.g., tcp://127.0.0.1/2200)
+    match = re.match(r"^(tcp|udp)://([^/]+)/(\d+)$", netinfo)
+    if not match:
+        raise ValueError(f"Invalid netinfo: {netinfo}")
+    return match.group(1), match.group(2), int(match.group(3))
+
+def split_messages(data: bytes, protocol: str, sizes: Optional[List[int]] = None, terminated: bool = True) -> List[bytes]:
+    """Messages of a seed written by Corpus.write_seeds, where every message is followed by CRLF.
+
+    With the message sizes from the seed lineage the boundaries are exact; terminated=False drops the CRLF
+    (e.g., for UDP datagrams). Without them only text protocols are split on CRLF: binary payloads (SSH, TLS,
+    DTLS, DICOM, DNS, ...) may contain 0x0d0a themselves, so their seeds are sent as a single message.
+    """
+    if sizes is not None and sum(sizes) + len(sizes) * len(MESSAGE_TERMINATOR) == len(data):
+        messages = []
+        offset = 0
+        for size in sizes:
+            messages.append(data[offset:offset + size + (len(MESSAGE_TERMINATOR) if terminated else 0)])
+            offset += size + len(MESSAGE_TERMINATOR)
+        return messages
+    if protocol.upper() not in TEXT_PROTOCOLS:
+        return [data] if data else []
+    messages = [message + MESSAGE_TERMINATOR for message in data.split(MESSAGE_TERMINATOR)]
+    if messages and messages[-1] == MESSAGE_TERMINATOR:
+        messages.pop()
+    return messages
+
+def extract_response_codes(protocol: str, response: bytes) -> List[int]:
+    protocol = protocol.upper()
+    if not response:
+        return []
+    if protocol in TEXT_CODE_PROTOCOLS:
+        return [int(code) for code in REPLY_LINE.findall(response)]
+    if protocol in STATUS_LINE_PROTOCOLS:
+        return [int(code) for code in STATUS_LINE.findall(response)]
+    if protocol == "DNS" and len(response) >= 4:
+        # RCODE of the DNS header
+        return [response[3] & 0x0f]
+    if protocol in ("DTLS", "DTLS12", "TLS") and len(response) >= 1:
+        # Record content type (e.g., 22 handshake, 21 alert)
+        return [response[0]]
+    if protocol == "SSH":
+        # Message code of the first binary packet, 0 for the version banner
+        if response.startswith(b"SSH-"):
+            return [0]
+        return [response[5]] if len(response) > 5 else []
+    if protocol == "DICOM" and len(response) >= 1:
+        # PDU type (e.g., 2 A-ASSOCIATE-AC, 3 A-ASSOCIATE-RJ)
+        return [response[0]]
+    return [len(response)]
+
+def is_error_code(protocol: str, code: int) -> bool:
+    protocol = protocol.upper()
+    if protocol in TEXT_CODE_PROTOCOLS or protocol in STATUS_LINE_PROTOCOLS:
+        return code >= 400
+    if protocol == "DNS":
+        return code != 0
+    if protocol in ("DTLS", "DTLS12", "TLS"):
+        return code == 21
+    if protocol == "DICOM":
+        return code in (3, 7)
+    return False
+
+def _receive(sock: socket.socket, timeout: float) -> Tuple[bytes, float]:
+    # The response and the time until its last byte arrived; the idle wait for more data after it is not counted
+    data = bytearray()
+    sock.settimeout(timeout)
+    start = time.monotonic()
+    busy = 0.0
+    while True:
+        try:
+            chunk = sock.recv(65536)
+        except (socket.timeout, BlockingIOError):
+            break
+        except OSError:
+            break
+        if not chunk:
+            break
+        data += chunk
+        busy = time.monotonic() - start
+    return bytes(data), busy
+
+def _connect(transport: str, host: str, port: int, timeout: float) -> Optional[socket.socket]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if transport == "udp":
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.connect((host, port))
+                return sock
+            return socket.create_connection((host, port), timeout=timeout)
+        except OSError:
+            time.sleep(0.05)
+    return None
+
+def replay_messages(messages: List[bytes], transport: str, host: str, port: int,
+                    response_timeout: float = RESPONSE_TIMEOUT, seed_timeout: float = SEED_TIMEOUT,
+                    connect_timeout: float = CONNECT_TIMEOUT) -> dict:
+    """Send messages one by one like aflnet-replay and collect the response to each of them.
+
+    wall_time includes the response_timeout wait after every response; response_time only counts the time
+    until the last byte of each response, i.e., the server's own cost.
+    """
+    start = time.monotonic()
+    result = {"connected": False, "responses": [], "timeout": False, "wall_time": 0.0, "response_time": 0.0}
+    sock = _connect(transport, host, port, connect_timeout)
+    if sock is None:
+        result["wall_time"] = time.monotonic() - start
+        return result
+
+    result["connected"] = True
+    try:
+        # Greeting (e.g., FTP 220, SMTP 220)
+        if transport == "tcp":
+            result["banner"], busy = _receive(sock, response_timeout)
+            result["response_time"] += busy
+        for message in messages:
+            if time.monotonic() - start > seed_timeout:
+                result["timeout"] = True
+                break
+            try:
+                sock.sendall(message)
+            except OSError:
+                break
+            response, busy = _receive(sock, response_timeout)
+            result["responses"].append(response)
+            result["response_time"] += busy
+    finally:
+        sock.close()
+    result["wall_time"] = time.monotonic() - start
+    return result
+
+class ServerSlot:
+    """A server instance bound to one port; restarted for every replayed input like cov_script does."""
+
+    def __init__(self, command: Optional[str], port: int, clean_command: Optional[str] = None):
+        self.command = command
+        self.port = port
+        self.clean_command = clean_command
+        self.process = None
+
+    def start(self) -> None:
+        if self.clean_command:
+            subprocess.run(self.clean_command.replace("{port}", str(self.port)), shell=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if self.command:
+            self.process = subprocess.Popen(shlex.split(self.command.replace("{port}", str(self.port))),
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def stop(self) -> Optional[int]:
+        if self.process is None:
+            return None
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        returncode = self.process.returncode
+        self.process = None
+        return returncode
+
+def replay_corpus(files: List[str], protocol: str, netinfo: str, workers: int = 1,
+                  server_command: Optional[str] = None, clean_command: Optional[str] = None,
+                  response_timeout: float = RESPONSE_TIMEOUT, seed_timeout: float = SEED_TIMEOUT,
+                  lineage: Optional[dict] = None) -> List[dict]:
+    """Replay every file against its own server instance, one port per worker starting at the netinfo port.
+
+    lineage (seed_lineage.json) gives the message boundaries of generated seeds.
+    """
+    transport, host, base_port = parse_netinfo(netinfo)
+    slots = [ServerSlot(server_command, base_port + i, clean_command) for i in range(workers)]
+    free_slots = list(slots)
+
+    def replay(file_path: str) -> dict:
+        slot = free_slots.pop()
+        messages = []
+        try:
+            with open(file_path, "rb") as f:
+                sizes = (lineage or {}).get(os.path.basename(file_path), {}).get("sizes")
+                messages = split_messages(f.read(), protocol, sizes, terminated=transport == "tcp")
+            slot.start()
+            result = replay_messages(messages, transport, host, slot.port, response_timeout, seed_timeout)
+            result["returncode"] = slot.stop()
+        except Exception as e:
+            # e.g., a server command that cannot be started; only this seed fails
+            print(f"Error replaying {file_path}: {e}")
+            slot.stop()
+            result = {"connected": False, "responses": [], "timeout": False, "wall_time": 0.0, "response_time": 0.0,
+                      "returncode": None, "error": str(e)}
+        finally:
+            free_slots.append(slot)
+        result["file"] = file_path
+        result["messages"] = len(messages)
+        result["codes"] = [extract_response_codes(protocol, response) for response in result["responses"]]
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(replay, files))
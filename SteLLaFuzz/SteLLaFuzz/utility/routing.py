@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import threading
+from typing import Callable, List, Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from openai import OpenAI
+from utility.utility import MODEL, LLM_RESULT_DIR
+from utility.streaming import JsonArrayStream
+from utility.tracing import annotate
+from utility.budget import BUDGET, BudgetExhausted
+
+LATENCY_LOG = os.path.join(LLM_RESULT_DIR, "latency.jsonl")
+# Hedging starts once a stage has this many latency samples; the duplicate is sent after its p90
+HEDGE_MIN_SAMPLES = 5
+HEDGE_PERCENTILE = 90
+HISTORY_SIZE = 200
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 30, 60, 90]
+
+# Stage routes, e.g. {"default": {"model": "gpt-4o-mini"},
+#                     "6_testcases": {"model": "gpt-4o", "base_url": "...", "api_key_env": "...", "timeout": 30,
+#                                     "hedge": true, "secondary": {"model": "gpt-4o-mini"}}}
+ROUTES = {}
+HEDGE = False
+RUN_ID = f"{int(time.time())}-{os.getpid()}"
+
+_lock = threading.Lock()
+_clients = {}
+_history = None
+_calls = 0
+
+def configure(routes_file: Optional[str] = None, hedge: bool = False) -> None:
+    global HEDGE
+    HEDGE = hedge
+    ROUTES.clear()
+    if routes_file:
+        with open(routes_file, "r", encoding="utf-8") as f:
+            ROUTES.update(json.load(f))
+
+def get_client(route: dict) -> OpenAI:
+    # One client per endpoint so connections stay warm across calls
+    key = (route.get("base_url"), route.get("api_key_env"))
+    with _lock:
+        if key not in _clients:
+            kwargs = {}
+            if route.get("base_url"):
+                kwargs["base_url"] = route["base_url"]
+            if route.get("api_key_env"):
+                kwargs["api_key"] = os.environ.get(route["api_key_env"])
+            _clients[key] = OpenAI(**kwargs)
+        return _clients[key]
+
+def percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+def stage_history(stage: str) -> List[float]:
+    # Latencies of earlier runs seed the hedge delay of this one
+    global _history
+    with _lock:
+        if _history is None:
+            _history = {}
+            if os.path.exists(LATENCY_LOG):
+                with open(LATENCY_LOG, "r", encoding="utf-8") as f:
+                    for line in f:
+                        record = json.loads(line)
+                        if record.get("primary_latency") is not None:
+                            _history.setdefault(record["stage"], []).append(record["primary_latency"])
+        return _history.setdefault(stage, [])
+
+def expected_latency(stage: str) -> float:
+    # Median latency of the stage; the time budget must still cover it when a call is issued
+    history = stage_history(stage)
+    return percentile(history, 50) if history else 0
+
+def log_latency(record: dict) -> None:
+    history = stage_history(record["stage"])
+    with _lock:
+        if record.get("primary_latency") is not None:
+            history.append(record["primary_latency"])
+            del history[:-HISTORY_SIZE]
+        os.makedirs(LLM_RESULT_DIR, exist_ok=True)
+        with open(LATENCY_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+def completion_tokens(completion) -> Optional[int]:
+    usage = getattr(completion, "usage", None)
+    return usage.completion_tokens if usage else None
+
+def record_usage(completion) -> None:
+    # Token counts go to the span of the calling using_llm attempt
+    usage = getattr(completion, "usage", None)
+    if usage:
+        annotate(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+def call_route(route: dict, kwargs: dict):
+    return get_client(route).beta.chat.completions.parse(model=route.get("model", MODEL), **kwargs)
+
+def parse_completion(stage: str, messages: list, response_format, timeout: float, temperature: Optional[float] = None,
+                     array_key: Optional[str] = None, item_model=None, on_item: Optional[Callable] = None):
+    """Structured completion routed by stage, optionally hedged after the stage's p90 latency.
+
+    With on_item, the response is streamed instead (not hedged) and every element of array_key is
+    validated against item_model and passed to on_item as soon as it is complete.
+    Raises BudgetExhausted when the estimated cost no longer fits the run's budget.
+    """
+    estimate = BUDGET.reserve(stage, messages, expected_latency(stage))
+    completion = None
+    try:
+        if on_item:
+            completion = stream_completion(stage, messages, response_format, timeout, array_key, item_model, on_item, temperature)
+        else:
+            completion = route_completion(stage, messages, response_format, timeout, temperature)
+        return completion
+    finally:
+        # Failed calls are charged their estimate
+        usage = getattr(completion, "usage", None)
+        BUDGET.charge(stage, estimate, usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None)
+
+def route_completion(stage: str, messages: list, response_format, timeout: float, temperature: Optional[float] = None):
+    global _calls
+    route = {**ROUTES.get("default", {}), **ROUTES.get(stage, {})}
+    kwargs = {"messages": messages, "response_format": response_format, "timeout": route.get("timeout", timeout)}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    with _lock:
+        _calls += 1
+        call_id = f"{RUN_ID}-{_calls}"
+
+    history = stage_history(stage)
+    start = time.time()
+    if not (HEDGE or route.get("hedge")) or len(history) < HEDGE_MIN_SAMPLES:
+        completion = call_route(route, kwargs)
+        latency = time.time() - start
+        log_latency({"run": RUN_ID, "call": call_id, "stage": stage, "latency": latency, "primary_latency": latency, "hedged": False,
+                     "completion_tokens": completion_tokens(completion)})
+        record_usage(completion)
+        return completion
+
+    hedge_after = percentile(history, HEDGE_PERCENTILE)
+    executor = ThreadPoolExecutor(max_workers=2)
+    winner = None
+    hedge_estimate = None
+    try:
+        primary = executor.submit(call_route, route, kwargs)
+        futures = {primary: "primary"}
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            # The duplicate is paid for too: it reserves its own estimate, and no hedge is sent when that does not fit
+            try:
+                hedge_estimate = BUDGET.reserve(stage, messages)
+            except BudgetExhausted:
+                pass
+            else:
+                futures[executor.submit(call_route, {**route, **route.get("secondary", {})}, kwargs)] = "hedge"
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    completion = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if completion.choices[0].message.parsed is None:
+                    continue
+                winner = future
+                latency = time.time() - start
+                record = {"run": RUN_ID, "call": call_id, "stage": stage, "latency": latency,
+                          "primary_latency": latency if future is primary else None,
+                          "hedged": len(futures) > 1, "winner": futures[future],
+                          "completion_tokens": completion_tokens(completion)}
+                log_latency(record)
+                record_usage(completion)
+                annotate(hedged=len(futures) > 1, winner=futures[future])
+                if future is not primary:
+                    # Keep measuring the unhedged latency for the histograms and the next p90
+                    primary.add_done_callback(lambda f: f.exception() is None and log_latency(
+                        {"run": RUN_ID, "call": call_id, "stage": stage, "primary_latency": time.time() - start}))
+                return completion
+        raise error or Exception(f"No parsed response for {stage}")
+    finally:
+        if hedge_estimate is not None:
+            # parse_completion charges the returned completion (or one estimate when there is none); the other
+            # request is charged its own usage once it finishes, even after the pipeline moved on
+            other = next(future for future in reversed(list(futures)) if future is not winner)
+            other.add_done_callback(lambda future: charge_discarded(stage, call_id, futures[future], future, hedge_estimate))
+        executor.shutdown(wait=False)
+
+def charge_discarded(stage: str, call_id: str, name: str, future, estimate: int) -> None:
+    completion = None if future.cancelled() or future.exception() is not None else future.result()
+    usage = getattr(completion, "usage", None)
+    BUDGET.charge(stage, estimate, usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None)
+    log_latency({"run": RUN_ID, "call": call_id, "stage": stage, "discarded": name, "completion_tokens": completion_tokens(completion)})
+
+def latency_report(run: Optional[str] = None) -> dict:
+    # Per stage: effective latency (what the pipeline waited) against the primary request alone
+    calls = {}
+    if os.path.exists(LATENCY_LOG):
+        with open(LATENCY_LOG, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if run and record.get("run") != run:
+                    continue
+                call = calls.setdefault(record["call"], {"stage": record["stage"]})
+                call.update({key: value for key, value in record.items() if value is not None})
+
+    report = {}
+    for call in calls.values():
+        if "latency" not in call:
+            continue
+        stage = report.setdefault(call["stage"], {"latency": [], "primary_latency": [], "hedged": 0})
+        stage["latency"].append(call["latency"])
+        stage["hedged"] += int(call.get("hedged", False))
+        if "primary_latency" in call:
+            stage["primary_latency"].append(call["primary_latency"])
+    for stage in report.values():
+        stage["histogram"] = [sum(1 for latency in stage["latency"] if low <= latency < high)
+                              for low, high in zip([0] + HISTOGRAM_BUCKETS, HISTOGRAM_BUCKETS + [float("inf")])]
+    return report
+
+def print_latency_report(run: Optional[str] = None) -> None:
+    labels = [f"<{bucket}s" for bucket in HISTOGRAM_BUCKETS] + [f">={HISTOGRAM_BUCKETS[-1]}s"]
+    for name, stage in sorted(latency_report(run).items()):
+        effective, primary = stage["latency"], stage["primary_latency"] or stage["latency"]
+        print(f"{name}: {len(effective)} calls, {stage['hedged']} hedged, "
+              f"p50 {percentile(effective, 50):.1f}s, p90 {percentile(effective, 90):.1f}s, max {max(effective):.1f}s "
+              f"(unhedged p90 {percentile(primary, 90):.1f}s, max {max(primary):.1f}s)")
+        print("    " + "  ".join(f"{label}:{count}" for label, count in zip(labels, stage["histogram"]) if count))
+
+def stream_completion(stage: str, messages: list, response_format, timeout: float, array_key: str, item_model,
+                      on_item: Callable, temperature: Optional[float] = None):
+    """Structured completion that validates and hands over each element of array_key as soon as it is complete."""
+    global _calls
+    route = {**ROUTES.get("default", {}), **ROUTES.get(stage, {})}
+    kwargs = {"messages": messages, "response_format": response_format, "timeout": route.get("timeout", timeout)}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    with _lock:
+        _calls += 1
+        call_id = f"{RUN_ID}-{_calls}"
+
+    start = time.time()
+    first_item = None
+    parser = JsonArrayStream(array_key)
+    with get_client(route).beta.chat.completions.stream(model=route.get("model", MODEL), stream_options={"include_usage": True},
+                                                        **kwargs) as stream:
+        for event in stream:
+            if event.type != "content.delta":
+                continue
+            for item in parser.feed(event.delta):
+                if first_item is None:
+                    first_item = time.time() - start
+                on_item(item_model.model_validate(item).model_dump())
+        completion = stream.get_final_completion()
+    latency = time.time() - start
+    log_latency({"run": RUN_ID, "call": call_id, "stage": stage, "latency": latency, "primary_latency": latency,
+                 "hedged": False, "first_item": first_item, "completion_tokens": completion_tokens(completion)})
+    record_usage(completion)
+    annotate(first_item=first_item)
+    return completion
@@ -0,0 +1,116 @@
+import os
+import re
+import json
+from typing import List, Optional, Tuple
+
+from utility.utility import LLM_RESULT_DIR
+from utility.campaign import classify_message
+
+# Length-prefixed record layouts: (header size, offset of the length field, its size, offsets of the type bytes)
+RECORD_LAYOUTS = {
+    "TLS": (5, 3, 2, (0, 5)),
+    "DTLS": (13, 11, 2, (0, 13)),
+    "DICOM": (6, 2, 4, (0,)),
+}
+# SSH packets after the banner: uint32 packet_length, padding_length, then the message code
+SSH_LAYOUT = (4, 0, 4, (5,))
+
+def is_text(data: bytes) -> bool:
+    return bool(data) and sum(byte in (9, 10, 13) or 32 <= byte <= 126 for byte in data) >= 0.9 * len(data)
+
+def split_records(data: bytes, header: int, length_at: int, length_size: int) -> List[bytes]:
+    # Walk the declared lengths; whatever does not parse is kept as one trailing message
+    messages = []
+    offset = 0
+    while len(data) - offset >= header:
+        end = offset + header + int.from_bytes(data[offset + length_at:offset + length_at + length_size], "big")
+        if end > len(data):
+            break
+        messages.append(data[offset:end])
+        offset = end
+    if offset < len(data):
+        messages.append(data[offset:])
+    return messages
+
+def split_seed(protocol: str, data: bytes) -> Tuple[List[bytes], Optional[tuple]]:
+    """Split a raw seed into messages without the LLM; returns the messages and the type-byte offsets."""
+    protocol = protocol.upper()
+    if protocol == "SSH":
+        banner_end = data.find(b"\n") + 1 if data.startswith(b"SSH-") else 0
+        banner = [data[:banner_end]] if banner_end else []
+        return banner + split_records(data[banner_end:], *SSH_LAYOUT[:3]), SSH_LAYOUT[3]
+    if protocol in RECORD_LAYOUTS and not is_text(data):
+        layout = RECORD_LAYOUTS[protocol]
+        return split_records(data, *layout[:3]), layout[3]
+    if is_text(data):
+        return [line for line in re.split(rb"\r?\n", data) if line.strip()], None
+    return [data], (0,)
+
+def message_label(message: bytes, type_names: List[str], type_bytes: Optional[tuple]) -> str:
+    # Text messages are labelled by their message type (or leading keyword), binary ones by their type bytes
+    if is_text(message):
+        label = classify_message(message, type_names)
+        if label:
+            return label
+        # Version strings and arguments glued to the keyword (SSH-2.0-x, RTSP/1.0) do not make a new type
+        keyword = re.match(rb"\s*([A-Za-z][A-Za-z_\-]*)", message)
+        return keyword.group(1).decode().upper() if keyword else ""
+    offsets = [offset for offset in type_bytes or (0,) if offset < len(message)]
+    return "0x" + "".join(f"{message[offset]:02x}" for offset in offsets)
+
+def seed_signature(protocol: str, data: bytes, type_names: List[str]) -> tuple:
+    messages, type_bytes = split_seed(protocol, data)
+    return tuple(message_label(message, type_names, type_bytes) for message in messages)
+
+def signature_features(signature: tuple) -> set:
+    return set(signature) | set(zip(signature, signature[1:]))
+
+def cluster_seeds(signatures: List[tuple], sizes: List[int], budget: int) -> List[List[int]]:
+    """Group seeds with the same message-type signature and keep at most budget clusters.
+
+    Clusters are picked greedily by the types and transitions they add, then by size; the others are
+    merged into the picked cluster whose signature is closest. The first member represents its cluster.
+    """
+    groups = {}
+    for i, signature in enumerate(signatures):
+        groups.setdefault(signature, []).append(i)
+    # The longest session represents its group; the smallest file breaks ties
+    clusters = [sorted(members, key=lambda i: (-len(signatures[i]), sizes[i])) for members in groups.values()]
+    if budget <= 0 or len(clusters) <= budget:
+        return clusters
+
+    features = [signature_features(signatures[members[0]]) for members in clusters]
+    picked = []
+    covered = set()
+    remaining = list(range(len(clusters)))
+    while remaining and len(picked) < budget:
+        best = max(remaining, key=lambda c: (len(features[c] - covered), len(clusters[c])))
+        picked.append(best)
+        covered |= features[best]
+        remaining.remove(best)
+
+    merged = {c: list(clusters[c]) for c in picked}
+    for c in remaining:
+        closest = max(picked, key=lambda p: len(features[c] & features[p]) / max(len(features[c] | features[p]), 1))
+        merged[closest].extend(clusters[c])
+    return [merged[c] for c in picked]
+
+def select_seed_files(protocol: str, seed_messages_dir: str, file_names: List[str], message_types: dict,
+                      budget: int) -> List[int]:
+    """Indices of the seed files to expand with the LLM: one representative per cluster."""
+    type_names = [t["name"] for t in message_types["client_to_server_messages"]]
+    signatures = []
+    sizes = []
+    for file_name in file_names:
+        with open(os.path.join(seed_messages_dir, file_name), "rb") as f:
+            data = f.read()
+        signatures.append(seed_signature(protocol, data, type_names))
+        sizes.append(len(data))
+    clusters = cluster_seeds(signatures, sizes, budget)
+
+    os.makedirs(LLM_RESULT_DIR, exist_ok=True)
+    with open(os.path.join(LLM_RESULT_DIR, f"{protocol.lower()}_seed_clusters.json"), "w", encoding="utf-8") as f:
+        json.dump([{"representative": file_names[members[0]], "signature": list(signatures[members[0]]),
+                    "members": [file_names[i] for i in members]} for members in clusters], f, indent=4)
+    print(f"Expanding {len(clusters)} representative seeds out of {len(file_names)} for {protocol}")
+    return sorted(members[0] for members in clusters)
@@ -0,0 +1,82 @@
+import re
+import time
+from typing import Callable, List
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.tracing import span, annotate
+from utility.budget import BudgetExhausted
+
+# Leading types of the list (usually session setup such as USER/PASS or HELO) are kept in every shard
+SHARD_ANCHORS = 2
+SHARD_WORKERS = 4
+
+def group_key(message_type: dict) -> str:
+    # Related types share a name prefix (SSH_MSG_USERAUTH_*, A-ASSOCIATE-*) or a code range
+    parts = [part for part in re.split(r"[_\-\s]+", message_type["name"]) if part]
+    if len(parts) > 1:
+        return "_".join(parts[:-1]).upper()
+    code = str(message_type.get("code") or "").strip()
+    if code.isdigit() and len(code) > 1:
+        return f"code:{code[:-1]}"
+    return message_type["name"].upper()
+
+def partition_types(message_types: dict, shard_size: int) -> List[List[str]]:
+    """Split the type names into shards of related types, keeping the order of the original list."""
+    groups = {}
+    for message_type in message_types["client_to_server_messages"]:
+        groups.setdefault(group_key(message_type), []).append(message_type["name"])
+
+    shards = [[]]
+    for names in groups.values():
+        if shards[-1] and len(shards[-1]) + len(names) > shard_size:
+            shards.append([])
+        for name in names:
+            if len(shards[-1]) == shard_size:
+                shards.append([])
+            shards[-1].append(name)
+    return [shard for shard in shards if shard]
+
+def shard_message_types(message_types: dict, names: List[str]) -> dict:
+    anchors = [t["name"] for t in message_types["client_to_server_messages"][:SHARD_ANCHORS]]
+    selected = set(anchors) | set(names)
+    return dict(message_types, client_to_server_messages=[t for t in message_types["client_to_server_messages"] if t["name"] in selected])
+
+def request_shards(message_types: dict, shards: List[List[str]], request: Callable) -> List[dict]:
+    # A failed shard only loses its own types; they are picked up by the top-up round
+    def run(names: List[str]):
+        with span("shard", "stage", item=f"{names[0]}..{names[-1]}"):
+            annotate(queue_wait=time.time() - submitted)
+            try:
+                return request(shard_message_types(message_types, names))
+            except BudgetExhausted:
+                raise
+            except Exception as e:
+                print(f"Error generating sequences for shard {names[0]}..{names[-1]}: {e}")
+                return None
+
+    submitted = time.time()
+    with ThreadPoolExecutor(max_workers=SHARD_WORKERS) as executor:
+        return [result for result in executor.map(run, shards) if result]
+
+def generate_sharded(protocol: str, message_types: dict, shard_size: int, request: Callable) -> dict:
+    """Generate sequences per shard of related types concurrently, merge them and top up uncovered types."""
+    shards = partition_types(message_types, shard_size)
+    print(f"Generating sequences for {protocol} in {len(shards)} shards of up to {shard_size} types")
+    results = request_shards(message_types, shards, request)
+
+    all_types = [t["name"] for t in message_types["client_to_server_messages"]]
+    covered = {t for result in results for sequence in result.get("sequences") or [] for t in sequence["type_sequence"]}
+    uncovered = [name for name in all_types if name not in covered]
+    if uncovered:
+        print(f"Topping up {len(uncovered)} uncovered types for {protocol}")
+        results += request_shards(message_types, [uncovered[i:i + shard_size] for i in range(0, len(uncovered), shard_size)], request)
+
+    sequences = []
+    for result in results:
+        for sequence in result.get("sequences") or []:
+            sequences.append(dict(sequence, sequenceId=str(len(sequences) + 1)))
+    return {
+        "protocol": protocol,
+        "sequences": sequences,
+        "explanation": "\n".join(result.get("explanation") or "" for result in results).strip(),
+    }
@@ -0,0 +1,93 @@
+import random
+import hashlib
+from typing import List
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+def sequence_shingles(messages: List[str], size: int = 2) -> set:
+    # Token k-grams over the whole sequence; a boundary token keeps messages from blending together
+    tokens = []
+    for message in messages:
+        tokens.extend(message.split())
+        tokens.append("\x00")
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def choose_bands(num_perm: int, threshold: float) -> tuple:
+    # (bands, rows) whose S-curve midpoint (1/b)^(1/r) is closest to the threshold
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(candidates, key=lambda c: abs((1 / c[0]) ** (1 / c[1]) - threshold))
+
+class MinHashIndex:
+    """MinHash signatures with LSH banding; near-duplicate candidates come from shared bands."""
+
+    def __init__(self, threshold: float = 0.7, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.permutations = [(rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1)) for _ in range(num_perm)]
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.signatures = []
+        self.sizes = []
+
+    def signature(self, shingles: set) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingles]
+        return [min((a * h + b) % MERSENNE_PRIME & MAX_HASH for h in hashes) for a, b in self.permutations]
+
+    def similarity(self, i: int, j: int) -> float:
+        return sum(x == y for x, y in zip(self.signatures[i], self.signatures[j])) / self.num_perm
+
+    def add(self, shingles: set) -> List[int]:
+        # Returns the earlier entries sharing a band that are estimated above the threshold
+        index = len(self.signatures)
+        signature = self.signature(shingles)
+        self.signatures.append(signature)
+        self.sizes.append(len(shingles))
+        candidates = set()
+        for band in range(self.bands):
+            key = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            bucket = self.buckets[band].setdefault(key, [])
+            candidates.update(bucket)
+            bucket.append(index)
+        return [other for other in candidates if self.similarity(index, other) >= self.threshold]
+
+def find(parents: List[int], i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def cluster_sequences(sequences: List[List[str]], threshold: float = 0.7, num_perm: int = 64) -> List[List[int]]:
+    """Group message sequences whose estimated Jaccard similarity reaches the threshold."""
+    index = MinHashIndex(threshold, num_perm)
+    parents = list(range(len(sequences)))
+    for i, messages in enumerate(sequences):
+        for other in index.add(sequence_shingles(messages)):
+            parents[find(parents, i)] = find(parents, other)
+    clusters = {}
+    for i in range(len(sequences)):
+        clusters.setdefault(find(parents, i), []).append(i)
+    # The member with the most distinct shingles (most varied content) represents its cluster
+    return [sorted(members, key=lambda i: -index.sizes[i]) for members in clusters.values()]
+
+def deduplicate_test_cases(test_cases: List[dict], threshold: float = 0.7) -> int:
+    """Drop near-duplicate sequences across test cases in place; returns how many were removed."""
+    if threshold >= 1:
+        return 0
+    entries = []
+    for test_case in test_cases:
+        for testcase in test_case.values():
+            for sequence in testcase["sequences"]:
+                entries.append((testcase, sequence))
+    clusters = cluster_sequences([[m["message"] for m in sequence["messages"]] for _, sequence in entries], threshold)
+
+    removed = 0
+    for members in clusters:
+        for i in members[1:]:
+            testcase, sequence = entries[i]
+            testcase["sequences"] = [s for s in testcase["sequences"] if s is not sequence]
+            removed += 1
+    return removed
@@ -0,0 +1,58 @@
+import heapq
+from typing import List, Tuple
+
+from utility.replay import extract_response_codes
+
+def state_sequence(protocol: str, result: dict) -> List[int]:
+    """Response codes of one replay as AFLNet sees them: state 0, the greeting, then every response in order."""
+    if not result["connected"]:
+        return []
+    states = [0] + extract_response_codes(protocol, result.get("banner") or b"")
+    for response in result["responses"]:
+        states.extend(extract_response_codes(protocol, response))
+    return states
+
+def induced_graph(sequences: List[List[int]]) -> Tuple[set, set]:
+    # Nodes and edges of AFLNet's IPSM: consecutive codes are a transition, self-loops included
+    nodes = set()
+    edges = set()
+    for states in sequences:
+        nodes.update(states)
+        edges.update(zip(states, states[1:]))
+    return nodes, edges
+
+def cover_elements(states: List[int]) -> set:
+    return {("node", state) for state in states} | {("edge", a, b) for a, b in zip(states, states[1:])}
+
+def greedy_cover(sequences: List[List[int]], costs: List[float]) -> List[int]:
+    """Small set of sequences covering every observed state and transition (greedy set cover).
+
+    Picks the sequence with the most uncovered elements, the cheaper one on ties; gains only shrink, so stale
+    heap entries are re-evaluated lazily instead of rescoring every sequence after each pick.
+    """
+    elements = [cover_elements(states) for states in sequences]
+    heap = [(-len(covers), costs[i], i) for i, covers in enumerate(elements) if covers]
+    heapq.heapify(heap)
+    covered = set()
+    selected = []
+    while heap:
+        _, cost, i = heapq.heappop(heap)
+        gain = len(elements[i] - covered)
+        if not gain:
+            continue
+        if heap and (-gain, cost, i) > heap[0]:
+            heapq.heappush(heap, (-gain, cost, i))
+            continue
+        covered |= elements[i]
+        selected.append(i)
+    return selected
+
+def write_dot(nodes: set, edges: set, file_path: str) -> None:
+    # Same shape as the state machine AFLNet dumps (ipsm.dot)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("digraph g {\n")
+        for node in sorted(nodes):
+            f.write(f"  {node};\n")
+        for a, b in sorted(edges):
+            f.write(f"  {a} -> {b};\n")
+        f.write("}\n")
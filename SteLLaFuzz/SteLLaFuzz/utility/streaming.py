@@ -0,0 +1,57 @@
+import json
+from typing import List
+
+class JsonArrayStream:
+    """Incremental scanner that returns each element object of a top-level JSON array as soon as it closes.
+
+    Only string/escape state and nesting depth are tracked, so every character is looked at once and
+    nothing is re-parsed until an element is complete.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string = []
+        self.last_key = None
+        self.in_array = False
+        self.element = None
+
+    def feed(self, text: str) -> List[dict]:
+        items = []
+        for char in text:
+            if self.element is not None:
+                self.element.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.element is None:
+                        self.last_key = "".join(self.string)
+                else:
+                    self.string.append(char)
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string = []
+            elif char in "{[":
+                self.depth += 1
+                if char == "[" and self.depth == 2 and self.last_key == self.key:
+                    self.in_array = True
+                elif char == "{" and self.depth == 3 and self.in_array:
+                    self.element = [char]
+            elif char in "}]":
+                if char == "}" and self.depth == 3 and self.element is not None:
+                    items.append(json.loads("".join(self.element)))
+                    self.element = None
+                elif char == "]" and self.depth == 2:
+                    self.in_array = False
+                self.depth -= 1
+            elif char == "," and self.depth == 1:
+                self.last_key = None
+        return items
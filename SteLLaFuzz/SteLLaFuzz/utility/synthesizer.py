@@ -0,0 +1,185 @@
+import os
+import re
+import random
+import hashlib
+from typing import List, Optional
+
+from utility.utility import convert_message_to_binary
+from utility.campaign import classify_message
+from utility.framing import frame_message, INVALID
+
+# Fields that only describe separators between the other fields of a text message
+DELIMITER_FIELD = re.compile(r"(?i)(sp|space|crlf|cr|lf|cr_?lf|delimiter|separator|terminator|line_?end(ing)?|end_of_line)")
+
+TEXT_BOUNDARIES = [b"", b"0", b"-1", b"4294967296", b"A" * 1024, b"%s%n%x", b"../" * 16, b"\x00", b"\xff" * 16]
+
+def is_binary_message(message: str) -> bool:
+    parts = message.split()
+    return bool(parts) and all(part.startswith("0x") for part in parts)
+
+def binary_boundaries(length: Optional[int]) -> List[bytes]:
+    if not length:
+        return [b"", b"\x00" * 64, b"\xff" * 256]
+    return [b"\x00" * length, b"\xff" * length, b"\x7f" + b"\xff" * (length - 1),
+            b"\x80" + b"\x00" * (length - 1), (1).to_bytes(length, "big"), (1).to_bytes(length, "little")]
+
+class MessageGrammar:
+    """Field layout of one message type compiled from its StructuredOutput, with value pools per field slot."""
+
+    def __init__(self, structure: dict, binary: bool):
+        self.binary = binary
+        self.samples = []
+        fields = structure.get("fields") or []
+        if binary:
+            # Fixed-length fields before the first and after the last variable field get their own slots;
+            # everything in between is one variable slot
+            lengths = [field.get("fixed_byte_length") or None for field in fields]
+            first = next((i for i, length in enumerate(lengths) if length is None), len(lengths))
+            last = max((i for i, length in enumerate(lengths) if length is None), default=len(lengths) - 1)
+            self.head = lengths[:first]
+            self.tail = lengths[last + 1:] if first < len(lengths) else []
+            self.slots = self.head + ([None] if first < len(lengths) else []) + self.tail or [None]
+        else:
+            names = [field["name"] for field in fields if not DELIMITER_FIELD.fullmatch(field["name"].strip())]
+            self.slots = [None] * max(len(names), 1)
+        self.pools = [[] for _ in self.slots]
+        self.seen = [set() for _ in self.slots]
+
+    def split(self, data: bytes) -> List[bytes]:
+        if not self.binary:
+            return data.split(b" ", len(self.slots) - 1)
+        head, tail = sum(self.head), sum(self.tail)
+        if head + tail > len(data) or (len(self.slots) == len(self.head) and head != len(data)):
+            return [data]
+        values = []
+        offset = 0
+        for length in self.head:
+            values.append(data[offset:offset + length])
+            offset += length
+        if len(self.slots) > len(self.head) + len(self.tail):
+            values.append(data[offset:len(data) - tail])
+        offset = len(data) - tail
+        for length in self.tail:
+            values.append(data[offset:offset + length])
+            offset += length
+        return values
+
+    def add(self, data: bytes) -> List[bytes]:
+        values = self.split(data)
+        self.samples.append(values)
+        if len(values) != len(self.slots) and self.binary:
+            return values
+        for i, value in enumerate(values):
+            if value not in self.seen[i]:
+                self.seen[i].add(value)
+                self.pools[i].append(value)
+        return values
+
+    def generate(self, rng: random.Random, template: List[bytes], boundary_rate: float) -> bytes:
+        values = list(template)
+        aligned = len(values) == len(self.slots)
+        # The leading keyword of a text message selects its type and stays as it is
+        for i in range(0 if self.binary else 1, len(values)):
+            roll = rng.random()
+            if roll < boundary_rate:
+                values[i] = rng.choice(binary_boundaries(self.slots[i] if aligned else None) if self.binary else TEXT_BOUNDARIES)
+            elif roll < boundary_rate + 0.5 and len(self.pools[i]) > 1:
+                values[i] = rng.choice(self.pools[i])
+        return (b"" if self.binary else b" ").join(values)
+
+class Synthesizer:
+    """Multiplies LLM test cases into structurally valid variants without further LLM calls."""
+
+    def __init__(self, specialized_structures: dict, seed: Optional[int] = None, protocol: str = ""):
+        self.structures = specialized_structures
+        self.protocol = protocol
+        self.grammars = {}
+        self.templates = []
+        self.rng = random.Random(seed)
+        # Framing of the generated binary messages; variants with an unrepairable message are dropped
+        self.framing = {"valid": 0, "repaired": 0, "invalid": 0, "dropped": 0}
+
+    def add_sequence(self, messages: List[str], type_sequence: Optional[List[str]] = None) -> None:
+        # Messages are typed by position when the LLM kept the requested type sequence,
+        # otherwise by their leading keyword; untyped messages are replayed verbatim
+        type_names = list(self.structures)
+        template = []
+        for i, message in enumerate(messages):
+            data = convert_message_to_binary(message)
+            if type_sequence and len(type_sequence) == len(messages) and type_sequence[i] in self.structures:
+                message_type = type_sequence[i]
+            else:
+                message_type = None if is_binary_message(message) else classify_message(data, type_names)
+            if message_type is None:
+                template.append((None, [data]))
+                continue
+            if message_type not in self.grammars:
+                self.grammars[message_type] = MessageGrammar(self.structures[message_type], is_binary_message(message))
+            template.append((message_type, self.grammars[message_type].add(data)))
+        if template:
+            self.templates.append(template)
+
+    def add_test_cases(self, test_cases: dict, sequences: Optional[List[dict]] = None) -> None:
+        # Sequence ids restart in every sequence file, so pick the type sequence whose length matches
+        type_sequences = {}
+        for sequence in sequences or []:
+            type_sequences.setdefault(str(sequence["sequenceId"]), []).append(sequence["type_sequence"])
+        for sequence_id, test_case in test_cases.items():
+            for sequence in test_case["sequences"]:
+                messages = [message["message"] for message in sequence["messages"]]
+                candidates = [t for t in type_sequences.get(str(sequence_id), []) if len(t) == len(messages)]
+                self.add_sequence(messages, candidates[0] if candidates else None)
+
+    def generate(self, boundary_rate: float = 0.1) -> Optional[bytes]:
+        # Swapped values leave length, padding and count fields stale, so every binary message is checked and
+        # repaired like the LLM's own messages; None when one of them cannot be repaired
+        template = self.rng.choice(self.templates)
+        data = bytearray()
+        for message_type, values in template:
+            if message_type is None:
+                data += values[0]
+            else:
+                grammar = self.grammars[message_type]
+                message = grammar.generate(self.rng, values, boundary_rate)
+                if grammar.binary:
+                    status, message = frame_message(self.protocol, message, self.structures[message_type])
+                    self.framing[status] += 1
+                    if status == INVALID:
+                        self.framing["dropped"] += 1
+                        return None
+                data += message
+            data += b"\r\n"
+        return bytes(data)
+
+    def create_seed(self, output_dir: str, prefix: str, index: int) -> tuple:
+        # O_EXCL keeps the files of an earlier run (or another writer) in output_dir from being overwritten
+        while True:
+            index += 1
+            try:
+                return os.open(os.path.join(output_dir, f"{prefix}_{index}.raw"), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644), index
+            except FileExistsError:
+                continue
+
+    def write_corpus(self, output_dir: str, count: int, boundary_rate: float = 0.1, prefix: str = "syn") -> int:
+        # Distinct variants only; give up after a few rounds without new ones (small pools)
+        if not self.templates:
+            return 0
+        os.makedirs(output_dir, exist_ok=True)
+        seen = set()
+        written = 0
+        attempts = 0
+        index = 0
+        while written < count and attempts < count * 4:
+            attempts += 1
+            data = self.generate(boundary_rate)
+            if data is None:
+                continue
+            digest = hashlib.sha1(data).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            fd, index = self.create_seed(output_dir, prefix, index)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            written += 1
+        return written
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import threading
+import functools
+from typing import Callable, Optional
+
+# Spans are only recorded while profiling; otherwise traced functions cost one flag check
+ENABLED = False
+# Span args summed in the summary table
+COUNTERS = ["queue_wait", "retries", "prompt_tokens", "completion_tokens", "bytes"]
+
+_lock = threading.Lock()
+_local = threading.local()
+_events = []
+_origin = time.perf_counter()
+
+def enable() -> None:
+    global ENABLED
+    ENABLED = True
+
+class Span:
+    """One timed region; args set while it is open are exported with it."""
+
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        if ENABLED:
+            self.start = time.perf_counter()
+            _local.__dict__.setdefault("stack", []).append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not ENABLED or not hasattr(self, "start"):
+            return False
+        end = time.perf_counter()
+        _local.stack.pop()
+        if exc_type is not None:
+            self.args["error"] = str(exc)
+        event = {"name": self.name, "cat": self.category, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                 "ts": (self.start - _origin) * 1e6, "dur": (end - self.start) * 1e6, "args": self.args}
+        with _lock:
+            _events.append(event)
+        return False
+
+def span(name: str, category: str, **args) -> Span:
+    return Span(name, category, args)
+
+def annotate(**args) -> None:
+    # Adds to the counters of the innermost open span of this thread
+    stack = _local.__dict__.get("stack")
+    if not ENABLED or not stack:
+        return
+    for key, value in args.items():
+        if value is None:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            stack[-1].args[key] = stack[-1].args.get(key, 0) + value
+        else:
+            stack[-1].args[key] = value
+
+def traced(name: str, category: str, label: Optional[Callable] = None, failed: Optional[Callable] = None):
+    """Decorator recording every call as a span; label(*args) names the item, failed(result) marks a failed attempt."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with span(name, category, **({"item": str(label(*args, **kwargs))} if label else {})) as current:
+                result = func(*args, **kwargs)
+                if failed and failed(result):
+                    current.args["error"] = "no result"
+            # A failed attempt is a retry of the enclosing item
+            if failed and failed(result):
+                annotate(retries=1)
+            return result
+        return wrapper
+    return decorator
+
+def summary() -> list:
+    """Per category and name: calls, errors, wall time and summed counters."""
+    rows = {}
+    with _lock:
+        events = list(_events)
+    for event in events:
+        row = rows.setdefault((event["cat"], event["name"]), {"category": event["cat"], "name": event["name"],
+                                                              "calls": 0, "errors": 0, "durations": []})
+        row["calls"] += 1
+        row["errors"] += int("error" in event["args"])
+        row["durations"].append(event["dur"] / 1e6)
+        for counter in COUNTERS:
+            value = event["args"].get(counter)
+            if isinstance(value, (int, float)):
+                row[counter] = row.get(counter, 0) + value
+    for row in rows.values():
+        durations = sorted(row.pop("durations"))
+        row["total"] = sum(durations)
+        row["mean"] = row["total"] / len(durations)
+        row["p90"] = durations[min(len(durations) - 1, int(len(durations) * 0.9))]
+        row["max"] = durations[-1]
+    return sorted(rows.values(), key=lambda row: -row["total"])
+
+def print_summary() -> None:
+    rows = summary()
+    if not rows:
+        return
+    header = ["category", "name", "calls", "errors", "total", "mean", "p90", "max"] + COUNTERS
+    print(" ".join(f"{column:>17}" for column in header))
+    for row in rows:
+        values = [row["category"], row["name"][:17], row["calls"], row["errors"]]
+        values += [f"{row[key]:.3f}" for key in ("total", "mean", "p90", "max")]
+        values += [f"{row[counter]:.3f}" if isinstance(row.get(counter), float) else row.get(counter, "") for counter in COUNTERS]
+        print(" ".join(f"{value:>17}" for value in values))
+
+def export_trace(path: str) -> None:
+    """Chrome trace event format, readable by chrome://tracing and ui.perfetto.dev."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _lock:
+        events = list(_events)
+    threads = sorted({event["tid"] for event in events})
+    metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                 "args": {"name": "main" if tid == threading.main_thread().ident else f"worker-{i}"}}
+                for i, tid in enumerate(threads)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms", "otherData": {"summary": summary()}}, f)
+    print(f"Saved trace with {len(events)} spans to {path}")
@@ -5,13 +5,35 @@ from typing import List
 from pprint import pprint
 import re
 
+from utility.encoding import HEX_BYTES, decode_token, encode_bytes, encode_seed, has_compact_tokens
+from utility.tracing import traced
+
 MODEL = "gpt-4o-mini"
 LLM_RESULT_DIR = "llm_outputs"
 TEST_MESSAGE_DIR = os.path.join(LLM_RESULT_DIR, "messages")
 SEQUENCE_REPEAT = 1
 LLM_RETRY = 3
+# Type lists longer than this are split into shards for the sequence stages (0 disables)
+SEQUENCE_SHARD_SIZE = 24
+# Seed files are clustered by message-type signature; at most this many representatives are expanded (0: one per signature)
+SEED_CLUSTER_BUDGET = 10
+
+def save_response(stage: str, response: dict) -> str:
+    # Concurrent requests of a stage (shards, knowledge pack samples, daemon jobs) share its directory;
+    # creating the file with O_EXCL gives each response its own index
+    stage_dir = os.path.join(LLM_RESULT_DIR, stage)
+    os.makedirs(stage_dir, exist_ok=True)
+    index = 0
+    while True:
+        file_path = os.path.join(stage_dir, f"response_{index}.json")
+        try:
+            with open(file_path, "x", encoding="utf-8") as f:
+                json.dump(response, f, indent=4, ensure_ascii=False)
+            return file_path
+        except FileExistsError:
+            index += 1
 
-def convert_message_to_binary(message: str) -> bytes:
+def convert_message_to_binary(message: str, encoding: str = HEX_BYTES) -> bytes:
     if not message:
         return b''
     
@@ -19,7 +41,10 @@ def convert_message_to_binary(message: str) -> bytes:
     processed_parts = []
     
     for part in parts:
-        if part.startswith('0x'):
+        compact = decode_token(part, encoding)
+        if compact is not None:
+            processed_parts.append((compact, True))
+        elif part.startswith('0x'):
             try:
                 binary_value = bytes([int(part[2:], 16)])
                 processed_parts.append((binary_value, True))
@@ -40,46 +65,30 @@ def convert_message_to_binary(message: str) -> bytes:
 
     return bytes(result)
 
-def save_test_cases(test_cases: dict, output_dir: str, seed_file_name: str) -> None:
+@traced("sequence_to_bytes", "codec")
+def sequence_to_bytes(sequence: dict) -> bytes:
     concatnated_messages = bytearray()
-    os.makedirs(output_dir, exist_ok=True)
-    
-    idx = 1
-    for testcase in test_cases.values():
-        for sequence in testcase["sequences"]:
-            try:
-                for message in sequence["messages"]:   
-                    concatnated_messages += convert_message_to_binary(message["message"]) + b"\r\n"
+    for message in sequence["messages"]:
+        concatnated_messages += convert_message_to_binary(message["message"]) + b"\r\n"
+    return bytes(concatnated_messages)
+
+def canonical_message(message: str, encoding: str) -> str:
+    # Compact hex:/b64: tokens of the encoding are expanded to "0xHH" bytes so everything downstream sees one format
+    if not has_compact_tokens(message, encoding):
+        return message
+    return encode_bytes(convert_message_to_binary(message, encoding), HEX_BYTES)
 
-                while True:
-                    file_path = os.path.join(output_dir, f"new_{idx}.raw")
-                    if not os.path.exists(file_path):
-                        break
-                    idx += 1
-                
-                with open(file_path, "wb") as f:
-                    f.write(concatnated_messages)
-                concatnated_messages = bytearray()
-                idx += 1
-            except Exception as e:
-                print(f"Error: {e}")
-            
-def load_seed_messages(seed_messages_dir: str) -> List[str]:
+@traced("load_seed_message", "codec", label=lambda file_path, *args: os.path.basename(file_path))
+def load_seed_message(file_path: str, encoding: str = HEX_BYTES) -> str:
+    with open(file_path, "rb") as f:
+        binary_content = f.read()
+    return encode_seed(binary_content, encoding)
+
+def load_seed_messages(seed_messages_dir: str, encoding: str = HEX_BYTES) -> List[str]:
     seed_messages = []
     file_names = []
     for file in os.listdir(seed_messages_dir):
         file_path = os.path.join(seed_messages_dir, file)
         file_names.append(file)
-        with open(file_path, "rb") as f:
-            binary_content = f.read()
-        
-        readable_content = ""
-        for byte in binary_content:
-            if byte in (9, 10, 13) or (32 <= byte <= 126):
-                readable_content += chr(byte)
-            else:
-               readable_content += f" 0x{byte:02x} "
-        
-        seed_messages.append(readable_content)
+        seed_messages.append(load_seed_message(file_path, encoding))
     return file_names, seed_messages
-
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import os
+import io
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib import pyplot as plt
+import numpy as np
+import pandas as pd
+
+from profuzzbench_data import find_archives, sample_archive
+
+#(cov_type, subplot position, title, y label, percentage)
+COV_PANELS = [
+  ('b_abs', (0, 0), 'Edge coverage over time (#edges)', '#edges', False),
+  ('b_per', (1, 0), 'Edge coverage over time (%)', 'Edge coverage (%)', True),
+  ('l_abs', (0, 1), 'Line coverage over time (#lines)', '#lines', False),
+  ('l_per', (1, 1), 'Line coverage over time (%)', 'Line coverage (%)', True),
+]
+STATE_PANELS = [
+  ('nodes', 0, '#nodes'),
+  ('edges', 1, '#edges'),
+]
+
+#figure templates are created once per worker process and reused for every subject
+_templates = {}
+
+
+def _template(kind, figsize, font_size):
+  if kind in _templates:
+    fig, axes = _templates[kind]
+    for ax in fig.axes:
+      for line in list(ax.get_lines()):
+        line.remove()
+      if ax.get_legend():
+        ax.get_legend().remove()
+      ax.set_prop_cycle(None)
+      ax.relim()
+      ax.autoscale()
+    for legend in list(fig.legends):
+      legend.remove()
+    return fig, axes
+
+  plt.rcParams.update({'font.size': font_size})
+  if kind == 'cov':
+    fig, axes = plt.subplots(2, 2, figsize=figsize)
+    fig.suptitle("Code coverage analysis")
+    for cov_type, pos, title, ylabel, percentage in COV_PANELS:
+      axes[pos].set_title(title)
+      axes[pos].set_xlabel('Time (in min)')
+      axes[pos].set_ylabel(ylabel)
+  else:
+    fig, axes = plt.subplots(1, 2, figsize=figsize)
+    fig.suptitle("State coverage analysis", fontsize=20)
+    for state_type, pos, ylabel in STATE_PANELS:
+      axes[pos].set_xlabel('Time (in min)')
+      axes[pos].set_ylabel(ylabel)
+      axes[pos].grid()
+  _templates[kind] = (fig, axes)
+  return fig, axes
+
+
+def render_subject(job):
+  #draw the coverage and state plots of one subject; returns the written files and inline SVGs
+  subject, cov_df, state_df, out_dir, figsize, font_size, dpi, svg = job
+  outputs = {}
+
+  if not cov_df.empty:
+    fig, axes = _template('cov', figsize, font_size)
+    for (fuzzer, cov_type), grp in cov_df.groupby(['fuzzer', 'cov_type']):
+      for name, pos, title, ylabel, percentage in COV_PANELS:
+        if name == cov_type:
+          axes[pos].plot(grp['time'], grp['cov'], label=fuzzer)
+          if percentage:
+            axes[pos].set_ylim([0, 100])
+    for ax in axes.flat:
+      ax.legend()
+    fig.tight_layout(pad=3.0)
+    outputs['cov'] = _save(fig, os.path.join(out_dir, 'cov_over_time_{}.png'.format(subject)), dpi, svg)
+
+  if not state_df.empty:
+    fig, axes = _template('state', figsize, font_size)
+    lines = []
+    fuzzers = []
+    for (fuzzer, state_type), grp in state_df.groupby(['fuzzer', 'data_type']):
+      for name, pos, ylabel in STATE_PANELS:
+        if name == state_type:
+          line = axes[pos].plot(grp['time'], grp['data'])
+          if state_type == 'nodes':
+            lines.extend(line)
+            fuzzers.append(fuzzer)
+    axes[1].set_ylim([0, state_df[state_df['data_type'] == 'edges']['data'].max() + 20])
+    fig.legend(lines, fuzzers, loc='center left', bbox_to_anchor=(1.0, 0.5))
+    fig.tight_layout()
+    outputs['state'] = _save(fig, os.path.join(out_dir, 'state_over_time_{}.png'.format(subject)), dpi, svg)
+
+  return subject, outputs
+
+
+def _save(fig, out_file, dpi, svg):
+  fig.savefig(out_file, bbox_inches='tight', pad_inches=0.5, dpi=dpi)
+  if not svg:
+    return (out_file, None)
+  buf = io.StringIO()
+  fig.savefig(buf, format='svg', bbox_inches='tight', pad_inches=0.5)
+  return (out_file, buf.getvalue())
+
+
+def mean_frames(rows):
+  #average the sampled runs per (subject, fuzzer, type), skipping missing runs
+  cov_list = []
+  state_list = []
+  grouped = {}
+  for kind, subject, fuzzer, run, data_type, minutes, values in rows:
+    grouped.setdefault((kind, subject, fuzzer, data_type), []).append((minutes, values))
+  for (kind, subject, fuzzer, data_type), samples in sorted(grouped.items()):
+    minutes = samples[0][0]
+    #a run is left out of the buckets it has no data for (NaN), and a bucket without any run is 0
+    stacked = np.array([values for _, values in samples])
+    mean = np.nansum(stacked, axis=0) / np.maximum((~np.isnan(stacked)).sum(axis=0), 1)
+    frame = pd.DataFrame({'subject': subject, 'fuzzer': fuzzer, 'time': minutes})
+    if kind == 'cov':
+      frame['cov_type'] = data_type
+      frame['cov'] = mean
+      cov_list.append(frame)
+    else:
+      frame['data_type'] = data_type
+      frame['data'] = mean
+      state_list.append(frame)
+  cov_df = pd.concat(cov_list, ignore_index=True) if cov_list else pd.DataFrame(columns=['subject', 'fuzzer', 'time', 'cov_type', 'cov'])
+  state_df = pd.concat(state_list, ignore_index=True) if state_list else pd.DataFrame(columns=['subject', 'fuzzer', 'time', 'data_type', 'data'])
+  return cov_df, state_df
+
+
+def write_report(report_file, rendered):
+  html = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>ProFuzzBench results</title></head><body>']
+  html.append('<h1>ProFuzzBench results</h1>')
+  for subject, outputs in sorted(rendered):
+    html.append('<h2>{}</h2>'.format(subject))
+    for kind in ['cov', 'state']:
+      if kind in outputs and outputs[kind][1]:
+        html.append('<div>{}</div>'.format(outputs[kind][1]))
+  html.append('</body></html>')
+  with open(report_file, 'w') as f:
+    f.write('\n'.join(html))
+
+
+def main(data_dir, out_dir, subjects, fuzzers, cut_off, step, jobs, report, figsize, font_size, dpi):
+  os.makedirs(out_dir, exist_ok=True)
+  archives = find_archives(data_dir, subjects, fuzzers)
+  if not archives:
+    print("No result archives found in {}".format(data_dir))
+    return
+  print("Analyzing {} runs of {} subjects in {}".format(
+    len(archives), len(set(a[0] for a in archives)), data_dir))
+
+  with ProcessPoolExecutor(max_workers=jobs) as executor:
+    #Step-1. extract and sample every run
+    rows = []
+    for run_rows in executor.map(sample_archive, [a + (cut_off, step) for a in archives]):
+      rows.extend(run_rows)
+    cov_df, state_df = mean_frames(rows)
+    cov_df.to_csv(os.path.join(out_dir, 'mean_cov_data.csv'), index=False)
+    state_df.to_csv(os.path.join(out_dir, 'mean_plot_data.csv'), index=False)
+
+    #Step-2. render all subjects
+    render_jobs = []
+    for subject in sorted(set(a[0] for a in archives)):
+      render_jobs.append((subject,
+                          cov_df[cov_df['subject'] == subject],
+                          state_df[state_df['subject'] == subject],
+                          out_dir, figsize, font_size, dpi, report is not None))
+    rendered = []
+    for subject, outputs in executor.map(render_subject, render_jobs):
+      for kind, (out_file, _) in outputs.items():
+        print("Saved {}".format(out_file))
+      rendered.append((subject, outputs))
+
+  if report:
+    write_report(report, rendered)
+    print("Saved {}".format(report))
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i','--data_dir',type=str,required=True,help="Folder containing results-<subject> folders (e.g., exp-data)")
+    parser.add_argument('-o','--out_dir',type=str,default='.',help="Output folder for plots and mean CSV files")
+    parser.add_argument('-p','--puts',nargs='+',default=None,help="Subjects to analyze (default: all)")
+    parser.add_argument('-f','--fuzzers',nargs='+',default=None,help="Fuzzers to analyze (default: all)")
+    parser.add_argument('-c','--cut_off',type=int,default=1440,help="Cut-off time in minutes")
+    parser.add_argument('-s','--step',type=int,default=1,help="Time step in minutes")
+    parser.add_argument('-j','--jobs',type=int,default=os.cpu_count(),help="Number of worker processes")
+    parser.add_argument('--report',type=str,default=None,help="Also write a single HTML report with inline SVG plots")
+    parser.add_argument('--figsize',type=float,nargs=2,default=[40, 20],help="Figure size in inches")
+    parser.add_argument('--font_size',type=int,default=30,help="Global font size")
+    parser.add_argument('--dpi',type=int,default=100,help="Resolution of the PNG files")
+    args = parser.parse_args()
+    fuzzers = [f.lower() for f in args.fuzzers] if args.fuzzers else None
+    main(args.data_dir, args.out_dir, args.puts, fuzzers, args.cut_off, args.step, args.jobs,
+         args.report, tuple(args.figsize), args.font_size, args.dpi)
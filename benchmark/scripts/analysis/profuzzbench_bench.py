@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import json
+import time
+import tarfile
+import argparse
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from profuzzbench_data import parse_plot_data, sample_over_time, read_members, PLOT_DATA_COLUMNS
+from profuzzbench_plot import mean_coverage
+from profuzzbench_state import mean_states
+
+FUZZERS = ['aflnet', 'chatafl', 'stellafuzz']
+SUBJECT = 'lightftp'
+#SteLLaFuzz's seed and corpus cases (bench_hotpaths.py) run through the same harness and baseline file
+STELLAFUZZ_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'SteLLaFuzz', 'SteLLaFuzz')
+#realistic: plot_data rows every minute as written by afl-fuzz under load, 10-minute plot buckets
+#stress: a row every 5 seconds (PLOT_UPDATE_SEC in afl-fuzz) and per-minute buckets over 24 h x 10 runs x 3 fuzzers
+SIZES = {
+  'realistic': {'hours': 24, 'runs': 10, 'interval': 60, 'step': 10, 'queue_mb': 4},
+  'stress': {'hours': 24, 'runs': 10, 'interval': 5, 'step': 1, 'queue_mb': 64},
+}
+
+
+def make_plot_data(rng, hours, interval):
+  #one run of AFLNet plot_data with growing paths, states and transitions
+  rows = hours * 3600 // interval
+  times = 1700000000 + np.arange(rows) * interval
+  paths = np.cumsum(rng.random(rows) < 0.05) + 1
+  nodes = np.cumsum(rng.random(rows) < 0.002) + 5
+  edges = nodes + np.cumsum(rng.random(rows) < 0.01)
+  lines = ['# unix_time, cycles_done, cur_path, paths_total, pending_total, pending_favs, map_size, unique_crashes, '
+           'unique_hangs, max_depth, execs_per_sec, n_nodes, n_edges']
+  for i in range(rows):
+    lines.append('{}, {}, {}, {}, {}, 0, {:.2f}%, 0, 0, 3, {:.2f}, {}, {}'.format(
+      times[i], i // 500, i % paths[i], paths[i], paths[i] // 3, paths[i] / 100.0, 100 + rng.random() * 50, nodes[i], edges[i]))
+  return ('\n'.join(lines) + '\n').encode()
+
+
+def make_cov_over_time(rng, hours, interval):
+  rows = hours * 3600 // interval
+  times = 1700000000 + np.arange(rows) * interval
+  branches = np.cumsum(rng.random(rows) < 0.05) + 100
+  lines = ['Time,l_per,l_abs,b_per,b_abs']
+  for i in range(rows):
+    lines.append('{},{:.1f},{},{:.1f},{}'.format(times[i], branches[i] / 50.0, branches[i] * 2, branches[i] / 40.0, branches[i]))
+  return ('\n'.join(lines) + '\n').encode()
+
+
+def make_data(size):
+  #synthetic plot_data and cov_over_time of every run, plus the long-form frames the plot scripts read
+  config = SIZES[size]
+  rng = np.random.default_rng(1)
+  runs = {}
+  state_rows = []
+  cov_rows = []
+  for fuzzer in FUZZERS:
+    for run in range(1, config['runs'] + 1):
+      plot = make_plot_data(rng, config['hours'], config['interval'])
+      cov = make_cov_over_time(rng, config['hours'], config['interval'])
+      runs[(fuzzer, run)] = (plot, cov)
+      parsed = parse_plot_data(plot)
+      for column, state_type in [('n_nodes', 'nodes'), ('n_edges', 'edges')]:
+        values = parsed[:, PLOT_DATA_COLUMNS.index(column)]
+        state_rows.append(pd.DataFrame({'time': parsed[:, 0].astype(int), 'subject': SUBJECT, 'fuzzer': fuzzer,
+                                        'run': run, 'state_type': state_type, 'state': values}))
+      parsed = np.loadtxt(io.BytesIO(cov), delimiter=',', skiprows=1, ndmin=2)
+      for i, cov_type in enumerate(['l_per', 'l_abs', 'b_per', 'b_abs']):
+        cov_rows.append(pd.DataFrame({'time': parsed[:, 0].astype(int), 'subject': SUBJECT, 'fuzzer': fuzzer,
+                                      'run': run, 'cov_type': cov_type, 'cov': parsed[:, i + 1]}))
+  return config, runs, pd.concat(state_rows, ignore_index=True), pd.concat(cov_rows, ignore_index=True)
+
+
+def make_archive(runs, queue_mb):
+  #one output folder archive: plot_data and cov_over_time.csv behind a queue of random test cases
+  plot, cov = runs[(FUZZERS[0], 1)]
+  rng = np.random.default_rng(2)
+  buffer = io.BytesIO()
+  with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+    def add(name, data):
+      info = tarfile.TarInfo(name)
+      info.size = len(data)
+      tar.addfile(info, io.BytesIO(data))
+    for i in range(queue_mb * 16):
+      add('out-{}-{}/queue/id:{:06d}'.format(SUBJECT, FUZZERS[0], i), rng.bytes(64 * 1024))
+    add('out-{}-{}/plot_data'.format(SUBJECT, FUZZERS[0]), plot)
+    add('out-{}-{}/cov_over_time.csv'.format(SUBJECT, FUZZERS[0]), cov)
+  return buffer.getvalue()
+
+
+def make_cases(size, work_dir):
+  config, runs, state_df, cov_df = make_data(size)
+  cut_off = config['hours'] * 60
+  archive = os.path.join(work_dir, 'out-{}-{}_1.tar.gz'.format(SUBJECT, FUZZERS[0]))
+  with open(archive, 'wb') as f:
+    f.write(make_archive(runs, config['queue_mb']))
+
+  def sample_all():
+    for plot, cov in runs.values():
+      parsed = parse_plot_data(plot)
+      for column in ['n_nodes', 'n_edges']:
+        sample_over_time(parsed[:, 0], parsed[:, PLOT_DATA_COLUMNS.index(column)], cut_off, config['step'])
+
+  return {
+    'parse_plot_data': lambda: [parse_plot_data(plot) for plot, cov in runs.values()],
+    'sample_over_time': sample_all,
+    'state_loop': lambda: mean_states(state_df, SUBJECT, config['runs'], cut_off, config['step'], FUZZERS),
+    'plot_loop': lambda: mean_coverage(cov_df, SUBJECT, config['runs'], cut_off, config['step'], FUZZERS),
+    'read_members': lambda: read_members(archive, ['cov_over_time.csv', 'plot_data']),
+  }
+
+
+def stellafuzz_cases(size, work_dir):
+  #SteLLaFuzz imports its modules relative to its own folder
+  sys.path.insert(0, os.path.abspath(STELLAFUZZ_DIR))
+  import bench_hotpaths
+  return bench_hotpaths.make_cases(size, work_dir)
+
+
+SUITES = {'analysis': make_cases, 'stellafuzz': stellafuzz_cases}
+
+
+def measure(func, repeat):
+  #best wall time of repeat calls, then one more call under tracemalloc for the peak allocation
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    times.append(time.perf_counter() - start)
+  tracemalloc.start()
+  func()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return min(times), peak
+
+
+def compare(results, baseline, time_threshold, memory_threshold):
+  #return the cases slower or bigger than their baseline beyond the thresholds
+  regressions = []
+  for case, result in results.items():
+    base = baseline.get(case)
+    if not base:
+      continue
+    if result['seconds'] > base['seconds'] * (1 + time_threshold):
+      regressions.append('{}: {:.3f}s vs {:.3f}s'.format(case, result['seconds'], base['seconds']))
+    if result['peak_bytes'] > base['peak_bytes'] * (1 + memory_threshold):
+      regressions.append('{}: peak {:.1f} MB vs {:.1f} MB'.format(case, result['peak_bytes'] / 2**20, base['peak_bytes'] / 2**20))
+  return regressions
+
+
+def main(suites, size, cases, repeat, baseline_file, save, time_threshold, memory_threshold, work_dir):
+  #baselines are stored per suite and size: {suite: {size: {case: {seconds, peak_bytes}}}}
+  baselines = {}
+  if os.path.exists(baseline_file):
+    with open(baseline_file) as f:
+      baselines = json.load(f)
+  regressions = []
+  for suite in suites:
+    print("Generating {} {} data".format(size, suite))
+    suite_dir = os.path.join(work_dir, suite)
+    os.makedirs(suite_dir, exist_ok=True)
+    available = SUITES[suite](size, suite_dir)
+    results = {}
+    #-k may name cases of any suite
+    for case in [case for case in cases if case in available] if cases else available:
+      seconds, peak = measure(available[case], repeat)
+      results[case] = {'seconds': seconds, 'peak_bytes': peak}
+      print('{:<30} {:>10.3f}s {:>10.1f} MB'.format(suite + '.' + case, seconds, peak / 2**20))
+    baseline = baselines.setdefault(suite, {}).setdefault(size, {})
+    if save:
+      baseline.update(results)
+    else:
+      regressions.extend(suite + '.' + regression for regression in compare(results, baseline, time_threshold, memory_threshold))
+
+  if save:
+    with open(baseline_file, 'w') as f:
+      json.dump(baselines, f, indent=2)
+    print("Saved baseline to {}".format(baseline_file))
+    return 0
+  for regression in regressions:
+    print("Regression: {}".format(regression))
+  return 1 if regressions else 0
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-u','--suite',type=str,nargs='*',default=list(SUITES),choices=list(SUITES),help="Suites to run (default: all)")
+    parser.add_argument('-s','--size',type=str,default='realistic',choices=list(SIZES),help="Synthetic data size")
+    parser.add_argument('-k','--cases',nargs='*',default=None,help="Cases to run (default: all)")
+    parser.add_argument('-n','--repeat',type=int,default=3,help="Timed repetitions per case; the best one is kept")
+    parser.add_argument('-b','--baseline',type=str,default='bench_baseline.json',help="Baseline file")
+    parser.add_argument('--save',action='store_true',help="Store the results as the new baseline")
+    parser.add_argument('--time_threshold',type=float,default=0.25,help="Allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument('--memory_threshold',type=float,default=0.10,help="Allowed peak memory growth over the baseline")
+    parser.add_argument('-w','--work_dir',type=str,default='/tmp/profuzzbench_bench',help="Folder for generated archives")
+    args = parser.parse_args()
+    sys.exit(main(args.suite, args.size, args.cases, args.repeat, args.baseline, args.save, args.time_threshold,
+                  args.memory_threshold, args.work_dir))
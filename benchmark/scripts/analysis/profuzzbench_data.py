@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import tarfile
+import contextlib
+
+import numpy as np
+
+try:
+  import zstandard
+except ImportError:
+  zstandard = None
+
+#archives are named out-<subject>-<fuzzer>_<run>.tar.gz (see profuzzbench_exec_common.sh)
+#or out-<subject>-<fuzzer>_<run>.tar.zst when collected by tier (see profuzzbench_collect.py)
+ARCHIVE_PATTERN = re.compile(r'^out-(.+)-(\w+)_(\d+)\.tar\.(?:gz|zst)$')
+
+#parts of an output folder, by top-level name or path; bulk is everything else (queue, cov_html, ...)
+#the metrics part is stored in the run's main archive, the others next to it as <run>.<part>.tar.zst;
+#it keeps the seed lineage and state coverage of llm_outputs, which profuzzbench_lineage.py reads
+PARTS = {
+  'metrics': ['cov_over_time.csv', 'plot_data', 'fuzzer_stats',
+              'llm_outputs/seed_lineage.json', 'llm_outputs/state_coverage.json'],
+  'crashes': ['replayable-crashes', 'replayable-hangs', 'crashes', 'hangs'],
+}
+TIERS = {
+  'metrics': ['metrics'],
+  'crashes': ['metrics', 'crashes'],
+  'full': ['metrics', 'crashes', 'bulk'],
+}
+
+#columns of cov_over_time.csv: Time,l_per,l_abs,b_per,b_abs
+COV_TYPES = ['l_per', 'l_abs', 'b_per', 'b_abs']
+
+#columns of plot_data (AFLNet adds n_nodes and n_edges at the end)
+PLOT_DATA_COLUMNS = ['unix_time', 'cycles_done', 'cur_path', 'paths_total', 'pending_total',
+                     'pending_favs', 'map_size', 'unique_crashes', 'unique_hangs', 'max_depth',
+                     'execs_per_sec', 'n_nodes', 'n_edges']
+STATE_TYPES = ['nodes', 'edges']
+
+
+def find_archives(root, subjects=None, fuzzers=None):
+  #walk root and return (subject, fuzzer, run, path) for every result archive
+  #both the flat layout (results-<subject>/*.tar.gz) and the per-fuzzer
+  #layout used in exp-data (results-<subject>/<Fuzzer>/*.tar.gz) are supported
+  archives = []
+  for dirpath, dirnames, filenames in os.walk(root):
+    dirnames.sort()
+    for name in sorted(filenames):
+      match = ARCHIVE_PATTERN.match(name)
+      if not match:
+        continue
+      subject, fuzzer, run = match.group(1), match.group(2).lower(), int(match.group(3))
+      if subjects and subject not in subjects:
+        continue
+      if fuzzers and fuzzer not in fuzzers:
+        continue
+      archives.append((subject, fuzzer, run, os.path.join(dirpath, name)))
+  return archives
+
+
+def member_part(name):
+  #the part a member of an output folder belongs to
+  parts = name.strip('/').split('/')
+  if len(parts) == 1:
+    return 'metrics'
+  for part, names in PARTS.items():
+    if parts[1] in names or '/'.join(parts[1:]) in names:
+      return part
+  return 'bulk'
+
+
+def archive_parts(path):
+  #the main archive of a run followed by its crashes and bulk parts, if they were collected
+  stem, ext = re.match(r'^(.*)(\.tar\.(?:gz|zst))$', path).groups()
+  return [path] + [stem + '.' + part + ext for part in ['crashes', 'bulk'] if os.path.exists(stem + '.' + part + ext)]
+
+
+@contextlib.contextmanager
+def open_archive(path):
+  #sequential reader for .tar.gz and .tar.zst archives
+  if not path.endswith('.zst'):
+    with tarfile.open(path, 'r|*') as tar:
+      yield tar
+    return
+  if zstandard is None:
+    raise RuntimeError("reading {} requires the zstandard module".format(path))
+  with open(path, 'rb') as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+    with tarfile.open(fileobj=reader, mode='r|') as tar:
+      yield tar
+
+
+def read_members(path, basenames):
+  #read the requested files (matched by basename at the top of the output folder)
+  #from an archive, stopping as soon as all of them have been found
+  wanted = set(basenames)
+  found = {}
+  with open_archive(path) as tar:
+    for member in tar:
+      parts = member.name.strip('/').split('/')
+      if len(parts) != 2 or parts[1] not in wanted or not member.isfile():
+        continue
+      found[parts[1]] = tar.extractfile(member).read()
+      if len(found) == len(wanted):
+        break
+  return found
+
+
+def parse_cov_over_time(data):
+  #return an (n, 5) float array: time, l_per, l_abs, b_per, b_abs
+  rows = []
+  for line in data.decode(errors='replace').splitlines()[1:]:
+    fields = [f.strip() for f in line.split(',')]
+    if len(fields) < 5:
+      continue
+    try:
+      rows.append([float(f) for f in fields[:5]])
+    except ValueError:
+      continue
+  return np.array(rows, dtype=float).reshape(-1, 5)
+
+
+def parse_plot_data(data):
+  #return an (n, 13) float array following PLOT_DATA_COLUMNS
+  #map_size is stored without its % sign; missing state columns are set to 0
+  width = len(PLOT_DATA_COLUMNS)
+  rows = []
+  for line in data.decode(errors='replace').splitlines():
+    if not line or line.startswith('#'):
+      continue
+    fields = [f.strip().rstrip('%') for f in line.split(',')]
+    try:
+      row = [float(f) for f in fields[:width]]
+    except ValueError:
+      continue
+    rows.append(row + [0.0] * (width - len(row)))
+  return np.array(rows, dtype=float).reshape(-1, width)
+
+
+def sample_over_time(times, values, cut_off, step, start=None):
+  #vectorized equivalent of the per-minute loop in profuzzbench_plot.py:
+  #for every minute t in [0, cut_off] (every step) take the last row (in file
+  #order) whose time is at or before start + t*60; t = 0 is always 0
+  #timestamps come from file mtimes and are not always monotonic, so rows are
+  #sorted by time and a running maximum of the file position is kept
+  #buckets with no row at or before them (an empty run, or a start before the first row) are NaN:
+  #like the loop, which skips such a run ("Issue with run"), the means leave them out
+  minutes = np.arange(1, cut_off + 1, step)
+  sampled = np.full(len(minutes) + 1, np.nan)
+  sampled[0] = 0
+  if len(times) == 0:
+    return np.concatenate(([0], minutes)), sampled
+  if start is None:
+    start = times[0]
+  order = np.argsort(times, kind='stable')
+  last_row = np.maximum.accumulate(order)
+  idx = np.searchsorted(times[order], start + minutes * 60, side='right') - 1
+  sampled[1:] = np.where(idx >= 0, values[last_row[np.clip(idx, 0, None)]], np.nan)
+  return np.concatenate(([0], minutes)), sampled
+
+
+def sample_archive(job):
+  #extract cov_over_time.csv and plot_data from one archive and sample them per minute
+  #returns a list of (kind, subject, fuzzer, run, data_type, minutes, values)
+  subject, fuzzer, run, path, cut_off, step = job
+  rows = []
+  try:
+    members = read_members(path, ['cov_over_time.csv', 'plot_data'])
+  except Exception as e:
+    print("Issue with {}: {}. Skipping".format(path, e))
+    return rows
+
+  #runs without rows are skipped, as the plot scripts do
+  if 'cov_over_time.csv' in members:
+    cov = parse_cov_over_time(members['cov_over_time.csv'])
+    if not len(cov):
+      print("Issue with {}: no rows in cov_over_time.csv. Skipping".format(path))
+    for i, cov_type in enumerate(COV_TYPES if len(cov) else []):
+      minutes, values = sample_over_time(cov[:, 0], cov[:, i + 1], cut_off, step)
+      rows.append(('cov', subject, fuzzer, run, cov_type, minutes, values))
+
+  if 'plot_data' in members:
+    plot = parse_plot_data(members['plot_data'])
+    if not len(plot):
+      print("Issue with {}: no rows in plot_data. Skipping".format(path))
+    for state_type in STATE_TYPES if len(plot) else []:
+      column = PLOT_DATA_COLUMNS.index('n_' + state_type)
+      minutes, values = sample_over_time(plot[:, 0], plot[:, column], cut_off, step)
+      rows.append(('state', subject, fuzzer, run, state_type, minutes, values))
+  return rows
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import math
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profuzzbench_data import find_archives, sample_archive
+
+#metric name -> (kind, data_type) as produced by sample_archive
+METRICS = {
+  'branches': ('cov', 'b_abs'),
+  'lines': ('cov', 'l_abs'),
+  'states': ('state', 'nodes'),
+  'transitions': ('state', 'edges'),
+}
+PERCENTS = [50, 80, 90, 95, 99]
+
+RUNS_FILE = 'runs.csv'
+CURVES_FILE = 'curves.npy'
+STATS_FILE = 'stats.csv'
+META_FILE = 'index.json'
+
+
+def mann_whitney_u(x, y):
+  #two-sided Mann-Whitney U test (normal approximation with tie and continuity
+  #correction) and the Vargha-Delaney A12 effect size of x over y
+  x = np.asarray(x, dtype=float)
+  y = np.asarray(y, dtype=float)
+  m, n = len(x), len(y)
+  if m == 0 or n == 0:
+    return float('nan'), float('nan'), float('nan')
+  values = np.concatenate((x, y))
+  ranks = pd.Series(values).rank(method='average').to_numpy()
+  r1 = ranks[:m].sum()
+  u1 = r1 - m * (m + 1) / 2.0
+  a12 = u1 / (m * n)
+
+  _, counts = np.unique(values, return_counts=True)
+  total = m + n
+  tie_term = (counts ** 3 - counts).sum() / (total * (total - 1)) if total > 1 else 0.0
+  sigma = math.sqrt(m * n / 12.0 * ((total + 1) - tie_term))
+  if sigma == 0:
+    return u1, 1.0, a12
+  z = (abs(u1 - m * n / 2.0) - 0.5) / sigma
+  p = math.erfc(max(z, 0.0) / math.sqrt(2))
+  return u1, min(p, 1.0), a12
+
+
+def first_reach(curves, targets, minutes):
+  #vectorized time-to-target: for every row of curves return the first minute
+  #at which the curve reaches the corresponding target (NaN if never)
+  reached = curves >= np.asarray(targets, dtype=float)[..., None]
+  hit = reached.any(axis=-1)
+  first = np.argmax(reached, axis=-1)
+  return np.where(hit, minutes[first], np.nan)
+
+
+def load_index(index_dir):
+  with open(os.path.join(index_dir, META_FILE)) as f:
+    meta = json.load(f)
+  runs = pd.read_csv(os.path.join(index_dir, RUNS_FILE))
+  curves = np.load(os.path.join(index_dir, CURVES_FILE), mmap_mode='r')
+  return meta, runs, curves
+
+
+def compute_stats(runs, curves, minutes):
+  #one pass over every (subject, metric): final coverage, time to X% of the
+  #final coverage, and comparisons of every fuzzer against every baseline
+  stats = []
+  for (subject, metric), group in runs.groupby(['subject', 'metric']):
+    fuzzers = sorted(group['fuzzer'].unique())
+    series = {f: np.asarray(curves[group[group['fuzzer'] == f]['row'].to_numpy()]) for f in fuzzers}
+    means = {f: series[f].mean(axis=0) for f in fuzzers}
+    finals = {f: series[f][:, -1] for f in fuzzers}
+
+    for fuzzer in fuzzers:
+      #time to X% of each run's own final coverage, median over runs
+      targets = finals[fuzzer][:, None] * (np.array(PERCENTS) / 100.0)
+      ttc = first_reach(np.repeat(series[fuzzer][:, None, :], len(PERCENTS), axis=1), targets, minutes)
+      ttc = np.nanmedian(np.where(np.isnan(ttc), np.inf, ttc), axis=0)
+
+      for baseline in fuzzers:
+        if baseline == fuzzer:
+          continue
+        #time for the fuzzer's mean curve to reach the baseline's final mean coverage
+        target = means[baseline][-1]
+        t_fuzzer, t_baseline = first_reach(np.stack((means[fuzzer], means[baseline])), [target, target], minutes)
+        u, p, a12 = mann_whitney_u(finals[fuzzer], finals[baseline])
+        row = {
+          'subject': subject, 'metric': metric, 'fuzzer': fuzzer, 'baseline': baseline,
+          'runs': len(finals[fuzzer]), 'baseline_runs': len(finals[baseline]),
+          'final_mean': finals[fuzzer].mean(), 'baseline_final_mean': finals[baseline].mean(),
+          'improvement': finals[fuzzer].mean() / finals[baseline].mean() if finals[baseline].mean() else float('nan'),
+          't_reach_baseline': t_fuzzer, 'baseline_t_reach': t_baseline,
+          'speedup': t_baseline / t_fuzzer if t_fuzzer and not np.isnan(t_fuzzer) else float('nan'),
+          'u': u, 'p_value': p, 'a12': a12,
+        }
+        for percent, value in zip(PERCENTS, ttc):
+          row['t{}'.format(percent)] = value
+        stats.append(row)
+  return pd.DataFrame(stats)
+
+
+def build(data_dir, index_dir, cut_off, step, jobs):
+  os.makedirs(index_dir, exist_ok=True)
+  archives = find_archives(data_dir)
+  signature = {a[3]: [os.path.getmtime(a[3]), os.path.getsize(a[3])] for a in archives}
+
+  #reuse the rows of archives that did not change since the last build
+  old_rows = []
+  old_curves = None
+  if os.path.exists(os.path.join(index_dir, META_FILE)):
+    meta, runs, curves = load_index(index_dir)
+    if meta['cut_off'] == cut_off and meta['step'] == step:
+      unchanged = {path for path, sig in meta['archives'].items() if signature.get(path) == sig}
+      old_rows = runs[runs['path'].isin(unchanged)]
+      old_curves = np.asarray(curves[old_rows['row'].to_numpy()])
+  done = set(old_rows['path']) if len(old_rows) else set()
+  todo = [a for a in archives if a[3] not in done]
+  print("Indexing {} new or changed runs ({} cached)".format(len(todo), len(done)))
+
+  records = []
+  new_curves = []
+  with ProcessPoolExecutor(max_workers=jobs) as executor:
+    for archive, rows in zip(todo, executor.map(sample_archive, [a + (cut_off, step) for a in todo])):
+      samples = {(kind, data_type): values for kind, _, _, _, data_type, minutes, values in rows}
+      for metric, key in METRICS.items():
+        if key in samples:
+          records.append({'subject': archive[0], 'fuzzer': archive[1], 'run': archive[2],
+                          'metric': metric, 'path': archive[3]})
+          new_curves.append(samples[key])
+
+  minutes = np.concatenate(([0], np.arange(1, cut_off + 1, step)))
+  runs = pd.concat([old_rows.drop(columns='row') if len(old_rows) else pd.DataFrame(), pd.DataFrame(records)],
+                   ignore_index=True)
+  parts = [c for c in (old_curves, np.array(new_curves, dtype=np.float32).reshape(-1, len(minutes))) if c is not None]
+  curves = np.concatenate(parts).astype(np.float32)
+  runs['row'] = np.arange(len(runs))
+
+  runs.to_csv(os.path.join(index_dir, RUNS_FILE), index=False)
+  np.save(os.path.join(index_dir, CURVES_FILE), curves)
+  stats = compute_stats(runs, curves, minutes) if len(runs) else pd.DataFrame()
+  stats.to_csv(os.path.join(index_dir, STATS_FILE), index=False)
+  with open(os.path.join(index_dir, META_FILE), 'w') as f:
+    json.dump({'cut_off': cut_off, 'step': step, 'archives': signature}, f)
+  print("Saved index of {} series to {}".format(len(runs), index_dir))
+
+
+def query(index_dir, subject, metric, fuzzer, baseline, percent, at):
+  meta, runs, curves = load_index(index_dir)
+  minutes = np.concatenate(([0], np.arange(1, meta['cut_off'] + 1, meta['step'])))
+  stats = pd.read_csv(os.path.join(index_dir, STATS_FILE))
+  for column, value in [('subject', subject), ('metric', metric), ('fuzzer', fuzzer), ('baseline', baseline)]:
+    if value:
+      stats = stats[stats[column] == value]
+
+  if at is not None or (percent is not None and percent not in PERCENTS):
+    #answer from the cached curves instead of the precomputed table
+    col = int(np.searchsorted(minutes, at, side='right') - 1) if at is not None else -1
+    rows = []
+    for (s, m, f), group in runs.groupby(['subject', 'metric', 'fuzzer']):
+      if (subject and s != subject) or (metric and m != metric) or (fuzzer and f != fuzzer):
+        continue
+      series = np.asarray(curves[group['row'].to_numpy()])
+      row = {'subject': s, 'metric': m, 'fuzzer': f, 'runs': len(series)}
+      if at is not None:
+        row['minute'] = minutes[col]
+        row['mean'] = series[:, col].mean()
+      if percent is not None:
+        targets = series[:, -1] * (percent / 100.0)
+        row['t{}'.format(percent)] = np.nanmedian(first_reach(series, targets, minutes))
+      rows.append(row)
+    print(pd.DataFrame(rows).to_string(index=False))
+    return
+
+  columns = ['subject', 'metric', 'fuzzer', 'baseline', 'final_mean', 'baseline_final_mean', 'improvement',
+             't_reach_baseline', 'baseline_t_reach', 'speedup', 'p_value', 'a12']
+  if percent is not None:
+    columns.append('t{}'.format(percent))
+  print(stats[columns].to_string(index=False))
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build or update the index")
+    build_parser.add_argument('-i','--data_dir',type=str,required=True,help="Folder containing results-<subject> folders (e.g., exp-data)")
+    build_parser.add_argument('-x','--index_dir',type=str,required=True,help="Folder keeping the index")
+    build_parser.add_argument('-c','--cut_off',type=int,default=1440,help="Cut-off time in minutes")
+    build_parser.add_argument('-s','--step',type=int,default=1,help="Time step in minutes")
+    build_parser.add_argument('-j','--jobs',type=int,default=os.cpu_count(),help="Number of worker processes")
+
+    query_parser = subparsers.add_parser('query', help="Query the index")
+    query_parser.add_argument('-x','--index_dir',type=str,required=True,help="Folder keeping the index")
+    query_parser.add_argument('-p','--put',type=str,default=None,help="Name of the subject program")
+    query_parser.add_argument('-m','--metric',type=str,default=None,choices=sorted(METRICS),help="Metric to compare")
+    query_parser.add_argument('-f','--fuzzer',type=str,default=None,help="Fuzzer to report")
+    query_parser.add_argument('-b','--baseline',type=str,default=None,help="Baseline fuzzer")
+    query_parser.add_argument('--percent',type=int,default=None,help="Report time to reach this percentage of the final coverage")
+    query_parser.add_argument('--at',type=int,default=None,help="Report the mean coverage at this minute")
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build(args.data_dir, args.index_dir, args.cut_off, args.step, args.jobs)
+    else:
+        query(args.index_dir, args.put, args.metric, args.fuzzer and args.fuzzer.lower(),
+              args.baseline and args.baseline.lower(), args.percent, args.at)
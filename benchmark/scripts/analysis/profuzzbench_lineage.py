@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from profuzzbench_data import find_archives, archive_parts, open_archive
+
+#folders of an output folder holding AFL-named test cases; the replayable ones
+#are preferred (AFLNet), the plain ones are used for AFL-style fuzzers
+FOLDERS = {
+  'paths': ['replayable-queue', 'queue'],
+  'crashes': ['replayable-crashes', 'crashes'],
+  'hangs': ['replayable-hangs', 'hangs'],
+}
+#written by stellafuzz.py and state_coverage.py and copied into the archive with llm_outputs
+LINEAGE_FILE = 'seed_lineage.json'
+STATE_COVERAGE_FILE = 'state_coverage.json'
+GENERATED_SEED = re.compile(r'^new_\d+\.raw$')
+
+CACHE_FILE = 'lineage.json'
+STAGES_FILE = 'stages.csv'
+ROOTS_FILE = 'roots.csv'
+
+
+def parse_name(name):
+  #id:000012,src:000003+000007,op:splice,rep:2 -> (12, {'src': '000003+000007', 'op': 'splice', ...})
+  fields = {}
+  for field in name.split(','):
+    key, _, value = field.partition(':')
+    fields[key] = value
+  try:
+    return int(fields.pop('id')), fields
+  except (KeyError, ValueError):
+    return None, fields
+
+
+def scan_archive(path):
+  #names of the queue, crash and hang entries of a run, plus its seed lineage and state coverage files;
+  #when the bulk part was not collected the names come from the member list in <run>.index.json
+  names = {}
+  files = {}
+  archive_files = archive_parts(path)
+  for part in archive_files:
+    with open_archive(part) as tar:
+      for member in tar:
+        parts = member.name.strip('/').split('/')
+        if len(parts) != 3:
+          continue
+        if parts[2].startswith('id:'):
+          names.setdefault(parts[1], set()).add(parts[2])
+        elif parts[1] == 'llm_outputs' and parts[2] in [LINEAGE_FILE, STATE_COVERAGE_FILE] and member.isfile():
+          files[parts[2]] = json.loads(tar.extractfile(member).read())
+  index_file = re.sub(r'\.tar\.(?:gz|zst)$', '.index.json', path)
+  if os.path.exists(index_file) and not any('.bulk.tar.' in part for part in archive_files):
+    with open(index_file) as f:
+      for name, size, part in json.load(f)['members']:
+        parts = name.strip('/').split('/')
+        if len(parts) == 3 and parts[2].startswith('id:'):
+          names.setdefault(parts[1], set()).add(parts[2])
+  return names, files
+
+
+def entry_names(names, kind):
+  for folder in FOLDERS[kind]:
+    if folder in names:
+      return names[folder]
+  return set()
+
+
+def root_stage(seed, lineage):
+  #stage and origin of a root: from the seed lineage, or 'original' for the seeds that were not generated
+  origin = lineage.get(seed)
+  if origin:
+    return origin.get('stage') or 'unknown', 'seed' if origin.get('seed') else 'default'
+  if GENERATED_SEED.match(seed):
+    return 'unknown', ''
+  return 'original', ''
+
+
+def ancestry(names):
+  #roots of every queue entry: an orig: entry is its own root, the others inherit the roots of their
+  #src: parents (two for splicing); parents always have lower ids, so one pass in id order suffices
+  roots = {}
+  seeds = {}
+  for queue_id, fields in sorted(p for p in map(parse_name, entry_names(names, 'paths')) if p[0] is not None):
+    if 'orig' in fields:
+      roots[queue_id] = frozenset([queue_id])
+      seeds[queue_id] = fields['orig']
+    elif 'src' in fields and 'sync' not in fields:
+      roots[queue_id] = frozenset().union(*(roots.get(int(p), ()) for p in fields['src'].split('+') if p.isdigit()))
+    else:
+      #entries synced from other instances have ids of another queue
+      roots[queue_id] = frozenset()
+  return roots, seeds
+
+
+def descendants(names, kind, roots, seeds):
+  #roots of every entry of kind; for paths the roots themselves are not counted
+  by_seed = {seed: queue_id for queue_id, seed in seeds.items()}
+  result = []
+  for name in entry_names(names, kind):
+    entry_id, fields = parse_name(name)
+    if entry_id is None:
+      continue
+    if kind == 'paths':
+      if entry_id not in seeds:
+        result.append(roots.get(entry_id, frozenset()))
+    elif 'orig' in fields and fields['orig'] in by_seed:
+      result.append(frozenset([by_seed[fields['orig']]]))
+    elif 'src' in fields and 'sync' not in fields:
+      result.append(frozenset().union(*(roots.get(int(p), ()) for p in fields['src'].split('+') if p.isdigit())))
+  return result
+
+
+def analyze(job):
+  #per-stage and per-root yield of one run; an entry descending from several stages counts for each of them
+  subject, fuzzer, run, path, lineage = job
+  names, files = scan_archive(path)
+  lineage = lineage or files.get(LINEAGE_FILE, {})
+  roots, seeds = ancestry(names)
+  #generated seeds without a lineage all end up as 'unknown'; reported by main
+  missing = not lineage and any(GENERATED_SEED.match(seed) for seed in seeds.values())
+  state_sequences = files.get(STATE_COVERAGE_FILE, {}).get('state_sequences', {})
+  groups = {queue_id: root_stage(seed, lineage) for queue_id, seed in seeds.items()}
+
+  stages = {}
+  root_rows = {}
+  for queue_id, seed in seeds.items():
+    origin = lineage.get(seed, {})
+    stage = stages.setdefault(groups[queue_id], {'roots': 0, 'paths': 0, 'crashes': 0, 'hangs': 0,
+                                                 'nodes': set(), 'edges': set()})
+    stage['roots'] += 1
+    states = state_sequences.get(seed, [])
+    stage['nodes'].update(states)
+    stage['edges'].update('{}-{}'.format(a, b) for a, b in zip(states, states[1:]))
+    root_rows[queue_id] = {'seed': seed, 'stage': groups[queue_id][0], 'origin': groups[queue_id][1],
+                           'source_seed': origin.get('seed') or '', 'sequence': origin.get('sequence', ''),
+                           'type_sequence': ' '.join(origin.get('type_sequence', [])),
+                           'paths': 0, 'crashes': 0, 'hangs': 0}
+  for kind in ['paths', 'crashes', 'hangs']:
+    for entry_roots in descendants(names, kind, roots, seeds):
+      for group in {groups[r] for r in entry_roots}:
+        stages[group][kind] += 1
+      for r in entry_roots:
+        root_rows[r][kind] += 1
+
+  stage_rows = []
+  for (stage, origin), counts in sorted(stages.items()):
+    stage_rows.append({'stage': stage, 'origin': origin, 'roots': counts['roots'], 'paths': counts['paths'],
+                       'crashes': counts['crashes'], 'hangs': counts['hangs'],
+                       'nodes': len(counts['nodes']) if state_sequences else None,
+                       'edges': len(counts['edges']) if state_sequences else None})
+  return stage_rows, list(root_rows.values()), missing
+
+
+def signature(path):
+  #a run is re-analyzed when any of its parts or its member index changes
+  files = archive_parts(path) + [f for f in [re.sub(r'\.tar\.(?:gz|zst)$', '.index.json', path)] if os.path.exists(f)]
+  return [[os.path.basename(f), os.path.getmtime(f), os.path.getsize(f)] for f in files]
+
+
+def main(data_dir, out_dir, subjects, fuzzers, manifest, jobs):
+  os.makedirs(out_dir, exist_ok=True)
+  lineage = None
+  if manifest:
+    with open(manifest) as f:
+      lineage = json.load(f)
+
+  #reuse the results of archives that did not change since the last run
+  cache_file = os.path.join(out_dir, CACHE_FILE)
+  cache = {'manifest': None, 'archives': {}}
+  if os.path.exists(cache_file):
+    with open(cache_file) as f:
+      cache = json.load(f)
+  manifest_sig = [os.path.abspath(manifest), os.path.getmtime(manifest)] if manifest else None
+  if cache['manifest'] != manifest_sig:
+    cache = {'manifest': manifest_sig, 'archives': {}}
+
+  archives = find_archives(data_dir, subjects, fuzzers)
+  signatures = {a[3]: signature(a[3]) for a in archives}
+  todo = [a for a in archives if cache['archives'].get(a[3], {}).get('signature') != signatures[a[3]]]
+  print("Tracing lineage of {} new or changed runs ({} cached)".format(len(todo), len(archives) - len(todo)))
+
+  with ProcessPoolExecutor(max_workers=jobs) as executor:
+    for archive, (stage_rows, root_rows, missing) in zip(todo, executor.map(analyze, [a + (lineage,) for a in todo])):
+      cache['archives'][archive[3]] = {'signature': signatures[archive[3]], 'subject': archive[0],
+                                       'fuzzer': archive[1], 'run': archive[2], 'stages': stage_rows, 'roots': root_rows,
+                                       'missing_lineage': missing}
+  #runs whose archives were removed are dropped, the ones filtered out by subject or fuzzer are kept
+  cache['archives'] = {path: entry for path, entry in cache['archives'].items() if os.path.exists(path)}
+  with open(cache_file, 'w') as f:
+    json.dump(cache, f)
+
+  missing = [path for path in signatures if cache['archives'][path].get('missing_lineage')]
+  if missing:
+    print("Warning: {} runs have generated seeds but no {}, their stages are 'unknown' (collected before "
+          "llm_outputs was part of the metrics tier?); pass --manifest:".format(len(missing), LINEAGE_FILE))
+    for path in missing:
+      print("  {}".format(path))
+
+  stages = []
+  roots = []
+  for entry in [cache['archives'][path] for path in signatures]:
+    keys = {'subject': entry['subject'], 'fuzzer': entry['fuzzer'], 'run': entry['run']}
+    stages.extend(dict(keys, **row) for row in entry['stages'])
+    roots.extend(dict(keys, **row) for row in entry['roots'])
+  stages = pd.DataFrame(stages, columns=['subject', 'fuzzer', 'run', 'stage', 'origin', 'roots', 'paths',
+                                         'crashes', 'hangs', 'nodes', 'edges'])
+  stages.to_csv(os.path.join(out_dir, STAGES_FILE), index=False)
+  pd.DataFrame(roots).to_csv(os.path.join(out_dir, ROOTS_FILE), index=False)
+  if stages.empty:
+    print("No queue entries found")
+    return
+
+  #mean per run of every stage, and the yield per generated seed as a proxy of its generation cost
+  summary = stages.groupby(['subject', 'fuzzer', 'stage', 'origin'])[['roots', 'paths', 'crashes', 'hangs', 'nodes', 'edges']].mean()
+  summary.insert(0, 'runs', stages.groupby(['subject', 'fuzzer', 'stage', 'origin'])['run'].nunique())
+  summary['paths_per_root'] = summary['paths'] / summary['roots']
+  print(summary.round(2).to_string())
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i','--data_dir',type=str,required=True,help="Folder containing results-<subject> folders (e.g., exp-data)")
+    parser.add_argument('-o','--out_dir',type=str,required=True,help="Folder keeping the cache, stages.csv and roots.csv")
+    parser.add_argument('-p','--put',type=str,nargs='*',default=None,help="Subjects to include (default: all)")
+    parser.add_argument('-f','--fuzzers',type=str,nargs='*',default=None,help="Fuzzers to include (default: all)")
+    parser.add_argument('-m','--manifest',type=str,default=None,help="seed_lineage.json to use instead of the one in each archive")
+    parser.add_argument('-j','--jobs',type=int,default=os.cpu_count(),help="Number of worker processes")
+    args = parser.parse_args()
+    main(args.data_dir, args.out_dir, args.put, args.fuzzers and [f.lower() for f in args.fuzzers], args.manifest, args.jobs)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from profuzzbench_data import parse_plot_data, PLOT_DATA_COLUMNS
+
+#output folders are named out-<subject>-<fuzzer>, optionally suffixed with the run index
+OUTDIR_PATTERN = re.compile(r'^out-(.+)-([a-z][a-z0-9]*)(?:[-_](\d+))?$')
+FIELDS = ['paths_total', 'execs_per_sec', 'n_nodes', 'n_edges']
+
+
+class LocalSource:
+  #a plot_data file in a local directory tree
+  def __init__(self, path):
+    self.path = path
+
+  def read(self, offset):
+    with open(self.path, 'rb') as f:
+      f.seek(offset)
+      return f.read()
+
+
+class DockerSource:
+  #a plot_data file inside a running container; only the new bytes are transferred
+  def __init__(self, container, path):
+    self.container = container
+    self.path = path
+
+  def read(self, offset):
+    result = subprocess.run(['docker', 'exec', self.container, 'tail', '-c', '+{}'.format(offset + 1), self.path],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout
+
+
+class Run:
+  def __init__(self, name, subject, fuzzer, source):
+    self.name = name
+    self.subject = subject
+    self.fuzzer = fuzzer
+    self.source = source
+    self.offset = 0
+    self.partial = b''
+    self.last = None
+    self.last_change = time.time()
+    self.rows = 0
+    #set once the container exited or the output folder was removed; the run keeps its last row
+    self.finished = False
+
+  def poll(self):
+    #read only the bytes appended since the last poll and parse the complete lines
+    try:
+      data = self.source.read(self.offset)
+    except OSError:
+      return
+    if not data:
+      return
+    self.offset += len(data)
+    data = self.partial + data
+    end = data.rfind(b'\n') + 1
+    self.partial = data[end:]
+    rows = parse_plot_data(data[:end])
+    if len(rows):
+      self.last = dict(zip(PLOT_DATA_COLUMNS, rows[-1]))
+      self.rows += len(rows)
+      self.last_change = time.time()
+
+
+def discover_local(root, runs):
+  for run in runs.values():
+    if isinstance(run.source, LocalSource) and not os.path.exists(run.source.path):
+      run.finished = True
+  for dirpath, dirnames, filenames in os.walk(root):
+    if 'plot_data' not in filenames or dirpath in runs:
+      continue
+    name = os.path.basename(dirpath)
+    match = OUTDIR_PATTERN.match(name)
+    subject, fuzzer = (match.group(1), match.group(2)) if match else (name, '?')
+    runs[dirpath] = Run(os.path.relpath(dirpath, root), subject, fuzzer, LocalSource(os.path.join(dirpath, 'plot_data')))
+
+
+def discover_docker(runs):
+  result = subprocess.run(['docker', 'ps', '-q'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+  if result.returncode != 0:
+    return
+  running = result.stdout.split()
+  for container, run in runs.items():
+    if isinstance(run.source, DockerSource) and container not in running:
+      run.finished = True
+  for container in running:
+    if container in runs:
+      continue
+    found = subprocess.run(['docker', 'exec', container, 'find', '/home/ubuntu/experiments', '-name', 'plot_data',
+                            '-path', '*out-*'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    paths = found.stdout.split()
+    if not paths:
+      continue
+    match = OUTDIR_PATTERN.match(os.path.basename(os.path.dirname(paths[0])))
+    subject, fuzzer = (match.group(1), match.group(2)) if match else ('?', '?')
+    runs[container] = Run(container, subject, fuzzer, DockerSource(container, paths[0]))
+
+
+def snapshot(runs, stall_after, slow_ratio):
+  #aggregate the latest row of every live run per (subject, fuzzer) and flag stalled or slow runs;
+  #finished runs are listed with their last row but left out of the means and flags
+  now = time.time()
+  groups = {}
+  for run in runs.values():
+    if run.last and not run.finished:
+      groups.setdefault((run.subject, run.fuzzer), []).append(run)
+
+  result = {'time': now, 'groups': [], 'runs': [], 'finished': []}
+  for run in runs.values():
+    if run.last and run.finished:
+      entry = {'run': run.name, 'subject': run.subject, 'fuzzer': run.fuzzer}
+      for field in FIELDS:
+        entry[field] = run.last[field]
+      result['finished'].append(entry)
+  for (subject, fuzzer), members in sorted(groups.items()):
+    speeds = [run.last['execs_per_sec'] for run in members]
+    median_speed = statistics.median(speeds)
+    group = {'subject': subject, 'fuzzer': fuzzer, 'runs': len(members)}
+    for field in FIELDS:
+      group[field] = statistics.mean(run.last[field] for run in members)
+    result['groups'].append(group)
+    for run in members:
+      flags = []
+      if now - run.last_change > stall_after:
+        flags.append('stalled')
+      if median_speed and run.last['execs_per_sec'] < slow_ratio * median_speed:
+        flags.append('slow')
+      entry = {'run': run.name, 'subject': subject, 'fuzzer': fuzzer,
+               'age': int(now - run.last['unix_time']), 'flags': flags}
+      for field in FIELDS:
+        entry[field] = run.last[field]
+      result['runs'].append(entry)
+  return result
+
+
+def render_text(snap):
+  lines = ['ProFuzzBench monitor - {}'.format(time.strftime('%H:%M:%S', time.localtime(snap['time']))), '']
+  lines.append('{:<20} {:<12} {:>5} {:>12} {:>14} {:>8} {:>8}'.format(
+    'subject', 'fuzzer', 'runs', 'paths_total', 'execs_per_sec', 'n_nodes', 'n_edges'))
+  for g in snap['groups']:
+    lines.append('{:<20} {:<12} {:>5} {:>12.1f} {:>14.2f} {:>8.1f} {:>8.1f}'.format(
+      g['subject'], g['fuzzer'], g['runs'], g['paths_total'], g['execs_per_sec'], g['n_nodes'], g['n_edges']))
+  if snap.get('finished'):
+    lines.append('')
+    lines.append('Finished runs (not in the means): {}'.format(len(snap['finished'])))
+  flagged = [r for r in snap['runs'] if r['flags']]
+  if flagged:
+    lines.append('')
+    lines.append('Flagged runs:')
+    for r in flagged:
+      lines.append('  {:<40} {:<16} last update {}s ago, {:.2f} execs/s'.format(
+        r['run'], ','.join(r['flags']), r['age'], r['execs_per_sec']))
+  return '\n'.join(lines)
+
+
+def serve(port, state):
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      snap = state.get('snapshot') or {'groups': [], 'runs': [], 'time': time.time()}
+      if self.path.startswith('/json'):
+        body = json.dumps(snap).encode()
+        content_type = 'application/json'
+      else:
+        body = ('<!DOCTYPE html><html><head><meta http-equiv="refresh" content="{}"></head>'
+                '<body><pre>{}</pre></body></html>').format(state['interval'], render_text(snap)).encode()
+        content_type = 'text/html'
+      self.send_response(200)
+      self.send_header('Content-Type', content_type)
+      self.send_header('Content-Length', str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, format, *args):
+      pass
+
+  server = ThreadingHTTPServer(('', port), Handler)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  return server
+
+
+def main(data_dir, docker, interval, stall_after, slow_ratio, http_port, once):
+  runs = {}
+  state = {'interval': interval, 'snapshot': None}
+  if http_port:
+    serve(http_port, state)
+    print("Serving on http://localhost:{}/ (JSON at /json)".format(http_port))
+
+  while True:
+    if data_dir:
+      discover_local(data_dir, runs)
+    if docker:
+      discover_docker(runs)
+    for run in runs.values():
+      if not run.finished:
+        run.poll()
+    state['snapshot'] = snapshot(runs, stall_after, slow_ratio)
+    text = render_text(state['snapshot'])
+    if once:
+      print(text)
+      return
+    if sys.stdout.isatty():
+      sys.stdout.write('\033[2J\033[H')
+    print(text)
+    sys.stdout.flush()
+    time.sleep(interval)
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i','--data_dir',type=str,default=None,help="Local folder tree containing output folders with plot_data")
+    parser.add_argument('-d','--docker',action='store_true',help="Monitor plot_data inside running containers")
+    parser.add_argument('-n','--interval',type=float,default=10,help="Refresh interval in seconds")
+    parser.add_argument('--stall',type=float,default=600,help="Flag runs whose plot_data did not grow for this many seconds")
+    parser.add_argument('--slow',type=float,default=0.5,help="Flag runs slower than this fraction of their group's median execs_per_sec")
+    parser.add_argument('--http',type=int,default=None,help="Also serve the view on this HTTP port")
+    parser.add_argument('--once',action='store_true',help="Print one snapshot and exit")
+    args = parser.parse_args()
+    if not args.data_dir and not args.docker:
+        parser.error("either --data_dir or --docker is required")
+    main(args.data_dir, args.docker, args.interval, args.stall, args.slow, args.http, args.once)
@@ -8,16 +8,10 @@ from matplotlib import pyplot as plt
 import pandas as pd
 
 
-def main(csv_file, put, runs, cut_off, step, out_file, fuzzers):
-  #Read the results
-  df = read_csv(csv_file)
-
+def mean_coverage(df, put, runs, cut_off, step, fuzzers):
   #Calculate the mean of code coverage
   #Store in a list first for efficiency
   mean_list = []
-  
-  # Set global font sizes
-  plt.rcParams.update({'font.size': 30})
 
   for subject in [put]:
     for fuzzer in fuzzers:
@@ -54,6 +48,17 @@ def main(csv_file, put, runs, cut_off, step, out_file, fuzzers):
           
           #add a new row
           mean_list.append((subject, fuzzer, cov_type, time, cov_total / max(run_count,1)))
+  return mean_list
+
+
+def main(csv_file, put, runs, cut_off, step, out_file, fuzzers):
+  #Read the results
+  df = read_csv(csv_file)
+
+  mean_list = mean_coverage(df, put, runs, cut_off, step, fuzzers)
+
+  # Set global font sizes
+  plt.rcParams.update({'font.size': 30})
 
   #Convert the list to a dataframe
   mean_df = pd.DataFrame(mean_list, columns = ['subject', 'fuzzer', 'cov_type', 'time', 'cov'])
@@ -8,10 +8,7 @@ from matplotlib import pyplot as plt
 import pandas as pd
 
 
-def main(csv_file, put, runs, cut_off, step, out_file, fuzzers):
-  #Read the results
-  df = read_csv(csv_file)
-
+def mean_states(df, put, runs, cut_off, step, fuzzers):
   #Calculate the mean of code coverage
   #Store in a list first for efficiency
   mean_list = []
@@ -48,6 +45,14 @@ def main(csv_file, put, runs, cut_off, step, out_file, fuzzers):
           
           #add a new row
           mean_list.append((subject, fuzzer, data_type, time, cov_total / max(run_count,1)))
+  return mean_list
+
+
+def main(csv_file, put, runs, cut_off, step, out_file, fuzzers):
+  #Read the results
+  df = read_csv(csv_file)
+
+  mean_list = mean_states(df, put, runs, cut_off, step, fuzzers)
 
   #Convert the list to a dataframe
   mean_df = pd.DataFrame(mean_list, columns = ['subject', 'fuzzer', 'data_type', 'time', 'data'])
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+from profuzzbench_data import find_archives, archive_parts, open_archive
+
+#sanitizer report lines
+ERROR_LINE = re.compile(r'ERROR: (AddressSanitizer|LeakSanitizer|MemorySanitizer|ThreadSanitizer): ([\w-]+)')
+UBSAN_LINE = re.compile(r'^(\S+?):(\d+):\d+: runtime error: (.*)$', re.MULTILINE)
+FRAME_LINE = re.compile(r'^[ \t]*#(\d+) 0x[0-9a-f]+(?: in (\S+))?(?: ([^\s(]\S*))?[ \t]*(?:\((\S+?\+0x[0-9a-f]+)\))?', re.MULTILINE)
+#frames that belong to the sanitizer runtime or libc and say nothing about the bug
+IGNORED_FRAMES = re.compile(r'^(__asan|__ubsan|__sanitizer|__interceptor|__libc_start|_start$|__GI_|interceptor_|asan_)')
+
+STATE_FILE = 'triage.json'
+
+
+def normalize_frames(report, top):
+  #return the top N frames of the first stack trace as 'function file' strings
+  #without addresses, line numbers or build paths
+  frames = []
+  for match in FRAME_LINE.finditer(report):
+    if match.group(1) == '0' and frames:
+      break
+    function, location, module = match.group(2), match.group(3), match.group(4)
+    if function and IGNORED_FRAMES.match(function):
+      continue
+    if function:
+      source = os.path.basename(location.split(':')[0]) if location else ''
+      frames.append('{} {}'.format(function, source).strip())
+    elif module:
+      #unsymbolized frame (ASAN_OPTIONS=symbolize=0): module+offset is stable across runs
+      frames.append(os.path.basename(module))
+    if len(frames) == top:
+      break
+  return frames
+
+
+def bucket_report(report, returncode, top):
+  #return (bucket hash, kind, frames) for one replay
+  error = ERROR_LINE.search(report)
+  if error:
+    kind = '{}: {}'.format(error.group(1), error.group(2))
+    frames = normalize_frames(report[error.start():], top)
+  else:
+    ubsan = UBSAN_LINE.search(report)
+    if ubsan:
+      kind = 'UndefinedBehaviorSanitizer: {}'.format(re.sub(r"[-\d]+|'[^']*'", 'N', ubsan.group(3)))
+      frames = ['{}:{}'.format(os.path.basename(ubsan.group(1)), ubsan.group(2))]
+    elif returncode is not None and returncode < 0:
+      kind = 'signal {}'.format(-returncode)
+      frames = []
+    else:
+      return None, 'not reproduced', []
+  digest = hashlib.sha1('\n'.join([kind] + frames).encode()).hexdigest()[:16]
+  return digest, kind, frames
+
+
+def collect_crashes(data_dir, work_dir, state):
+  #extract replayable-crashes/id* from every archive (or take them from extracted
+  #output folders) and return the ones not triaged yet
+  crashes = []
+  for subject, fuzzer, run, path in find_archives(data_dir):
+    #crashes are in the main archive, or in its crashes part when collected by tier
+    for part in archive_parts(path):
+      if '.bulk.tar.' in part:
+        continue
+      with open_archive(part) as tar:
+        for member in tar:
+          parts = member.name.strip('/').split('/')
+          if len(parts) != 3 or parts[1] != 'replayable-crashes' or not parts[2].startswith('id'):
+            continue
+          key = '{}:{}'.format(os.path.basename(path), parts[2])
+          if key in state['crashes'] or not member.isfile():
+            continue
+          dest = os.path.join(work_dir, '{}-{}-{}'.format(subject, fuzzer, run), parts[2])
+          os.makedirs(os.path.dirname(dest), exist_ok=True)
+          with open(dest, 'wb') as f:
+            f.write(tar.extractfile(member).read())
+          crashes.append({'key': key, 'file': dest, 'subject': subject, 'fuzzer': fuzzer, 'run': run,
+                          'time': member.mtime})
+  for dirpath, dirnames, filenames in os.walk(data_dir):
+    if os.path.basename(dirpath) != 'replayable-crashes' or os.path.abspath(dirpath).startswith(os.path.abspath(work_dir)):
+      continue
+    outdir = os.path.basename(os.path.dirname(dirpath))
+    for name in sorted(filenames):
+      key = '{}:{}'.format(outdir, name)
+      if name.startswith('id') and key not in state['crashes']:
+        file_path = os.path.join(dirpath, name)
+        crashes.append({'key': key, 'file': file_path, 'subject': outdir, 'fuzzer': '', 'run': 0,
+                        'time': int(os.path.getmtime(file_path))})
+  return crashes
+
+
+def replay_crash(crash, slots, server, replayer, server_timeout, top):
+  #start the replayer in background and the server under a timeout, like crash_script does
+  port = slots.get()
+  try:
+    fmt = {'port': port, 'file': crash['file']}
+    client = subprocess.Popen(shlex.split(replayer.format(**fmt)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    proc = subprocess.Popen(shlex.split(server.format(**fmt)), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+      _, stderr = proc.communicate(timeout=server_timeout)
+    except subprocess.TimeoutExpired:
+      proc.terminate()
+      try:
+        _, stderr = proc.communicate(timeout=1)
+      except subprocess.TimeoutExpired:
+        proc.kill()
+        _, stderr = proc.communicate()
+    try:
+      client.wait(timeout=1)
+    except subprocess.TimeoutExpired:
+      client.kill()
+      client.wait()
+  finally:
+    slots.put(port)
+
+  report = stderr.decode(errors='replace')
+  digest, kind, frames = bucket_report(report, proc.returncode, top)
+  return crash, digest, kind, frames, report
+
+
+def summarize(state, summary_file):
+  buckets = sorted(state['buckets'].values(), key=lambda b: b['first_seen'])
+  lines = ['bucket,kind,count,first_seen,first_input,subjects,fuzzers,top_frames']
+  for bucket in buckets:
+    lines.append('{},"{}",{},{},{},{},{},"{}"'.format(
+      bucket['hash'], bucket['kind'], bucket['count'],
+      time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(bucket['first_seen'])), bucket['first_input'],
+      ' '.join(sorted(bucket['subjects'])), ' '.join(sorted(bucket['fuzzers'])), ' | '.join(bucket['frames'])))
+  with open(summary_file, 'w') as f:
+    f.write('\n'.join(lines) + '\n')
+  for bucket in buckets:
+    print('{} {:>5}  {}  {}'.format(bucket['hash'], bucket['count'], bucket['kind'], ' | '.join(bucket['frames'])))
+
+
+def main(data_dir, out_dir, server, replayer, base_port, workers, server_timeout, top):
+  os.makedirs(out_dir, exist_ok=True)
+  state_file = os.path.join(out_dir, STATE_FILE)
+  state = {'crashes': {}, 'buckets': {}}
+  if os.path.exists(state_file):
+    with open(state_file) as f:
+      state = json.load(f)
+
+  crashes = collect_crashes(data_dir, os.path.join(out_dir, 'inputs'), state)
+  print("Replaying {} new crashes ({} already triaged)".format(len(crashes), len(state['crashes'])))
+
+  slots = Queue()
+  for i in range(workers):
+    slots.put(base_port + i)
+  reports_dir = os.path.join(out_dir, 'reports')
+  os.makedirs(reports_dir, exist_ok=True)
+
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    futures = [executor.submit(replay_crash, crash, slots, server, replayer, server_timeout, top) for crash in crashes]
+    for future in futures:
+      crash, digest, kind, frames, report = future.result()
+      state['crashes'][crash['key']] = digest
+      if digest is None:
+        continue
+      bucket = state['buckets'].setdefault(digest, {
+        'hash': digest, 'kind': kind, 'frames': frames, 'count': 0, 'first_seen': crash['time'],
+        'first_input': crash['key'], 'subjects': [], 'fuzzers': []})
+      bucket['count'] += 1
+      if crash['time'] < bucket['first_seen']:
+        bucket['first_seen'] = crash['time']
+        bucket['first_input'] = crash['key']
+      for field, value in [('subjects', crash['subject']), ('fuzzers', crash['fuzzer'])]:
+        if value and value not in bucket[field]:
+          bucket[field].append(value)
+      report_file = os.path.join(reports_dir, digest + '.txt')
+      if not os.path.exists(report_file):
+        with open(report_file, 'w') as f:
+          f.write(report)
+
+  with open(state_file, 'w') as f:
+    json.dump(state, f, indent=2)
+  summarize(state, os.path.join(out_dir, 'buckets.csv'))
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i','--data_dir',type=str,required=True,help="Folder with result archives or extracted output folders")
+    parser.add_argument('-o','--out_dir',type=str,required=True,help="Folder keeping the triage state, reports and buckets.csv")
+    parser.add_argument('-s','--server',type=str,required=True,help="Server command, e.g. \"./fftp fftp.conf {port}\"")
+    parser.add_argument('-r','--replayer',type=str,required=True,help="Replay command, e.g. \"aflnet-replay {file} FTP {port} 1\"")
+    parser.add_argument('-p','--port',type=int,required=True,help="First port; worker slots use consecutive ports")
+    parser.add_argument('-j','--jobs',type=int,default=4,help="Number of parallel worker slots")
+    parser.add_argument('-t','--timeout',type=float,default=3,help="Server timeout in seconds for each replay")
+    parser.add_argument('-n','--frames',type=int,default=3,help="Number of top frames used for bucketing")
+    args = parser.parse_args()
+    main(args.data_dir, args.out_dir, args.server, args.replayer, args.port, args.jobs, args.timeout, args.frames)
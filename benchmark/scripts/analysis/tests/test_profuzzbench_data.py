@@ -0,0 +1,31 @@
+import numpy as np
+
+from profuzzbench_data import sample_over_time
+
+
+def test_sample_over_time_takes_last_row_per_minute():
+  times = np.array([0, 30, 60, 150, 170], dtype=float)
+  values = np.array([1, 2, 3, 4, 5], dtype=float)
+  minutes, sampled = sample_over_time(times, values, 3, 1)
+  assert list(minutes) == [0, 1, 2, 3]
+  assert list(sampled) == [0, 3, 3, 5]
+
+
+def test_sample_over_time_uses_file_order_for_unsorted_times():
+  #the row later in the file wins even though its mtime is earlier
+  times = np.array([50, 40], dtype=float)
+  values = np.array([7, 9], dtype=float)
+  _, sampled = sample_over_time(times, values, 1, 1, start=0)
+  assert list(sampled) == [0, 9]
+
+
+def test_sample_over_time_leaves_empty_buckets_out():
+  _, sampled = sample_over_time(np.array([]), np.array([]), 2, 1)
+  assert sampled[0] == 0
+  assert np.isnan(sampled[1:]).all()
+
+  #minutes before the first row have no data
+  _, sampled = sample_over_time(np.array([150.0]), np.array([4.0]), 3, 1, start=0)
+  assert sampled[0] == 0
+  assert np.isnan(sampled[1]) and np.isnan(sampled[2])
+  assert sampled[3] == 4
@@ -0,0 +1,37 @@
+import math
+
+import numpy as np
+
+from profuzzbench_index import mann_whitney_u, first_reach
+
+
+def test_mann_whitney_u_separated_samples():
+  u, p, a12 = mann_whitney_u([6, 7, 8, 9, 10], [1, 2, 3, 4, 5])
+  assert u == 25
+  assert a12 == 1.0
+  #exact two-sided p is 0.0079; the normal approximation with continuity correction gives 0.0122
+  assert math.isclose(p, 0.0122, abs_tol=5e-4)
+
+
+def test_mann_whitney_u_is_symmetric():
+  x, y = [3, 5, 5, 8], [1, 5, 6]
+  u1, p1, a1 = mann_whitney_u(x, y)
+  u2, p2, a2 = mann_whitney_u(y, x)
+  assert math.isclose(a1 + a2, 1.0)
+  assert math.isclose(u1 + u2, len(x) * len(y))
+  assert math.isclose(p1, p2)
+
+
+def test_mann_whitney_u_ties_and_empty_samples():
+  u, p, a12 = mann_whitney_u([4, 4, 4], [4, 4])
+  assert a12 == 0.5
+  assert p == 1.0
+  assert all(math.isnan(v) for v in mann_whitney_u([], [1, 2]))
+
+
+def test_first_reach():
+  minutes = np.array([0, 1, 2, 3])
+  curves = np.array([[0, 5, 10, 10], [0, 1, 2, 3]], dtype=float)
+  reached = first_reach(curves, [10, 10], minutes)
+  assert reached[0] == 2
+  assert np.isnan(reached[1])
@@ -0,0 +1,37 @@
+from profuzzbench_lineage import parse_name, ancestry, descendants, root_stage
+
+
+def test_parse_name():
+  assert parse_name('id:000012,src:000003+000007,op:splice,rep:2') == (12, {'src': '000003+000007', 'op': 'splice', 'rep': '2'})
+  assert parse_name('README.txt')[0] is None
+
+
+def test_ancestry_follows_src_and_splices():
+  names = {'replayable-queue': {
+    'id:000000,orig:new_1.raw',
+    'id:000001,orig:seed_ftp.raw',
+    'id:000002,src:000000,op:havoc,rep:4',
+    'id:000003,src:000002+000001,op:splice,rep:2',
+    'id:000004,sync:other,src:000001',
+    'id:000005,src:000004,op:flip1',
+  }, 'queue': {'id:000000,orig:ignored.raw'}}
+  roots, seeds = ancestry(names)
+  assert seeds == {0: 'new_1.raw', 1: 'seed_ftp.raw'}
+  assert roots[2] == {0}
+  assert roots[3] == {0, 1}
+  #synced entries and their children have no root in this queue
+  assert roots[4] == frozenset() and roots[5] == frozenset()
+
+  paths = descendants(names, 'paths', roots, seeds)
+  assert sorted(map(sorted, paths)) == [[], [], [0], [0, 1]]
+
+  crashes = {'replayable-crashes': {'id:000000,sig:11,src:000003,op:havoc', 'id:000001,sig:06,orig:seed_ftp.raw'}}
+  assert sorted(map(sorted, descendants(crashes, 'crashes', roots, seeds))) == [[0, 1], [1]]
+
+
+def test_root_stage():
+  lineage = {'new_1.raw': {'stage': '5_test_cases', 'seed': 'seed_1.raw'}, 'new_2.raw': {'stage': '3_message_sequences'}}
+  assert root_stage('new_1.raw', lineage) == ('5_test_cases', 'seed')
+  assert root_stage('new_2.raw', lineage) == ('3_message_sequences', 'default')
+  assert root_stage('new_9.raw', lineage) == ('unknown', '')
+  assert root_stage('seed_ftp.raw', lineage) == ('original', '')
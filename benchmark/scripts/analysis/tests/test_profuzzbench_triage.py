@@ -0,0 +1,37 @@
+from profuzzbench_triage import bucket_report
+
+ASAN_REPORT = '''==1234==ERROR: AddressSanitizer: heap-buffer-overflow on address 0x602000000011 at pc 0x4f2a1b
+READ of size 1 at 0x602000000011 thread T0
+    #0 0x4f2a1b in __asan_memcpy (/build/lightftp/fftp+0x4f2a1b)
+    #1 0x5123ab in parse_command /build/{build}/ftpserv.c:{line}:7
+    #2 0x5124cd in worker_thread /build/{build}/ftpserv.c:812:3
+    #3 0x7f0000001234 in start_thread (/lib/x86_64-linux-gnu/libpthread.so.0+0x8609)
+
+0x602000000011 is located 0 bytes to the right of 1-byte region
+    #0 0x4f3000 in malloc (/build/lightftp/fftp+0x4f3000)
+'''
+
+
+def test_bucket_report_ignores_addresses_lines_and_paths():
+  first = bucket_report(ASAN_REPORT.format(build='a', line=100), -6, 3)
+  second = bucket_report(ASAN_REPORT.format(build='b', line=120).replace('0x5123ab', '0x5999ab'), -6, 3)
+  assert first[0] == second[0]
+  assert first[1] == 'AddressSanitizer: heap-buffer-overflow'
+  #sanitizer frames are skipped and only the first stack trace is used
+  assert first[2] == ['parse_command ftpserv.c', 'worker_thread ftpserv.c', 'start_thread']
+
+
+def test_bucket_report_separates_stacks():
+  other = ASAN_REPORT.replace('parse_command', 'parse_reply')
+  assert bucket_report(ASAN_REPORT, -6, 3)[0] != bucket_report(other, -6, 3)[0]
+
+
+def test_bucket_report_ubsan_signal_and_not_reproduced():
+  digest, kind, frames = bucket_report("src/dns.c:42:13: runtime error: index 5 out of bounds for type 'int [4]'\n", 0, 3)
+  assert kind == 'UndefinedBehaviorSanitizer: index N out of bounds for type N'
+  assert frames == ['dns.c:42']
+
+  digest, kind, frames = bucket_report('', -11, 3)
+  assert kind == 'signal 11' and digest
+
+  assert bucket_report('', 0, 3) == (None, 'not reproduced', [])
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import gzip
+import json
+import tarfile
+import argparse
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analysis'))
+from profuzzbench_data import TIERS, find_archives, member_part, open_archive, zstandard
+
+WORKDIR = '/home/ubuntu/experiments'
+#without the zstandard module the parts are written as gzip
+EXT = '.tar.zst' if zstandard else '.tar.gz'
+
+
+def part_path(stem, part):
+  #metrics go to the run's main archive so that find_archives and read_members pick them up
+  return stem + EXT if part == 'metrics' else '{}.{}{}'.format(stem, part, EXT)
+
+
+@contextlib.contextmanager
+def open_writer(path, level):
+  #streaming tar writer; the file only gets its final name once it is complete
+  tmp = path + '.tmp'
+  try:
+    with open(tmp, 'wb') as f:
+      if zstandard:
+        compressed = zstandard.ZstdCompressor(level=level).stream_writer(f, closefd=False)
+      else:
+        compressed = gzip.GzipFile(fileobj=f, mode='wb', compresslevel=min(level, 9))
+      with compressed, tarfile.open(fileobj=compressed, mode='w|') as tar:
+        yield tar
+  except BaseException:
+    os.remove(tmp)
+    raise
+  os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def open_source(source):
+  #the run's output archive, streamed from a (stopped) container or read from a local file
+  if 'archive' in source:
+    with open_archive(source['archive']) as tar:
+      yield tar
+    return
+  proc = subprocess.Popen(['docker', 'cp', '{}:{}'.format(source['container'], source['path']), '-'],
+                          stdout=subprocess.PIPE)
+  try:
+    #docker cp wraps the copied file in an uncompressed tar stream
+    with tarfile.open(fileobj=proc.stdout, mode='r|') as outer:
+      member = outer.next()
+      if member is None:
+        raise RuntimeError("{} not found in container {}".format(source['path'], source['container']))
+      with tarfile.open(fileobj=outer.extractfile(member), mode='r|*') as tar:
+        yield tar
+  finally:
+    proc.stdout.close()
+    proc.wait()
+
+
+def split_archive(source, stem, parts, level):
+  #one pass over the source: members of the requested parts are written to their archives,
+  #every member is listed in the returned index
+  members = []
+  with contextlib.ExitStack() as stack:
+    tar = stack.enter_context(open_source(source))
+    writers = {part: stack.enter_context(open_writer(part_path(stem, part), level)) for part in parts}
+    for member in tar:
+      part = member_part(member.name)
+      members.append([member.name, member.size, part])
+      if part in writers:
+        writers[part].addfile(member, tar.extractfile(member) if member.isfile() else None)
+  return members
+
+
+def write_index(stem, index):
+  with open(stem + '.index.json', 'w') as f:
+    json.dump(index, f)
+
+
+def collect(source, stem, tier, level):
+  #split a run's output into the parts of its tier; returns the path of the main (metrics) archive
+  os.makedirs(os.path.dirname(stem) or '.', exist_ok=True)
+  members = split_archive(source, stem, TIERS[tier], level)
+  parts = {part: os.path.basename(part_path(stem, part)) for part in TIERS[tier]}
+  write_index(stem, {'source': source, 'tier': tier, 'parts': parts, 'members': members})
+  sizes = {}
+  for name, size, part in members:
+    sizes[part] = sizes.get(part, 0) + size
+  print("{}: kept {} of {} bytes ({})".format(os.path.basename(stem), sum(sizes.get(part, 0) for part in parts),
+                                              sum(sizes.values()), ', '.join(parts)))
+  return part_path(stem, 'metrics')
+
+
+def fetch(index_file, part, level):
+  #lazily add a part that was left out at collection time, from the container or archive it came from
+  with open(index_file) as f:
+    index = json.load(f)
+  stem = index_file[:-len('.index.json')]
+  if part in index['parts']:
+    print("{}: {} part is already collected".format(os.path.basename(stem), part))
+    return part_path(stem, part)
+  split_archive(index['source'], stem, [part], level)
+  index['parts'][part] = os.path.basename(part_path(stem, part))
+  write_index(stem, index)
+  return part_path(stem, part)
+
+
+def main(container, outdir, dest, archives, data_dir, out_dir, tier, level, fetch_index, fetch_part):
+  if fetch_index:
+    for index_file in fetch_index:
+      print("Fetched {}".format(fetch(index_file, fetch_part, level)))
+    return
+  if container:
+    collect({'container': container, 'path': '{}/{}.tar.gz'.format(WORKDIR, outdir)}, dest, tier, level)
+    return
+
+  #repack existing archives, mirroring their layout under out_dir
+  jobs = [os.path.abspath(path) for path in archives]
+  if data_dir:
+    jobs += [os.path.abspath(path) for subject, fuzzer, run, path in find_archives(data_dir) if path.endswith('.tar.gz')]
+  root = os.path.abspath(data_dir) if data_dir else None
+  for path in jobs:
+    relative = os.path.relpath(path, root) if root else os.path.basename(path)
+    stem = os.path.join(out_dir, relative)[:-len('.tar.gz')]
+    collect({'archive': path}, stem, tier, level)
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c','--container',type=str,default=None,help="Collect the output archive of this (stopped) container")
+    parser.add_argument('-n','--outdir',type=str,default=None,help="Name of the output folder inside the container, e.g. out-lightftp-aflnet")
+    parser.add_argument('-d','--dest',type=str,default=None,help="Destination without extension, e.g. results-lightftp/out-lightftp-aflnet_1")
+    parser.add_argument('-a','--archive',type=str,nargs='*',default=[],help="Repack these .tar.gz archives")
+    parser.add_argument('-i','--data_dir',type=str,default=None,help="Repack every .tar.gz archive in this folder tree")
+    parser.add_argument('-o','--out_dir',type=str,default=None,help="Folder receiving the repacked archives")
+    parser.add_argument('-t','--tier',type=str,default='metrics',choices=list(TIERS),help="Parts of the output folder to keep")
+    parser.add_argument('-l','--level',type=int,default=3,help="Compression level")
+    parser.add_argument('--fetch',type=str,nargs='*',default=None,help="Index files (<run>.index.json) of runs to fetch a part for")
+    parser.add_argument('--part',type=str,default='bulk',choices=['crashes', 'bulk'],help="Part to fetch")
+    args = parser.parse_args()
+    if args.container and not (args.outdir and args.dest):
+        parser.error("--container requires --outdir and --dest")
+    if (args.archive or args.data_dir) and not args.out_dir:
+        parser.error("repacking requires --out_dir")
+    if not (args.container or args.archive or args.data_dir or args.fetch):
+        parser.error("one of --container, --archive, --data_dir or --fetch is required")
+    main(args.container, args.outdir, args.dest, args.archive, args.data_dir, args.out_dir, args.tier, args.level,
+         args.fetch, args.part)
@@ -10,6 +10,7 @@ OPTIONS=$6    #all configured options for fuzzing
 TIMEOUT=$7    #time for fuzzing
 SKIPCOUNT=$8  #used for calculating coverage over time. e.g., SKIPCOUNT=5 means we run gcovr after every 5 test cases
 DELETE=$9
+#TIER (environment): collect only the metrics, crashes or full tier with profuzzbench_collect.py instead of the whole archive
 
 WORKDIR="/home/ubuntu/experiments"
 
@@ -38,7 +39,12 @@ printf "\n${FUZZER^^}: Collecting results and save them to ${SAVETO}"
 index=1
 for id in ${cids[@]}; do
   printf "\n${FUZZER^^}: Collecting results from container ${id}"
-  docker cp ${id}:/home/ubuntu/experiments/${OUTDIR}.tar.gz ${SAVETO}/${OUTDIR}_${index}.tar.gz > /dev/null
+  if [ ! -z $TIER ]; then
+    #keep only the parts of the output folder in the tier (metrics, crashes or full), compressed with zstd
+    profuzzbench_collect.py -c ${id} -n ${OUTDIR} -d ${SAVETO}/${OUTDIR}_${index} -t ${TIER}
+  else
+    docker cp ${id}:/home/ubuntu/experiments/${OUTDIR}.tar.gz ${SAVETO}/${OUTDIR}_${index}.tar.gz > /dev/null
+  fi
   if [ ! -z $DELETE ]; then
     printf "\nDeleting ${id}"
     docker rm ${id} # Remove container now that we don't need it
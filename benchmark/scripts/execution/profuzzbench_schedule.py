@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import csv
+import time
+import queue
+import shutil
+import argparse
+import subprocess
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analysis'))
+from profuzzbench_data import sample_archive
+from profuzzbench_collect import collect
+
+WORKDIR = '/home/ubuntu/experiments'
+RUN_COMMAND = "cd {workdir} && run {fuzzer} {outdir} '{options}' {timeout} {skipcount}"
+
+#fuzzer options of every subject as in profuzzbench_exec_all.sh ({test_timeout} is TEST_TIMEOUT in ms)
+TARGETS = {
+  'lightftp': "-P FTP -D 10000 -q 3 -s 3 -E -K -m none -t {test_timeout}+",
+  'bftpd': "-m none -P FTP -D 10000 -q 3 -s 3 -E -K -t {test_timeout}+",
+  'proftpd': "-m none -P FTP -D 10000 -q 3 -s 3 -E -K -t {test_timeout}+",
+  'pure-ftpd': "-m none -P FTP -D 10000 -q 3 -s 3 -E -K -t {test_timeout}+",
+  'exim': "-P SMTP -D 10000 -q 3 -s 3 -E -K -W 100 -m none -t {test_timeout}+",
+  'live555': "-P RTSP -D 10000 -q 3 -s 3 -E -K -R -m none",
+  'kamailio': "-m none -P SIP -l 5061 -D 50000 -q 3 -s 3 -E -K -t {test_timeout}+",
+  'forked-daapd': "-P HTTP -D 200000 -m none -q 3 -s 3 -E -K -t {test_timeout}+",
+  'lighttpd1': "-P HTTP -D 200000 -m none -q 3 -s 3 -E -K -R -t {test_timeout}+",
+  'dcmtk': "-P DICOM -D 200000 -m none -q 3 -s 3 -E -K -R -t {test_timeout}+",
+  'dnsmasq': "-P DNS -D 200000 -m none -q 3 -s 3 -E -K -R -t {test_timeout}+",
+  'tinydtls': "-P DTLS12 -D 200000 -m none -q 3 -s 3 -E -K -R -t {test_timeout}+",
+  'openssh': "-P SSH -D 200000 -m none -q 3 -s 3 -E -K -R -t {test_timeout}+",
+  'openssl': "-P TLS -D 200000 -m none -q 3 -s 3 -E -K -R -W 100 -t {test_timeout}+",
+  'live555-newest': "-P RTSP -D 10000 -q 3 -s 3 -E -K -R -m none",
+  'dnsmasq-newest': "-P DNS -D 200000 -m none -q 3 -s 3 -E -K -R -t {test_timeout}+",
+  'unbound': "-P DNS -D 200000 -m none -q 3 -s 3 -E -K -R -t {test_timeout}+",
+  'kamailio-newest': "-m none -P SIP -l 5061 -D 50000 -q 3 -s 3 -E -K -t {test_timeout}+",
+  'proftpd-newest': "-m none -P FTP -D 10000 -q 3 -s 3 -E -K -t {test_timeout}+",
+}
+FUZZERS = ['aflnet', 'chatafl', 'stellafuzz']
+#fuzzers that have no build for a subject
+UNSUPPORTED = {'openssh': ['chatafl']}
+
+SUMMARY_FILE = 'schedule.csv'
+SUMMARY_COLUMNS = ['subject', 'fuzzer', 'run', 'cores', 'exit_code', 'start', 'end', 'seconds',
+                   'l_abs', 'b_abs', 'nodes', 'edges', 'archive']
+
+
+class Job:
+  def __init__(self, subject, fuzzer, run, options):
+    self.subject = subject
+    self.fuzzer = fuzzer
+    self.run = run
+    self.options = options
+    self.outdir = 'out-{}-{}'.format(subject, fuzzer)
+    self.name = '{}_{}'.format(self.outdir, run)
+    self.cores = []
+    self.handle = None
+    self.start = None
+
+
+class DockerBackend:
+  #one container per job, pinned to its cores with a cpuset
+  def __init__(self, delete, tier, level):
+    self.delete = delete
+    self.tier = tier
+    self.level = level
+
+  def start(self, job, timeout, skipcount):
+    command = RUN_COMMAND.format(workdir=WORKDIR, fuzzer=job.fuzzer, outdir=job.outdir, options=job.options,
+                                 timeout=timeout, skipcount=skipcount)
+    result = subprocess.run(['docker', 'run', '--cpuset-cpus={}'.format(','.join(map(str, job.cores))),
+                             '--cpus={}'.format(len(job.cores)), '-d', '-it', job.subject, '/bin/bash', '-c', command],
+                            stdout=subprocess.PIPE, check=True, text=True)
+    return result.stdout.strip()[:12]
+
+  def wait(self, handle):
+    result = subprocess.run(['docker', 'wait', handle], stdout=subprocess.PIPE, text=True)
+    return int(result.stdout.strip() or -1)
+
+  def collect(self, job, stem):
+    #returns the path of the collected archive, or None
+    source = '{}/{}.tar.gz'.format(WORKDIR, job.outdir)
+    if self.tier:
+      try:
+        archive = collect({'container': job.handle, 'path': source}, stem, self.tier, self.level)
+      except Exception as e:
+        print("{}: could not collect {}: {}".format(job.name, source, e))
+        archive = None
+    else:
+      archive = stem + '.tar.gz'
+      result = subprocess.run(['docker', 'cp', '{}:{}'.format(job.handle, source), archive], stdout=subprocess.DEVNULL)
+      archive = archive if result.returncode == 0 else None
+    if self.delete:
+      subprocess.run(['docker', 'rm', job.handle], stdout=subprocess.DEVNULL)
+    return archive
+
+  def stop(self, job):
+    subprocess.run(['docker', 'stop', job.handle], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class LocalBackend:
+  #one pinned subprocess per job in its own working folder, for testing without Docker;
+  #the command is formatted like RUN_COMMAND and must leave <outdir>.tar.gz in that folder
+  def __init__(self, command, work_dir, tier, level):
+    self.command = command
+    self.work_dir = work_dir
+    self.tier = tier
+    self.level = level
+
+  def start(self, job, timeout, skipcount):
+    cwd = os.path.join(self.work_dir, job.name)
+    os.makedirs(cwd, exist_ok=True)
+    command = self.command.format(workdir=cwd, fuzzer=job.fuzzer, outdir=job.outdir, options=job.options,
+                                  timeout=timeout, skipcount=skipcount, subject=job.subject, run=job.run)
+    cores = set(job.cores)
+    return subprocess.Popen(['/bin/bash', '-c', command], cwd=cwd, preexec_fn=lambda: os.sched_setaffinity(0, cores))
+
+  def wait(self, handle):
+    return handle.wait()
+
+  def collect(self, job, stem):
+    source = os.path.join(self.work_dir, job.name, job.outdir + '.tar.gz')
+    if not os.path.exists(source):
+      return None
+    try:
+      if self.tier:
+        archive = collect({'archive': source}, stem, self.tier, self.level)
+      else:
+        archive = stem + '.tar.gz'
+        shutil.move(source, archive)
+    except Exception as e:
+      print("{}: could not collect {}: {}".format(job.name, source, e))
+      return None
+    shutil.rmtree(os.path.join(self.work_dir, job.name), ignore_errors=True)
+    return archive
+
+  def stop(self, job):
+    job.handle.terminate()
+
+
+def parse_cores(spec):
+  #"0-3,8,10-11" -> [0, 1, 2, 3, 8, 10, 11]
+  cores = []
+  for part in spec.split(','):
+    if '-' in part:
+      first, last = part.split('-')
+      cores.extend(range(int(first), int(last) + 1))
+    elif part:
+      cores.append(int(part))
+  return sorted(set(cores))
+
+
+def make_jobs(subjects, fuzzers, runs, test_timeout):
+  #interleave by run so that every fuzzer of a subject is running at the same time under the same load
+  jobs = []
+  for run in range(1, runs + 1):
+    for subject in subjects:
+      for fuzzer in fuzzers:
+        if fuzzer in UNSUPPORTED.get(subject, []):
+          continue
+        jobs.append(Job(subject, fuzzer, run, TARGETS[subject].format(test_timeout=test_timeout)))
+  return jobs
+
+
+def postprocess(job, archive, exit_code, cut_off, step):
+  #sample the run's coverage and state curves right away and keep their final values
+  row = {'subject': job.subject, 'fuzzer': job.fuzzer, 'run': job.run, 'cores': ' '.join(map(str, job.cores)),
+         'exit_code': exit_code, 'start': int(job.start), 'end': int(time.time()),
+         'seconds': int(time.time() - job.start), 'archive': archive}
+  if archive:
+    for kind, subject, fuzzer, run, data_type, minutes, values in sample_archive(
+        (job.subject, job.fuzzer, job.run, archive, cut_off, step)):
+      row[data_type] = values[-1]
+  return row
+
+
+def main(out_dir, subjects, fuzzers, runs, timeout, skipcount, test_timeout, cores, cores_per_job,
+         backend, skip_existing, cut_off, step):
+  jobs = make_jobs(subjects, fuzzers, runs, test_timeout)
+  if skip_existing:
+    jobs = [job for job in jobs if not any(os.path.exists(os.path.join(out_dir, 'results-' + job.subject, job.name + ext))
+                                           for ext in ['.tar.gz', '.tar.zst'])]
+  if len(cores) < cores_per_job:
+    print("Need {} cores per job but only {} are available".format(cores_per_job, len(cores)))
+    return
+
+  os.makedirs(out_dir, exist_ok=True)
+  summary_file = os.path.join(out_dir, SUMMARY_FILE)
+  new_summary = not os.path.exists(summary_file)
+  summary = open(summary_file, 'a', newline='')
+  writer = csv.DictWriter(summary, fieldnames=SUMMARY_COLUMNS, extrasaction='ignore')
+  if new_summary:
+    writer.writeheader()
+
+  print("Scheduling {} jobs on {} cores ({} per job)".format(len(jobs), len(cores), cores_per_job))
+  free = list(cores)
+  pending = list(jobs)
+  running = {}
+  finished = queue.Queue()
+
+  def watch(job):
+    try:
+      exit_code = backend.wait(job.handle)
+    except Exception as e:
+      print("{}: could not wait for {}: {}".format(job.name, job.handle, e))
+      exit_code = -1
+    finished.put((job, exit_code))
+
+  def launch():
+    #pack pending jobs onto the free cores
+    nonlocal free
+    while pending and len(free) >= cores_per_job:
+      job = pending.pop(0)
+      job.cores, free = free[:cores_per_job], free[cores_per_job:]
+      os.makedirs(os.path.join(out_dir, 'results-' + job.subject), exist_ok=True)
+      try:
+        job.handle = backend.start(job, timeout, skipcount)
+      except Exception as e:
+        print("{}: could not start: {}".format(job.name, e))
+        free = sorted(free + job.cores)
+        continue
+      job.start = time.time()
+      running[job.name] = job
+      threading.Thread(target=watch, args=(job,), daemon=True).start()
+      print("{}: started on cores {}".format(job.name, ','.join(map(str, job.cores))))
+
+  try:
+    launch()
+    while running:
+      #collect every run as soon as it exits, after its cores are handed to the next job
+      job, exit_code = finished.get()
+      del running[job.name]
+      free = sorted(free + job.cores)
+      launch()
+      #a run that cannot be collected or post-processed only loses its own results
+      try:
+        archive = backend.collect(job, os.path.join(out_dir, 'results-' + job.subject, job.name))
+      except Exception as e:
+        print("{}: could not collect: {}".format(job.name, e))
+        archive = None
+      if not archive:
+        print("{}: no result archive (exit code {})".format(job.name, exit_code))
+      try:
+        row = postprocess(job, archive, exit_code, cut_off, step)
+      except Exception as e:
+        print("{}: could not post-process {}: {}".format(job.name, archive, e))
+        row = postprocess(job, None, exit_code, cut_off, step)
+      writer.writerow(row)
+      summary.flush()
+      print("{}: done in {:.0f}s, {} running, {} pending".format(job.name, time.time() - job.start, len(running), len(pending)))
+  except KeyboardInterrupt:
+    print("Interrupted")
+  finally:
+    #on an interrupt or any error, running containers and processes are not left behind
+    if running:
+      print("Stopping {} running jobs".format(len(running)))
+    for job in running.values():
+      try:
+        backend.stop(job)
+      except Exception as e:
+        print("{}: could not stop: {}".format(job.name, e))
+    summary.close()
+
+# Parse the input arguments
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-t','--targets',type=str,required=True,help="Comma-separated subjects, or all")
+    parser.add_argument('-f','--fuzzers',type=str,required=True,help="Comma-separated fuzzers, or all")
+    parser.add_argument('-o','--out_dir',type=str,default=os.environ.get('PFBENCH', '.'),help="Folder receiving the results-<subject> folders")
+    parser.add_argument('-r','--runs',type=int,default=int(os.environ.get('NUM_CONTAINERS', 10)),help="Runs per subject and fuzzer")
+    parser.add_argument('--timeout',type=int,default=int(os.environ.get('TIMEOUT', 86400)),help="Fuzzing time in seconds")
+    parser.add_argument('--skipcount',type=int,default=int(os.environ.get('SKIPCOUNT', 1)),help="Run gcovr after every SKIPCOUNT test cases")
+    parser.add_argument('--test_timeout',type=int,default=int(os.environ.get('TEST_TIMEOUT', 20000)),help="Test case timeout in ms")
+    parser.add_argument('--cores',type=str,default=None,help="Cores to pack jobs onto, e.g. 2-31 (default: all but core 0)")
+    parser.add_argument('--cores_per_job',type=int,default=1,help="Dedicated cores per job")
+    parser.add_argument('--local',type=str,default=None,help="Run jobs as local subprocesses with this command template instead of Docker")
+    parser.add_argument('--delete',action='store_true',help="Remove containers once their results are collected")
+    parser.add_argument('--tier',type=str,default=None,choices=['metrics', 'crashes', 'full'],help="Collect only these parts of each run, compressed with zstd (see profuzzbench_collect.py)")
+    parser.add_argument('--level',type=int,default=3,help="Compression level of tiered archives")
+    parser.add_argument('--skip_existing',action='store_true',help="Skip runs whose archive already exists")
+    parser.add_argument('-c','--cut_off',type=int,default=1440,help="Cut-off time in minutes for the post-processed summary")
+    parser.add_argument('-s','--step',type=int,default=1,help="Time step in minutes for the post-processed summary")
+    args = parser.parse_args()
+
+    subjects = list(TARGETS) if args.targets == 'all' else args.targets.split(',')
+    fuzzers = FUZZERS if args.fuzzers == 'all' else args.fuzzers.split(',')
+    unknown = [subject for subject in subjects if subject not in TARGETS]
+    if unknown:
+      parser.error("unknown subjects: {}".format(', '.join(unknown)))
+    available = os.sched_getaffinity(0)
+    cores = parse_cores(args.cores) if args.cores else sorted(available - {0}) or [0]
+    if set(cores) - available:
+      parser.error("cores not available to this process: {}".format(','.join(map(str, sorted(set(cores) - available)))))
+    if args.local:
+      backend = LocalBackend(args.local, os.path.join(args.out_dir, '.schedule'), args.tier, args.level)
+    else:
+      backend = DockerBackend(args.delete, args.tier, args.level)
+    main(args.out_dir, subjects, fuzzers, args.runs, args.timeout, args.skipcount, args.test_timeout, cores,
+         args.cores_per_job, backend, args.skip_existing, args.cut_off, args.step)